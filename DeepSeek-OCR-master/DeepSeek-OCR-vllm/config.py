@@ -8,12 +8,26 @@
 BASE_SIZE = 1024
 IMAGE_SIZE = 640
 CROP_MODE = True
+# Per-request modes served by the API: name -> (base_size, image_size, crop_mode).
+# BASE_SIZE / IMAGE_SIZE / CROP_MODE above stay the default (and profiling) mode.
+MODES = {
+    'tiny': (512, 512, False),
+    'small': (640, 640, False),
+    'base': (1024, 1024, False),
+    'large': (1280, 1280, False),
+    'gundam': (1024, 640, True),
+}
 MIN_CROPS= 2
 MAX_CROPS= 6 # max:9; If your GPU memory is small, it is recommended to set it to 6.
 MAX_CONCURRENCY = 100 # If you have limited GPU memory, lower the concurrency count.
 NUM_WORKERS = 64 # image pre-process (resize/padding) workers 
+UINT8_PIXELS = False # keep pixel_values / images_crop uint8 (4x smaller); the model normalizes them on the GPU
 PRINT_NUM_VIS_TOKENS = False
 SKIP_REPEAT = True
+SKIP_BLANK_PAGES = False # answer blank pages (see process/blank_page.py) with empty output instead of running the model
+DEDUP_PAGES = False # run repeated pages (see process/page_hash.py) once and reuse their output
+DEDUP_EXACT_ONLY = True # False also matches near copies (re-scans); copies of one form filled in differently look alike too
+DEDUP_MAX_DISTANCE = 8 # dHash bits a near copy may differ by
 MODEL_PATH = '/models/deepseek-ai/DeepSeek-OCR' # change to your model path
 
 # TODO: change INPUT_PATH
@@ -62,7 +62,9 @@ class DeepseekOCRProcessingInfo(BaseProcessingInfo):
                              *,
                              image_width: int,
                              image_height: int,
-                             cropping: bool = True) -> int:
+                             cropping: bool = True,
+                             base_size: int = BASE_SIZE,
+                             image_size: int = IMAGE_SIZE) -> int:
         hf_processor = self.get_hf_processor()
 
 
@@ -70,19 +72,17 @@ class DeepseekOCRProcessingInfo(BaseProcessingInfo):
         # patch_size = hf_processor.patch_size
         # downsample_ratio = hf_processor.downsample_ratio
 
-        image_size = IMAGE_SIZE
-        base_size = BASE_SIZE
         patch_size = 16
         downsample_ratio = 4
 
-        if CROP_MODE:
+        if cropping:
             if image_width <= 640 and image_height <= 640:
                 crop_ratio = [1, 1]
             else:
                 # images_crop_raw, crop_ratio = hf_processor.dynamic_preprocess(image)
 
                 # find the closest aspect ratio to the target
-                crop_ratio = count_tiles(image_width, image_height, image_size=IMAGE_SIZE)
+                crop_ratio = count_tiles(image_width, image_height, image_size=image_size)
 
                 # print('===========')
                 # print('crop_ratio ', crop_ratio)
@@ -208,16 +208,9 @@ class DeepseekOCRMultiModalProcessor(
                 num_image_tokens = images.get_feature_size(item_idx)
             else:
 
-                
-                width = images[0][-1][0][0]
-                height = images[0][-1][0][1]
-
-                num_image_tokens = self.info.get_num_image_tokens(
-                    image_width=width,
-                    image_height=height,
-                    # flag = True,
-                    cropping=CROP_MODE,
-                )
+                # Items arrive pre-tokenized in whichever mode the request
+                # asked for, so take the count the processor emitted
+                num_image_tokens = images[item_idx][5][0]
             return [image_token_id] * num_image_tokens
 
         return [
@@ -338,7 +331,13 @@ class DeepseekOCRForCausalLM(nn.Module, SupportsMultiModal, SupportsPP):
         images_crop = kwargs.pop("images_crop", None)
 
 
-        if pixel_values is None or torch.sum(pixel_values).item() == 0:
+        if pixel_values is None:
+            return None
+        # Requests in different modes cannot be stacked and arrive as a list
+        if isinstance(pixel_values, list):
+            if all(torch.sum(p).item() == 0 for p in pixel_values):
+                return None
+        elif torch.sum(pixel_values).item() == 0:
             return None
 
         if pixel_values is not None:
@@ -384,11 +383,13 @@ class DeepseekOCRForCausalLM(nn.Module, SupportsMultiModal, SupportsPP):
         with torch.no_grad():
             for jdx in range(images_spatial_crop.size(0)):
                 # with torch.set_grad_enabled(False):
-                patches = images_crop[jdx][0].to(torch.bfloat16) # batch_size = 1
+                patches = images_crop[jdx][0] # batch_size = 1
                 image_ori = pixel_values[jdx]
                 crop_shape = images_spatial_crop[jdx][0]
 
                 if torch.sum(patches).item() != 0:  # if all values = 0, no crop
+                    # normalized only now: a normalized all-zero placeholder is no longer 0
+                    patches = self._normalize_pixels(patches)
                     # P, C, H, W = patches.shape
                     # crop_flag = 1
                     local_features_1 = self.sam_model(patches)
@@ -466,13 +467,28 @@ class DeepseekOCRForCausalLM(nn.Module, SupportsMultiModal, SupportsPP):
 
         return images_in_this_batch
 
+    @staticmethod
+    def _normalize_pixels(pixels: torch.Tensor) -> torch.Tensor:
+        """bf16 encoder input from processor pixels.
+
+        uint8 pixels (DeepseekOCRProcessor with uint8_pixels) get the
+        processor's ToTensor + Normalize(0.5, 0.5) here, on the model's device.
+        """
+        if pixels.dtype == torch.uint8:
+            pixels = pixels.to(torch.float32).div_(255).sub_(0.5).div_(0.5)
+        return pixels.to(torch.bfloat16)
+
     def _process_image_input(
             self, image_input) -> torch.Tensor:
         
 
         # image_input: [pixel_values, images_crop, images_spatial_crop]
     
-        pixel_values = image_input[0].to(torch.bfloat16)
+        pixel_values = image_input[0]
+        if isinstance(pixel_values, list):
+            pixel_values = [self._normalize_pixels(p) for p in pixel_values]
+        else:
+            pixel_values = self._normalize_pixels(pixel_values)
         # print(image_input[1][0].shape)
         # print(type(image_input[1]))
         # exit()
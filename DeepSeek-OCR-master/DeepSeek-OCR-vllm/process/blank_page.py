@@ -0,0 +1,44 @@
+"""Blank and near-empty page detection, on the CPU before an image reaches the model.
+
+Blank separator pages and empty back sides of scans would otherwise cost a full
+SAM+CLIP encode and a generation. A page counts as blank when almost none of its
+pixels differ from the paper: the image is reduced to a grayscale thumbnail
+(which also averages away scanner noise and JPEG artifacts), the background
+level is taken as the median, and pixels far from it are ink. Isolated ink
+pixels (dust, specks) are ignored.
+"""
+
+import numpy as np
+from PIL import Image, ImageOps
+
+THUMBNAIL_SIZE = 512 # longest side of the thumbnail the page is measured on
+INK_CONTRAST = 48 # gray levels from the background that count as ink
+MAX_INK_RATIO = 0.0005 # pages with less ink are blank (a lone page number is ~0.0001, one text line ~0.0025)
+
+
+def ink_ratio(image, thumbnail_size=THUMBNAIL_SIZE, contrast=INK_CONTRAST):
+    """Share of thumbnail pixels that are ink.
+
+    Opened JPEGs that are not decoded yet are decoded straight at reduced scale.
+    """
+    image.draft('L', (thumbnail_size, thumbnail_size))
+    width, height = image.size
+    scale = min(1.0, thumbnail_size / max(width, height))
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    thumbnail = ImageOps.grayscale(image.resize(size, Image.BILINEAR, reducing_gap=2.0))
+
+    gray = np.asarray(thumbnail, dtype=np.int16)
+    ink = np.abs(gray - np.median(gray)) > contrast
+
+    # keep ink pixels with at least one ink 4-neighbour
+    neighbours = np.zeros_like(ink)
+    neighbours[1:, :] |= ink[:-1, :]
+    neighbours[:-1, :] |= ink[1:, :]
+    neighbours[:, 1:] |= ink[:, :-1]
+    neighbours[:, :-1] |= ink[:, 1:]
+    return float((ink & neighbours).mean())
+
+
+def is_blank_page(image, max_ink_ratio=MAX_INK_RATIO):
+    """True if image carries (almost) no ink and can skip the model."""
+    return ink_ratio(image) <= max_ink_ratio
@@ -1,12 +1,24 @@
+import functools
 import math
 from typing import List, Tuple
 
+import numpy as np
 import torch
 import torchvision.transforms as T
 from PIL import Image, ImageOps
 from transformers import AutoProcessor, BatchFeature, LlamaTokenizerFast
 from transformers.processing_utils import ProcessorMixin
-from config import IMAGE_SIZE, BASE_SIZE, CROP_MODE, MIN_CROPS, MAX_CROPS, PROMPT, TOKENIZER
+from config import IMAGE_SIZE, BASE_SIZE, CROP_MODE, MIN_CROPS, MAX_CROPS, PROMPT, TOKENIZER, UINT8_PIXELS
+
+@functools.lru_cache(maxsize=None)
+def get_target_ratios(min_num=MIN_CROPS, max_num=MAX_CROPS):
+    """Tile grids with min_num..max_num tiles, fewest tiles first (built once per range)."""
+    target_ratios = set(
+        (i, j) for n in range(min_num, max_num + 1) for i in range(1, n + 1) for j in range(1, n + 1) if
+        i * j <= max_num and i * j >= min_num)
+    # print(target_ratios)
+    return tuple(sorted(target_ratios, key=lambda x: x[0] * x[1]))
+
 
 def find_closest_aspect_ratio(aspect_ratio, target_ratios, width, height, image_size):
     best_ratio_diff = float('inf')
@@ -29,11 +41,7 @@ def count_tiles(orig_width, orig_height, min_num=MIN_CROPS, max_num=MAX_CROPS, i
     aspect_ratio = orig_width / orig_height
 
     # calculate the existing image aspect ratio
-    target_ratios = set(
-        (i, j) for n in range(min_num, max_num + 1) for i in range(1, n + 1) for j in range(1, n + 1) if
-        i * j <= max_num and i * j >= min_num)
-    # print(target_ratios)
-    target_ratios = sorted(target_ratios, key=lambda x: x[0] * x[1])
+    target_ratios = get_target_ratios(min_num, max_num)
 
     # find the closest aspect ratio to the target
     target_aspect_ratio = find_closest_aspect_ratio(
@@ -47,11 +55,7 @@ def dynamic_preprocess(image, min_num=MIN_CROPS, max_num=MAX_CROPS, image_size=6
     aspect_ratio = orig_width / orig_height
 
     # calculate the existing image aspect ratio
-    target_ratios = set(
-        (i, j) for n in range(min_num, max_num + 1) for i in range(1, n + 1) for j in range(1, n + 1) if
-        i * j <= max_num and i * j >= min_num)
-    # print(target_ratios)
-    target_ratios = sorted(target_ratios, key=lambda x: x[0] * x[1])
+    target_ratios = get_target_ratios(min_num, max_num)
 
     # find the closest aspect ratio to the target
     target_aspect_ratio = find_closest_aspect_ratio(
@@ -83,6 +87,97 @@ def dynamic_preprocess(image, min_num=MIN_CROPS, max_num=MAX_CROPS, image_size=6
     return processed_images, target_aspect_ratio
 
 
+def dynamic_preprocess_tiles(image, min_num=MIN_CROPS, max_num=MAX_CROPS, image_size=640):
+    """Vectorized dynamic_preprocess: same tiles, without a PIL image per tile.
+
+    The image is resized and converted to an array once; the tiles are a
+    strided view of it. Returns a uint8 tensor view of shape
+    [height_tiles, width_tiles, 3, image_size, image_size] (tiles in the same
+    row-major order as dynamic_preprocess) and the crop ratio.
+    """
+    orig_width, orig_height = image.size
+    aspect_ratio = orig_width / orig_height
+    target_aspect_ratio = find_closest_aspect_ratio(
+        aspect_ratio, get_target_ratios(min_num, max_num), orig_width, orig_height, image_size)
+    num_width_tiles, num_height_tiles = target_aspect_ratio
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    resized = torch.from_numpy(np.array(image.resize((image_size * num_width_tiles, image_size * num_height_tiles))))
+    tiles = resized.view(num_height_tiles, image_size, num_width_tiles, image_size, 3).permute(0, 2, 4, 1, 3)
+    return tiles, target_aspect_ratio
+
+
+def decode_size(width, height, base_size=BASE_SIZE, image_size=IMAGE_SIZE, cropping=CROP_MODE):
+    """Smallest (width, height) tokenize_with_images reads an upright image at.
+
+    Every view it builds is resized from the image: a global view fitted into
+    base_size (squashed to image_size x image_size in small non-cropping modes)
+    and, when cropping, the tile grid count_tiles picks. Decoding at least this
+    large gives the model the same input detail as a full decode.
+    """
+    if image_size <= 640 and not cropping:
+        need_width = need_height = image_size
+    else:
+        scale = base_size / max(width, height)
+        need_width, need_height = width * scale, height * scale
+    if cropping and (width > 640 or height > 640):
+        num_width_tiles, num_height_tiles = count_tiles(width, height, image_size=image_size)
+        need_width = max(need_width, num_width_tiles * image_size)
+        need_height = max(need_height, num_height_tiles * image_size)
+    return need_width, need_height
+
+
+def decode_reduced(image, base_size=BASE_SIZE, image_size=IMAGE_SIZE, cropping=CROP_MODE):
+    """Decode an opened (not yet loaded) image near the size the mode reads it at.
+
+    JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale (DCT scaling), other
+    formats are decoded and box-reduced by an integer factor. The result is
+    never smaller than decode_size. EXIF orientation is left in place, so
+    apply ImageOps.exif_transpose afterwards (on the smaller image).
+    """
+    width, height = image.size
+    # decode_size is in upright pixels, the file is stored unrotated
+    rotated = image.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+    upright = (height, width) if rotated else (width, height)
+    need_width, need_height = decode_size(*upright, base_size=base_size, image_size=image_size, cropping=cropping)
+    if rotated:
+        need_width, need_height = need_height, need_width
+
+    if min(width / need_width, height / need_height) >= 2:
+        image.draft('RGB', (math.ceil(need_width), math.ceil(need_height)))
+    image.load()
+
+    factor = int(min(image.size[0] / need_width, image.size[1] / need_height))
+    if factor >= 2:
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image = image.reduce(factor)
+    return image
+
+
+@functools.lru_cache(maxsize=None)
+def image_token_template(image_token_id, base_size, image_size, num_width_tiles=1, num_height_tiles=1,
+                         patch_size=16, downsample_ratio=4):
+    """Token IDs and sequence mask of one image's placeholder span.
+
+    The span only depends on the mode (base_size / image_size) and the crop
+    ratio, so it is built once per layout; callers must not modify it in place.
+    """
+    num_queries = math.ceil((image_size // patch_size) / downsample_ratio)
+    num_queries_base = math.ceil((base_size // patch_size) / downsample_ratio)
+
+    num_tokens = (num_queries_base + 1) * num_queries_base + 1
+    if num_width_tiles > 1 or num_height_tiles > 1:
+        num_tokens += (num_queries * num_width_tiles + 1) * (num_queries * num_height_tiles)
+    return torch.full((num_tokens,), image_token_id, dtype=torch.long), torch.ones(num_tokens, dtype=torch.bool)
+
+
+@functools.lru_cache(maxsize=256)
+def encode_text_template(tokenizer, text):
+    """Token IDs and (all False) sequence mask of a prompt fragment, cached per text."""
+    token_ids = torch.LongTensor(tokenizer.encode(text, add_special_tokens=False))
+    return token_ids, torch.zeros(len(token_ids), dtype=torch.bool)
 
 
 
@@ -107,6 +202,15 @@ class ImageTransform:
         x = self.transform(pil_img)
         return x
 
+    def normalize_(self, x: torch.Tensor):
+        """In-place ToTensor scaling + Normalize of a float batch [..., 3, H, W] of 0-255 values."""
+        x.div_(255)
+        if self.normalize:
+            mean = torch.tensor(self.mean, dtype=x.dtype).view(3, 1, 1)
+            std = torch.tensor(self.std, dtype=x.dtype).view(3, 1, 1)
+            x.sub_(mean).div_(std)
+        return x
+
 
 class DeepseekOCRProcessor(ProcessorMixin):
     tokenizer_class = ("LlamaTokenizer", "LlamaTokenizerFast")
@@ -127,6 +231,7 @@ class DeepseekOCRProcessor(ProcessorMixin):
         sft_format: str = "deepseek",
         mask_prompt: bool = True,
         ignore_id: int = -100,
+        uint8_pixels: bool = UINT8_PIXELS,
         **kwargs,
     ):
 
@@ -142,6 +247,8 @@ class DeepseekOCRProcessor(ProcessorMixin):
         self.downsample_ratio = 4
 
         self.image_transform = ImageTransform(mean=image_mean, std=image_std, normalize=normalize)
+        # uint8 pixels skip ToTensor/Normalize here, DeepseekOCRForCausalLM applies them on device
+        self.uint8_pixels = uint8_pixels
 
 
         self.tokenizer = tokenizer
@@ -334,8 +441,16 @@ class DeepseekOCRProcessor(ProcessorMixin):
         bos: bool = True,
         eos: bool = True,
         cropping: bool = True,
+        base_size: int = None,
+        image_size: int = None,
     ):
-        """Tokenize text with <image> tags."""
+        """Tokenize text with <image> tags.
+
+        base_size / image_size override the global view and tile sizes of the
+        configured mode (see MODES in config.py) for this call only.
+        """
+        base_size = base_size or self.base_size
+        image_size = image_size or self.image_size
 
         # print(conversation)
         conversation = PROMPT
@@ -348,9 +463,9 @@ class DeepseekOCRProcessor(ProcessorMixin):
         # print('image: ', len(images))
         for text_sep, image in zip(text_splits, images):
             """encode text_sep"""
-            tokenized_sep = self.encode(text_sep, bos=False, eos=False)
-            tokenized_str += tokenized_sep
-            images_seq_mask += [False] * len(tokenized_sep)
+            tokenized_sep, sep_mask = encode_text_template(self.tokenizer, text_sep)
+            tokenized_str.append(tokenized_sep)
+            images_seq_mask.append(sep_mask)
 
             """select best resolution for anyres"""
             # if cropping:
@@ -368,7 +483,7 @@ class DeepseekOCRProcessor(ProcessorMixin):
                     # best_width, best_height = select_best_resolution(image.size, self.candidate_resolutions)
                     # print('image ', image.size)
                     # print('open_size:', image.size)
-                    images_crop_raw, crop_ratio = dynamic_preprocess(image, image_size=IMAGE_SIZE)
+                    images_crop_raw, crop_ratio = dynamic_preprocess_tiles(image, image_size=image_size)
                     # print('crop_ratio: ', crop_ratio)
                 else:
                     # best_width, best_height = self.image_size, self.image_size
@@ -379,13 +494,16 @@ class DeepseekOCRProcessor(ProcessorMixin):
             """process the global view"""
 
             # if cropping
-            if self.image_size <= 640 and not cropping:
+            if image_size <= 640 and not cropping:
                 # print('directly resize')
-                image = image.resize((self.image_size, self.image_size))
+                image = image.resize((image_size, image_size))
 
-            global_view = ImageOps.pad(image, (self.base_size, self.base_size),
+            global_view = ImageOps.pad(image, (base_size, base_size),
                                     color=tuple(int(x * 255) for x in self.image_transform.mean))
-            images_list.append(self.image_transform(global_view))
+            if self.uint8_pixels:
+                images_list.append(torch.from_numpy(np.array(global_view)).permute(2, 0, 1))
+            else:
+                images_list.append(self.image_transform(global_view))
 
             """record height / width crop num"""
             # width_crop_num, height_crop_num = best_width // self.image_size, best_height // self.image_size
@@ -403,8 +521,8 @@ class DeepseekOCRProcessor(ProcessorMixin):
                 #     for j in range(0, best_width, self.image_size):
                 #         images_crop_list.append(
                 #             self.image_transform(local_view.crop((j, i, j + self.image_size, i + self.image_size))))
-                for i in range(len(images_crop_raw)):
-                    images_crop_list.append(self.image_transform(images_crop_raw[i]))
+                # uint8 tile views, normalized together once copied into images_crop
+                images_crop_list.append(images_crop_raw)
 
             # """process the global view"""
             # global_view = ImageOps.pad(image, (self.image_size, self.image_size),
@@ -421,77 +539,49 @@ class DeepseekOCRProcessor(ProcessorMixin):
 
             # """add image tokens"""
             """add image tokens"""
-            num_queries = math.ceil((self.image_size // self.patch_size) / self.downsample_ratio)
-            num_queries_base = math.ceil((self.base_size // self.patch_size) / self.downsample_ratio)
-
-
-            tokenized_image = ([self.image_token_id] * num_queries_base + [self.image_token_id]) * num_queries_base
-            tokenized_image += [self.image_token_id]
-            if num_width_tiles > 1 or num_height_tiles > 1:
-                tokenized_image += ([self.image_token_id] * (num_queries * num_width_tiles) + [self.image_token_id]) * (
-                            num_queries * num_height_tiles)
-            tokenized_str += tokenized_image
-            images_seq_mask += [True] * len(tokenized_image)
+            tokenized_image, image_mask = image_token_template(
+                self.image_token_id, base_size, image_size, num_width_tiles, num_height_tiles,
+                self.patch_size, self.downsample_ratio)
+            tokenized_str.append(tokenized_image)
+            images_seq_mask.append(image_mask)
             num_image_tokens.append(len(tokenized_image))
 
         """process the last text split"""
-        tokenized_sep = self.encode(text_splits[-1], bos=False, eos=False)
-        tokenized_str += tokenized_sep
-        images_seq_mask += [False] * len(tokenized_sep)
+        tokenized_sep, sep_mask = encode_text_template(self.tokenizer, text_splits[-1])
+        tokenized_str.append(tokenized_sep)
+        images_seq_mask.append(sep_mask)
 
-        """add the bos and eos tokens"""
+        """add the bos token"""
+        # eos is not added: inference mode always removed it again, and
+        # target_ids (the training labels) are not part of the output
         if bos:
-            tokenized_str = [self.bos_id] + tokenized_str
-            images_seq_mask = [False] + images_seq_mask
-        if eos:
-            tokenized_str = tokenized_str + [self.eos_id]
-            images_seq_mask = images_seq_mask + [False]
+            tokenized_str.insert(0, torch.LongTensor([self.bos_id]))
+            images_seq_mask.insert(0, torch.zeros(1, dtype=torch.bool))
 
-        assert len(tokenized_str) == len(
-            images_seq_mask), f"tokenize_with_images func: tokenized_str's length {len(tokenized_str)} is not equal to imags_seq_mask's length {len(images_seq_mask)}"
-        
-
-
-        masked_tokenized_str = []
-        for token_index in tokenized_str:
-            if token_index != self.image_token_id:
-                masked_tokenized_str.append(token_index)
-            else:
-                masked_tokenized_str.append(self.ignore_id)
-
-        assert len(tokenized_str) == len(images_seq_mask) == len(masked_tokenized_str), \
-            (f"tokenized_str's length {len(tokenized_str)}, input_ids' length {len(masked_tokenized_str)}, "
-             f"imags_seq_mask's length {len(images_seq_mask)}, are not equal")
-
-        input_ids = torch.LongTensor(tokenized_str)
-        target_ids = torch.LongTensor(masked_tokenized_str)
-        images_seq_mask = torch.tensor(images_seq_mask, dtype=torch.bool)
-
-        # set input_ids < 0 | input_ids == self.image_token_id as ignore_id
-        target_ids[(input_ids < 0) |
-                   (input_ids == self.image_token_id)] = self.ignore_id
+        # the cached templates are shared, torch.cat copies them
+        input_ids = torch.cat(tokenized_str)
+        images_seq_mask = torch.cat(images_seq_mask)
         input_ids[input_ids < 0] = self.pad_id
 
-        inference_mode = True
-
-        if inference_mode:
-            # Remove the ending eos token
-            assert input_ids[-1] == self.eos_id
-            input_ids = input_ids[:-1]
-            target_ids = target_ids[:-1]
-            images_seq_mask = images_seq_mask[:-1]
-
+        pixel_dtype = torch.uint8 if self.uint8_pixels else torch.float32
         if len(images_list) == 0:
-            pixel_values = torch.zeros((1, 3, self.base_size, self.base_size))
+            pixel_values = torch.zeros((1, 3, base_size, base_size), dtype=pixel_dtype)
             images_spatial_crop = torch.zeros((1, 1), dtype=torch.long)
-            images_crop = torch.zeros((1, 3, self.image_size, self.image_size)).unsqueeze(0)
+            images_crop = torch.zeros((1, 3, image_size, image_size), dtype=pixel_dtype).unsqueeze(0)
         else:
             pixel_values = torch.stack(images_list, dim=0)
             images_spatial_crop = torch.tensor(images_spatial_crop, dtype=torch.long)
             if images_crop_list:
-                images_crop = torch.stack(images_crop_list, dim=0).unsqueeze(0)
+                num_tiles = [tiles.shape[0] * tiles.shape[1] for tiles in images_crop_list]
+                images_crop = torch.empty((1, sum(num_tiles), 3, image_size, image_size), dtype=pixel_dtype)
+                start = 0
+                for tiles, count in zip(images_crop_list, num_tiles):
+                    images_crop[0, start:start + count].view(tiles.shape).copy_(tiles)
+                    start += count
+                if not self.uint8_pixels:
+                    self.image_transform.normalize_(images_crop)
             else:
-                images_crop = torch.zeros((1, 3, self.image_size, self.image_size)).unsqueeze(0)
+                images_crop = torch.zeros((1, 3, image_size, image_size), dtype=pixel_dtype).unsqueeze(0)
 
         input_ids = input_ids.unsqueeze(0)
 
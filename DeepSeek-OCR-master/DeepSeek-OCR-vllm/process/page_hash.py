@@ -0,0 +1,97 @@
+"""Repeated page detection (identical forms, re-scanned pages, repeated cover sheets).
+
+A page is identified exactly by a digest of its content and approximately by a
+dHash: the page is reduced to a (HASH_SIZE + 1) x HASH_SIZE grayscale grid and
+every horizontally adjacent pair of cells gives one bit, set where brightness
+rises. Re-encoded or re-rendered copies land within a few bits of each other.
+
+A perceptual hash only sees layout, not small print: copies of one form filled
+in with different values are within ~1% of each other. Near matches are
+therefore opt-in (exact_only=False) for collections where that cannot happen.
+"""
+
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 16 # HASH_SIZE x HASH_SIZE bit dHash
+FLAT_DIFFERENCE = 4 # neighbouring cells closer than this (gray levels) count as flat, so paper noise does not flip bits
+MAX_DISTANCE = 8 # differing bits (of 256) of a near duplicate; JPEG re-encodes are <= 4, distinct pages >= 40
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """Difference hash of an image as a hash_size * hash_size bit integer.
+
+    Opened JPEGs that are not decoded yet are decoded at 1/2-1/8 scale
+    (Image.draft); other images are box-reduced by the same factor. A scaled
+    JPEG decode averages 8x8 blocks much like Image.reduce, so a page and its
+    JPEG re-encode stay within a few bits (a plain resize of the full decode
+    against a draft differs by ~20 on text pages).
+    """
+    size = image.size
+    request = hash_size * 4
+    image.draft('L', (request, request))
+    gray = image.convert('L') # also drops alpha, like the RGB conversion of the pipeline
+    if gray.size == size:
+        scale = min(size[0] // request, size[1] // request)
+        factor = next((s for s in (8, 4, 2) if scale >= s), 1)
+        if factor > 1:
+            gray = gray.reduce(factor)
+    grid = np.asarray(gray.resize((hash_size + 1, hash_size), Image.BOX), dtype=np.int16)
+    bits = (grid[:, 1:] - grid[:, :-1]) > FLAT_DIFFERENCE
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def content_digest(image):
+    """Digest of a decoded image's pixels (equal only for identical pages)."""
+    digest = hashlib.sha256(f'{image.mode}{image.size}'.encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(hash_a ^ hash_b).count('1')
+
+
+class PageHashIndex:
+    """Pages seen so far, looked up by exact digest or dHash distance."""
+
+    def __init__(self, max_distance=MAX_DISTANCE, exact_only=True):
+        self.max_distance = max_distance
+        self.exact_only = exact_only
+        self._digests = {}
+        self._hashes = []
+
+    def add(self, key, digest, phash=None):
+        self._digests.setdefault(digest, key)
+        if phash is not None:
+            self._hashes.append((phash, key))
+
+    def discard(self, key):
+        """Forget a page (e.g. one whose processing failed)."""
+        self._digests = {digest: other for digest, other in self._digests.items() if other != key}
+        self._hashes = [(phash, other) for phash, other in self._hashes if other != key]
+
+    def find(self, digest, phash=None):
+        """Key of an added page identical to this one (or near it, unless exact_only), else None."""
+        if digest in self._digests:
+            return self._digests[digest]
+        if self.exact_only or phash is None or not self._hashes:
+            return None
+        distance, key = min((hamming_distance(phash, other), key) for other, key in self._hashes)
+        return key if distance <= self.max_distance else None
+
+
+def find_duplicates(images, max_distance=MAX_DISTANCE, exact_only=True):
+    """For each decoded image, the index of an earlier image it repeats, or None."""
+    index = PageHashIndex(max_distance, exact_only)
+    duplicates = []
+    for idx, image in enumerate(images):
+        digest = content_digest(image)
+        phash = None if exact_only else dhash(image)
+        source = index.find(digest, phash)
+        if source is None:
+            index.add(idx, digest, phash)
+        duplicates.append(source)
+    return duplicates
@@ -10,14 +10,14 @@ os.environ["CUDA_VISIBLE_DEVICES"] = '0'
 from config import MODEL_PATH, INPUT_PATH, OUTPUT_PATH, PROMPT, MAX_CONCURRENCY, CROP_MODE, NUM_WORKERS
 from concurrent.futures import ThreadPoolExecutor
 import glob
-from PIL import Image
+from PIL import Image, ImageOps
 from deepseek_ocr import DeepseekOCRForCausalLM
 
 from vllm.model_executor.models.registry import ModelRegistry
 
 from vllm import LLM, SamplingParams
 from process.ngram_norepeat import NoRepeatNGramLogitsProcessor
-from process.image_process import DeepseekOCRProcessor
+from process.image_process import DeepseekOCRProcessor, decode_reduced
 ModelRegistry.register_model("DeepseekOCRForCausalLM", DeepseekOCRForCausalLM)
 
 
@@ -103,7 +103,8 @@ if __name__ == "__main__":
     images = []
 
     for image_path in images_path:
-        image = Image.open(image_path).convert('RGB')
+        # decoded only as large as BASE_SIZE / IMAGE_SIZE tiles need
+        image = ImageOps.exif_transpose(decode_reduced(Image.open(image_path))).convert('RGB')
         images.append(image)
 
     prompt = PROMPT
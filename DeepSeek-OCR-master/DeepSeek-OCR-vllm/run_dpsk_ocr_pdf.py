@@ -14,7 +14,7 @@ os.environ['VLLM_USE_V1'] = '0'
 os.environ["CUDA_VISIBLE_DEVICES"] = '0'
 
 
-from config import MODEL_PATH, INPUT_PATH, OUTPUT_PATH, PROMPT, SKIP_REPEAT, MAX_CONCURRENCY, NUM_WORKERS, CROP_MODE
+from config import MODEL_PATH, INPUT_PATH, OUTPUT_PATH, PROMPT, SKIP_REPEAT, SKIP_BLANK_PAGES, DEDUP_PAGES, DEDUP_EXACT_ONLY, DEDUP_MAX_DISTANCE, MAX_CONCURRENCY, NUM_WORKERS, CROP_MODE
 
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
@@ -25,6 +25,8 @@ from vllm.model_executor.models.registry import ModelRegistry
 from vllm import LLM, SamplingParams
 from process.ngram_norepeat import NoRepeatNGramLogitsProcessor
 from process.image_process import DeepseekOCRProcessor
+from process.blank_page import is_blank_page
+from process.page_hash import find_duplicates
 
 ModelRegistry.register_model("DeepseekOCRForCausalLM", DeepseekOCRForCausalLM)
 
@@ -243,12 +245,25 @@ if __name__ == "__main__":
 
     prompt = PROMPT
 
+    # blank pages get empty output and never reach the model
+    with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+        blank_pages = list(executor.map(is_blank_page, images)) if SKIP_BLANK_PAGES else [False] * len(images)
+    if any(blank_pages):
+        print(f'{Colors.YELLOW}skipping {sum(blank_pages)} blank pages{Colors.RESET}')
+
+    # repeated pages reuse the output of the page they repeat
+    duplicate_of = find_duplicates(images, DEDUP_MAX_DISTANCE, DEDUP_EXACT_ONLY) if DEDUP_PAGES else [None] * len(images)
+    for page, source in enumerate(duplicate_of):
+        if source is not None:
+            print(f'{Colors.YELLOW}page {page + 1} reuses page {source + 1}{Colors.RESET}')
+    pages = [page for page, (blank, source) in enumerate(zip(blank_pages, duplicate_of)) if not blank and source is None]
+
     # batch_inputs = []
 
     with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:  
         batch_inputs = list(tqdm(
-            executor.map(process_single_image, images),
-            total=len(images),
+            executor.map(process_single_image, [images[page] for page in pages]),
+            total=len(pages),
             desc="Pre-processed images"
         ))
 
@@ -283,10 +298,15 @@ if __name__ == "__main__":
     contents = ''
     draw_images = []
     jdx = 0
-    for output, img in zip(outputs_list, images):
-        content = output.outputs[0].text
-
-        if '<｜end▁of▁sentence｜>' in content: # repeat no eos
+    texts = {page: output.outputs[0].text for page, output in zip(pages, outputs_list)}
+    for page, img in enumerate(images):
+        source = page if duplicate_of[page] is None else duplicate_of[page]
+        blank = blank_pages[source]
+        content = '' if blank else texts[source]
+
+        if blank:
+            pass
+        elif '<｜end▁of▁sentence｜>' in content: # repeat no eos
             content = content.replace('<｜end▁of▁sentence｜>', '')
         else:
             if SKIP_REPEAT:
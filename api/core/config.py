@@ -5,9 +5,9 @@ Uses pydantic-settings for environment variable management.
 
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
-from pydantic import Field, field_validator
+from pydantic import Field, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -74,7 +74,8 @@ class Settings(BaseSettings):
     )
     workers: int = Field(
         default=1,
-        description="Number of workers (must be 1 for GPU efficiency)",
+        ge=1,
+        description="Number of workers (must be 1 unless ENGINE_ADDRESS points to an engine process)",
     )
 
     # File upload limits
@@ -86,6 +87,237 @@ class Settings(BaseSettings):
         default={"png", "jpg", "jpeg", "gif", "bmp", "tiff", "webp"},
         description="Allowed image file extensions",
     )
+    max_image_pixels: int = Field(
+        default=64 * 1024 * 1024,
+        ge=1,
+        description="Maximum width x height of an uploaded image, checked from its header",
+    )
+    max_batch_files: int = Field(
+        default=32,
+        ge=1,
+        description="Maximum number of files accepted by the batch OCR endpoint",
+    )
+    max_prompts_per_image: int = Field(
+        default=16,
+        ge=1,
+        description="Maximum number of prompts accepted by the multi-prompt OCR endpoint",
+    )
+
+    # PDF processing
+    max_pdf_size: int = Field(
+        default=100 * 1024 * 1024,  # 100 MB
+        description="Maximum PDF upload size in bytes",
+    )
+    max_pdf_pages: int = Field(
+        default=500,
+        ge=1,
+        description="Maximum number of pages processed from one PDF",
+    )
+    pdf_dpi: int = Field(
+        default=144,
+        ge=36,
+        le=600,
+        description="Resolution at which PDF pages are rasterized",
+    )
+    pdf_page_concurrency: int = Field(
+        default=16,
+        ge=1,
+        description="Pages of one PDF rendered and generated at the same time",
+    )
+
+    # Request lifecycle
+    request_timeout: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Default per-request deadline in seconds (None = no deadline)",
+    )
+    disconnect_poll_interval: float = Field(
+        default=0.5,
+        gt=0,
+        description="Seconds between client-disconnect checks while a request is running",
+    )
+
+    # Admission control (token budget in front of the engine)
+    admission_token_budget: int = Field(
+        default=262144,
+        ge=0,
+        description=(
+            "Maximum outstanding cost (vision tokens + max_tokens) admitted to the "
+            "engine at once (0 = unlimited)"
+        ),
+    )
+    admission_max_queue: int = Field(
+        default=64,
+        ge=0,
+        description="Maximum requests waiting for budget before new ones get 429",
+    )
+    admission_queue_timeout: float = Field(
+        default=30.0,
+        ge=0,
+        description="Seconds a request may wait for budget before it gets 429",
+    )
+    admission_retry_after: int = Field(
+        default=5,
+        ge=1,
+        description="Retry-After value in seconds sent with 429 responses",
+    )
+    admission_interactive_reserve: float = Field(
+        default=0.25,
+        ge=0.0,
+        lt=1.0,
+        description=(
+            "Fraction of the token budget kept free for interactive requests; "
+            "background job pages only use the remainder"
+        ),
+    )
+
+    # Scheduling lanes (weighted fair queuing in front of the engine)
+    scheduler_interactive_weight: float = Field(
+        default=4.0,
+        gt=0,
+        description="Share weight of each interactive lane while lanes compete for budget",
+    )
+    scheduler_bulk_weight: float = Field(
+        default=1.0,
+        gt=0,
+        description="Share weight of each bulk (background job) lane",
+    )
+    scheduler_max_tenant_lanes: int = Field(
+        default=16,
+        ge=0,
+        description=(
+            "Tenant lanes (X-Tenant-ID values) per request class scheduled separately at "
+            "once; further tenants share the class lane. 0 ignores the header"
+        ),
+    )
+    scheduler_interactive_priority: int = Field(
+        default=0,
+        description="vLLM priority of interactive requests (lower runs first)",
+    )
+    scheduler_bulk_priority: int = Field(
+        default=10,
+        description="vLLM priority of bulk requests (lower runs first)",
+    )
+    engine_scheduling_policy: Literal["fcfs", "priority"] = Field(
+        default="fcfs",
+        description="vLLM scheduling policy; 'priority' honours the lane priorities above",
+    )
+    engine_enable_prefix_caching: bool = Field(
+        default=False,
+        description=(
+            "Share KV-cache blocks of identical prompt prefixes (e.g. one image under several "
+            "prompts). The V0 engine ignores it for multimodal models"
+        ),
+    )
+
+    # Result cache
+    cache_enabled: bool = Field(
+        default=True,
+        description="Cache raw outputs of deterministic (temperature 0) requests",
+    )
+    cache_memory_max_bytes: int = Field(
+        default=256 * 1024 * 1024,  # 256 MB
+        ge=0,
+        description="Size limit of the in-memory LRU tier (0 disables it)",
+    )
+    cache_dir: Optional[str] = Field(
+        default=None,
+        description="Directory of the on-disk tier, may be shared by several processes (None disables it)",
+    )
+    cache_disk_max_bytes: int = Field(
+        default=2 * 1024 * 1024 * 1024,  # 2 GB
+        ge=0,
+        description="Size limit of the on-disk tier",
+    )
+
+    # Preprocessing worker pool
+    preprocess_executor: Literal["thread", "process"] = Field(
+        default="thread",
+        description="Executor type for image decode/tiling ('thread' or 'process')",
+    )
+    preprocess_workers: int = Field(
+        default=4,
+        ge=1,
+        description="Number of preprocessing workers, each holding a warm DeepseekOCRProcessor",
+    )
+    preprocess_queue_size: int = Field(
+        default=64,
+        ge=0,
+        description="Maximum number of images waiting for a free preprocessing worker",
+    )
+    blank_page_detection: bool = Field(
+        default=True,
+        description=(
+            "Answer blank pages of document requests (default prompt) with an empty result "
+            "without running the model"
+        ),
+    )
+    blank_page_max_ink_ratio: float = Field(
+        default=0.0005,
+        ge=0.0,
+        le=1.0,
+        description=(
+            "Share of ink pixels (on a 512px grayscale thumbnail) up to which a page "
+            "counts as blank; a lone page number is ~0.0001, one line of text ~0.0025"
+        ),
+    )
+    preprocess_reduced_decode: bool = Field(
+        default=True,
+        description=(
+            "Decode oversized images (JPEG DCT scaling, otherwise integer box reduction) "
+            "near the size the resolution mode reads them at instead of at full resolution"
+        ),
+    )
+    preprocess_uint8_pixels: bool = Field(
+        default=False,
+        description=(
+            "Pass pixel tensors to the engine as uint8 and normalize them on the GPU "
+            "(4x less host memory and IPC traffic per image)"
+        ),
+    )
+
+    # Background jobs
+    jobs_enabled: bool = Field(
+        default=True,
+        description="Run the background job worker for /api/v1/jobs",
+    )
+    jobs_dir: str = Field(
+        default="data/jobs",
+        description="Directory holding the SQLite job store and uploaded job inputs",
+    )
+    max_job_files: int = Field(
+        default=1000,
+        ge=1,
+        description="Maximum number of images accepted by one job",
+    )
+    job_page_concurrency: int = Field(
+        default=32,
+        ge=1,
+        description="Job pages the worker keeps in flight to keep the engine saturated",
+    )
+    job_poll_interval: float = Field(
+        default=2.0,
+        gt=0,
+        description="Seconds the job worker sleeps when there is no pending work",
+    )
+    job_dedup_enabled: bool = Field(
+        default=True,
+        description="Reuse the result of an earlier page of the same job that the page repeats",
+    )
+    job_dedup_exact_only: bool = Field(
+        default=True,
+        description=(
+            "Only reuse results of byte-identical pages. Set to false to also match near "
+            "duplicates by perceptual hash; such hashes cannot tell apart copies of one form "
+            "filled in with different values"
+        ),
+    )
+    job_dedup_max_distance: int = Field(
+        default=8,
+        ge=0,
+        le=256,
+        description="Differing bits (of a 256-bit dHash) up to which a page is a near duplicate",
+    )
 
     # Logging
     log_level: str = Field(
@@ -98,17 +330,77 @@ class Settings(BaseSettings):
         default=None,
         description="CUDA visible devices (e.g., '0,1,2,3')",
     )
+    engine_replica_devices: Optional[str] = Field(
+        default=None,
+        description=(
+            "Run one engine replica process per ';'-separated device list "
+            "(e.g., '0;1;2;3' for four single-GPU replicas, '0,1;2,3' for two TP=2 replicas)"
+        ),
+    )
 
-    @field_validator("workers")
-    @classmethod
-    def validate_workers(cls, v: int) -> int:
-        """Ensure workers is set to 1 for GPU efficiency."""
-        if v != 1:
+    warmup_enabled: bool = Field(
+        default=True,
+        description=(
+            "Run one synthetic image per crop-ratio bucket through the pipeline "
+            "before reporting ready"
+        ),
+    )
+    warmup_max_tokens: int = Field(
+        default=16,
+        ge=1,
+        description="Tokens generated per warmup image",
+    )
+    engine_startup_retry_after: int = Field(
+        default=10,
+        ge=1,
+        description="Retry-After value in seconds sent with 503 responses while the engine loads",
+    )
+
+    # Separate engine process (python -m api.engine_server)
+    engine_address: Optional[str] = Field(
+        default=None,
+        description=(
+            "Unix socket path or host:port of the engine process. The engine server "
+            "listens here; API workers connect to it instead of loading the model"
+        ),
+    )
+    engine_authkey: Optional[str] = Field(
+        default=None,
+        description=(
+            "Shared secret authenticating API workers to the engine process "
+            "(required for a host:port engine_address)"
+        ),
+    )
+    engine_connect_timeout: float = Field(
+        default=600.0,
+        gt=0,
+        description="Seconds an API worker waits for the engine process to start listening",
+    )
+
+    @model_validator(mode="after")
+    def validate_workers(self) -> "Settings":
+        """Ensure workers is 1 unless the engine runs in its own process."""
+        if self.workers != 1 and not self.engine_address:
             raise ValueError(
                 "workers must be 1 to avoid duplicating GPU memory usage. "
-                "Use async concurrency within a single worker instead."
+                "Use async concurrency within a single worker, or set engine_address "
+                "and run the engine with 'python -m api.engine_server'."
             )
-        return v
+        return self
+
+    @model_validator(mode="after")
+    def validate_engine_authkey(self) -> "Settings":
+        """Require an authkey when the engine listens on TCP (connections carry pickles)."""
+        if self.engine_address and not self.engine_authkey:
+            # Same rule as engine_backend.parse_address: 'host:port' is TCP
+            host, _, port = self.engine_address.rpartition(":")
+            if host and port.isdigit():
+                raise ValueError(
+                    "engine_authkey must be set when engine_address is a TCP address. "
+                    "Messages are pickled, so anyone reaching the port could run code "
+                    "in the engine process; only a Unix socket path may omit it."
+                )
+        return self
 
     @field_validator("gpu_memory_utilization")
     @classmethod
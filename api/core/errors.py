@@ -17,14 +17,39 @@ class DeepSeekOCRError(Exception):
         self.message = message
         self.status_code = status_code
         self.details = details or {}
+        # Extra HTTP response headers (e.g. Retry-After)
+        self.headers: dict[str, str] = {}
         super().__init__(self.message)
 
+    def __reduce__(self):
+        # Subclasses have differing __init__ signatures; rebuild from state so
+        # errors survive the trip back from process-pool workers.
+        return (_rebuild_error, (type(self), self.message, self.status_code, self.details))
+
+
+def _rebuild_error(
+    cls: type,
+    message: str,
+    status_code: int,
+    details: dict[str, Any],
+) -> DeepSeekOCRError:
+    """Recreate a pickled DeepSeekOCRError without calling its __init__."""
+    error = cls.__new__(cls)
+    DeepSeekOCRError.__init__(error, message=message, status_code=status_code, details=details)
+    return error
+
 
 class ModelNotLoadedError(DeepSeekOCRError):
     """Raised when attempting to use the model before it's loaded."""
 
-    def __init__(self, message: str = "Model has not been loaded yet") -> None:
+    def __init__(
+        self,
+        message: str = "Model has not been loaded yet",
+        retry_after: Optional[int] = None,
+    ) -> None:
         super().__init__(message=message, status_code=503)
+        if retry_after is not None:
+            self.headers["Retry-After"] = str(retry_after)
 
 
 class ImageProcessingError(DeepSeekOCRError):
@@ -82,3 +107,89 @@ class UnsupportedFileTypeError(DeepSeekOCRError):
     ) -> None:
         details = {"allowed_types": list(allowed_types)} if allowed_types else {}
         super().__init__(message=message, status_code=400, details=details)
+
+
+class ServerBusyError(DeepSeekOCRError):
+    """Raised when the server is at capacity and cannot accept more work."""
+
+    def __init__(
+        self,
+        message: str = "Server is busy, please retry later",
+        details: Optional[dict[str, Any]] = None,
+        retry_after: Optional[int] = None,
+    ) -> None:
+        super().__init__(message=message, status_code=503, details=details)
+        if retry_after is not None:
+            self.headers["Retry-After"] = str(retry_after)
+
+
+class AdmissionRejectedError(DeepSeekOCRError):
+    """Raised when the outstanding token budget is exhausted (backpressure)."""
+
+    def __init__(
+        self,
+        message: str = "Too many requests in flight, please retry later",
+        retry_after: int = 1,
+        details: Optional[dict[str, Any]] = None,
+    ) -> None:
+        super().__init__(message=message, status_code=429, details=details)
+        self.headers["Retry-After"] = str(retry_after)
+
+
+class RequestTimeoutError(DeepSeekOCRError):
+    """Raised when a request's deadline expires before it completes."""
+
+    def __init__(
+        self,
+        message: str = "Request deadline exceeded",
+        details: Optional[dict[str, Any]] = None,
+    ) -> None:
+        super().__init__(message=message, status_code=504, details=details)
+
+
+class ClientDisconnectedError(DeepSeekOCRError):
+    """Raised when the HTTP client disconnects before its request completes."""
+
+    def __init__(
+        self,
+        message: str = "Client disconnected",
+        details: Optional[dict[str, Any]] = None,
+    ) -> None:
+        super().__init__(message=message, status_code=499, details=details)
+
+
+class JobNotFoundError(DeepSeekOCRError):
+    """Raised when a background job ID is unknown."""
+
+    def __init__(self, job_id: str) -> None:
+        super().__init__(
+            message=f"Job '{job_id}' not found",
+            status_code=404,
+            details={"job_id": job_id},
+        )
+
+
+class JobNotFinishedError(DeepSeekOCRError):
+    """Raised when the result of a background job is requested before it finishes."""
+
+    def __init__(self, job_id: str, status: str) -> None:
+        super().__init__(
+            message=f"Job '{job_id}' has not finished yet",
+            status_code=409,
+            details={"job_id": job_id, "status": status},
+        )
+
+
+def error_payload(e: Exception) -> dict[str, Any]:
+    """Build the standard error payload for an exception raised while processing."""
+    if isinstance(e, DeepSeekOCRError):
+        return {
+            "error": e.message,
+            "details": e.details,
+            "status_code": e.status_code,
+        }
+    return {
+        "error": "An unexpected error occurred",
+        "details": {"error": str(e)},
+        "status_code": 500,
+    }
@@ -0,0 +1,196 @@
+"""
+Prometheus metrics for the DeepSeek-OCR API.
+
+All collectors are registered on the default prometheus_client registry and
+exposed by the /metrics endpoint.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Latency buckets (seconds) spanning CPU stages of a few ms up to long decodes
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Requests
+REQUESTS_IN_FLIGHT = Gauge(
+    "ocr_requests_in_flight",
+    "OCR requests currently being processed (including cache hits and coalesced requests)",
+)
+REQUEST_DURATION = Histogram(
+    "ocr_request_duration_seconds",
+    "End-to-end processing time of successful OCR requests",
+    buckets=STAGE_BUCKETS,
+)
+VISION_TOKENS = Histogram(
+    "ocr_vision_tokens",
+    "Vision tokens per generated image",
+    buckets=(100, 273, 400, 600, 800, 1000, 1200, 1600, 2000, 3000, 4000),
+)
+VISION_TOKENS_IN_FLIGHT = Gauge(
+    "ocr_vision_tokens_in_flight",
+    "Vision tokens of images currently admitted to the engine",
+)
+AUTO_MODE_SELECTED = Counter(
+    "ocr_auto_mode_selected_total",
+    "Resolution modes picked for requests in auto mode",
+    ["mode"],
+)
+BLANK_PAGES_SKIPPED = Counter(
+    "ocr_blank_pages_skipped_total",
+    "Blank pages answered with an empty result without running the model",
+)
+
+# Pipeline stages
+PREPROCESS_STAGE_SECONDS = Histogram(
+    "ocr_preprocess_stage_seconds",
+    "Time spent in each ImagePreprocessor stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+POSTPROCESS_SECONDS = Histogram(
+    "ocr_postprocess_seconds",
+    "Time spent in OutputPostprocessor.postprocess",
+    buckets=STAGE_BUCKETS,
+)
+
+# Engine
+ENGINE_QUEUE_SECONDS = Histogram(
+    "ocr_engine_queue_seconds",
+    "Time requests waited in the vLLM scheduler before first being scheduled",
+    buckets=STAGE_BUCKETS,
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "ocr_time_to_first_token_seconds",
+    "Time from engine submission to the first generated token",
+    buckets=STAGE_BUCKETS,
+)
+DECODE_TOKENS_PER_SECOND = Histogram(
+    "ocr_decode_tokens_per_second",
+    "Per-request decode throughput after the first token",
+    buckets=(5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500),
+)
+GENERATED_TOKENS = Histogram(
+    "ocr_generated_tokens",
+    "Output tokens per completed generation",
+    buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192),
+)
+PREFIX_CACHE_HIT_TOKENS = Counter(
+    "ocr_prefix_cache_hit_tokens_total",
+    "Prompt tokens whose KV cache was reused from the vLLM prefix cache",
+)
+
+# Preprocessing worker pool
+PREPROCESS_QUEUE_DEPTH = Gauge(
+    "ocr_preprocess_queue_depth",
+    "Images waiting for a free preprocessing worker",
+)
+PREPROCESS_ACTIVE = Gauge(
+    "ocr_preprocess_active_workers",
+    "Preprocessing workers currently busy",
+)
+PREPROCESS_REJECTED = Counter(
+    "ocr_preprocess_rejected_total",
+    "Images rejected because the preprocessing queue was full",
+)
+
+# Request lifecycle
+REQUESTS_ABORTED = Counter(
+    "ocr_requests_aborted_total",
+    "Generations aborted in the engine before completion",
+    ["reason"],
+)
+ABORTED_TOKENS = Counter(
+    "ocr_aborted_generated_tokens_total",
+    "Tokens generated by requests that were later aborted (wasted decode work)",
+    ["reason"],
+)
+
+# Admission control
+ADMISSION_OUTSTANDING_TOKENS = Gauge(
+    "ocr_admission_outstanding_tokens",
+    "Estimated cost (vision + max tokens) of requests admitted to the engine",
+)
+ADMISSION_QUEUED = Gauge(
+    "ocr_admission_queued_requests",
+    "Requests waiting for token budget, by scheduling lane",
+    ["lane"],
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "ocr_admission_queue_wait_seconds",
+    "Time requests waited for token budget, by scheduling lane",
+    ["lane"],
+    buckets=STAGE_BUCKETS,
+)
+ADMISSION_LANE_OUTSTANDING_TOKENS = Gauge(
+    "ocr_admission_lane_outstanding_tokens",
+    "Admitted cost (vision + max tokens) held by each scheduling lane",
+    ["lane"],
+)
+ADMISSION_LANE_SHARE = Gauge(
+    "ocr_admission_lane_share",
+    "Fraction of the admitted cost held by each scheduling lane",
+    ["lane"],
+)
+ADMISSION_REJECTED = Counter(
+    "ocr_admission_rejected_total",
+    "Requests rejected with 429 by admission control",
+    ["reason"],
+)
+
+# Result cache
+CACHE_REQUESTS = Counter(
+    "ocr_cache_requests_total",
+    "Result cache lookups by outcome and the tier that served hits",
+    ["result", "tier"],
+)
+CACHE_ENTRIES = Gauge(
+    "ocr_cache_entries",
+    "Entries held by each result cache tier",
+    ["tier"],
+)
+CACHE_BYTES = Gauge(
+    "ocr_cache_bytes",
+    "Bytes held by each result cache tier",
+    ["tier"],
+)
+
+# Request coalescing
+COALESCED_REQUESTS = Counter(
+    "ocr_coalesced_requests_total",
+    "Requests that joined an identical in-flight generation instead of starting their own",
+)
+INFLIGHT_GENERATIONS = Gauge(
+    "ocr_coalescer_inflight_generations",
+    "Distinct coalescable generations currently in flight",
+)
+
+# Background jobs
+JOB_ITEMS_IN_FLIGHT = Gauge(
+    "ocr_job_items_in_flight",
+    "Job pages or images currently being processed by the job worker",
+)
+JOB_ITEMS_PROCESSED = Counter(
+    "ocr_job_items_processed_total",
+    "Job pages or images processed, by outcome",
+    ["result"],
+)
+JOB_DUPLICATE_ITEMS = Counter(
+    "ocr_job_duplicate_items_total",
+    "Job pages or images that reused the result of a repeated earlier page of the job",
+)
+
+# Engine replicas
+ENGINE_REPLICA_OUTSTANDING_TOKENS = Gauge(
+    "ocr_engine_replica_outstanding_tokens",
+    "Estimated tokens (vision + max tokens) of requests running on each engine replica",
+    ["replica"],
+)
+ENGINE_STARTUP_PHASE_SECONDS = Gauge(
+    "ocr_engine_startup_phase_seconds",
+    "Duration of each engine start-up phase (model load, memory profiling, CUDA graph capture)",
+    ["replica", "phase"],
+)
+ENGINE_WARMUP_SECONDS = Gauge(
+    "ocr_engine_warmup_seconds",
+    "Time of the start-up warmup request for each crop-ratio bucket",
+    ["bucket"],
+)
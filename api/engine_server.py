@@ -0,0 +1,125 @@
+"""
+Engine-owner process for multi-worker deployments.
+
+Loads the model once (a single engine or ENGINE_REPLICA_DEVICES replicas) and
+serves generation requests from any number of API workers over
+ENGINE_ADDRESS. Workers keep upload handling and image preprocessing, so
+that CPU work scales with the number of workers while GPU memory is
+allocated only in this process:
+
+    python -m api.engine_server
+    WORKERS=4 ENGINE_ADDRESS=/tmp/deepseek-ocr-engine.sock uvicorn api.main:app --workers 4
+"""
+
+import asyncio
+import os
+import signal
+import threading
+from multiprocessing.connection import Listener
+from typing import Any
+
+import torch
+
+from api.core.config import settings
+from api.core.logging import get_logger, setup_logging
+from api.services.engine_backend import parse_address, serve_connection
+from api.services.engine_manager import EngineManager
+
+setup_logging()
+logger = get_logger(__name__)
+
+
+def _accept(listener: Listener, loop: asyncio.AbstractEventLoop, connections: asyncio.Queue) -> None:
+    """Accept worker connections and hand them to the event loop (runs in a thread)."""
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError:
+            # Listener closed at shutdown
+            return
+        except Exception as e:
+            # Failed authentication or a broken handshake; keep serving others
+            logger.warning(f"Rejected engine client: {e}")
+            continue
+        loop.call_soon_threadsafe(connections.put_nowait, conn)
+
+
+def _startup_phases() -> dict[str, float]:
+    """Start-up phases reported to workers (prefixed by replica when there are several)."""
+    phases = EngineManager.startup_status()["phases"]
+    if len(phases) == 1:
+        return next(iter(phases.values()))
+    return {
+        f"{name}.{phase}": seconds
+        for name, backend_phases in phases.items()
+        for phase, seconds in backend_phases.items()
+    }
+
+
+async def _serve_worker(conn: Any) -> None:
+    """Serve one API worker until it disconnects."""
+    logger.info("API worker connected")
+    try:
+        conn.send(("ready", _startup_phases()))
+        await serve_connection(conn, EngineManager.lease)
+    except (OSError, EOFError):
+        pass
+    finally:
+        conn.close()
+        logger.info("API worker disconnected")
+
+
+async def serve() -> None:
+    """Load the engine, then serve workers until SIGINT/SIGTERM."""
+    if not settings.engine_address:
+        raise SystemExit("ENGINE_ADDRESS must be set to run the engine server")
+
+    # Set TRITON_PTXAS_PATH for CUDA 11.8
+    if torch.version.cuda == "11.8":
+        os.environ["TRITON_PTXAS_PATH"] = "/usr/local/cuda-11.8/bin/ptxas"
+
+    # Set vLLM version flag
+    os.environ["VLLM_USE_V1"] = "0"
+
+    # API workers run the warmup through this engine once they connect,
+    # which also warms their own preprocessing workers
+    await EngineManager.initialize(EngineManager.local_backends(), warmup=False)
+
+    address = parse_address(settings.engine_address)
+    if isinstance(address, str) and os.path.exists(address):
+        # Stale socket from a previous run
+        os.unlink(address)
+    authkey = settings.engine_authkey.encode() if settings.engine_authkey else None
+    listener = Listener(address, authkey=authkey)
+    logger.info(f"Engine server listening on {settings.engine_address}")
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    connections: asyncio.Queue = asyncio.Queue()
+    threading.Thread(target=_accept, args=(listener, loop, connections), daemon=True).start()
+    workers: set[asyncio.Task] = set()
+
+    async def accept_loop() -> None:
+        while True:
+            task = asyncio.create_task(_serve_worker(await connections.get()))
+            workers.add(task)
+            task.add_done_callback(workers.discard)
+
+    acceptor = asyncio.create_task(accept_loop())
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Engine server shutting down...")
+        acceptor.cancel()
+        listener.close()
+        for task in list(workers):
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await EngineManager.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
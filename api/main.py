@@ -5,6 +5,7 @@ This module provides a REST API for performing OCR on images using
 the DeepSeek-OCR model with vLLM AsyncEngine.
 """
 
+import asyncio
 import os
 from contextlib import asynccontextmanager
 
@@ -14,21 +15,45 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from api.core.config import settings
 from api.core.logging import get_logger, setup_logging
-from api.routers import health, ocr
+from api.routers import health, jobs, metrics, ocr
 from api.services.engine_manager import EngineManager
+from api.services.jobs import JobManager
+from api.services.preprocess_pool import PreprocessPool
+from api.services.result_cache import ResultCache
 
 # Setup logging before anything else
 setup_logging()
 logger = get_logger(__name__)
 
 
+async def start_engine() -> None:
+    """Load the engine in the background, then start work that needs it."""
+    try:
+        # Initialize the engine (this takes ~27s), or connect to the engine process
+        await EngineManager.initialize()
+    except Exception as e:
+        # Logged by EngineManager; /health/live now reports the failure
+        logger.error(f"Engine start-up failed, server cannot run inference: {e}")
+        return
+
+    # Resume queued background jobs once the engine can serve them
+    if settings.jobs_enabled:
+        JobManager.start()
+
+    logger.info("=" * 80)
+    logger.info("DeepSeek-OCR API Server Ready")
+    logger.info("=" * 80)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Lifespan context manager for FastAPI application.
 
     Handles startup and shutdown events:
-    - Startup: Initialize vLLM AsyncEngine (singleton)
+    - Startup: Start preprocessing pool and result cache, then initialize the vLLM
+      AsyncEngine (singleton) and the background job worker in the background, so
+      the server accepts connections (health checks, cached results) meanwhile
     - Shutdown: Cleanup resources
     """
     # Startup: Initialize the engine
@@ -36,6 +61,7 @@ async def lifespan(app: FastAPI):
     logger.info("DeepSeek-OCR API Server Starting...")
     logger.info("=" * 80)
 
+    engine_startup = None
     try:
         # Set TRITON_PTXAS_PATH for CUDA 11.8
         if torch.version.cuda == "11.8":
@@ -52,14 +78,25 @@ async def lifespan(app: FastAPI):
         logger.info(f"Tensor parallel size: {settings.tensor_parallel_size}")
         logger.info(f"Workers: {settings.workers}")
         logger.info(f"CUDA devices: {os.environ.get('CUDA_VISIBLE_DEVICES', 'not set')}")
-
-        # Initialize the engine (this takes ~27s)
-        await EngineManager.initialize()
-
-        logger.info("=" * 80)
-        logger.info("DeepSeek-OCR API Server Ready")
-        logger.info(f"Listening on {settings.api_host}:{settings.api_port}")
-        logger.info("=" * 80)
+        logger.info(
+            f"Preprocessing: {settings.preprocess_executor} x {settings.preprocess_workers}"
+        )
+        if settings.engine_address:
+            logger.info(f"Engine process: {settings.engine_address}")
+        elif settings.engine_replica_devices:
+            logger.info(f"Engine replicas (CUDA devices): {settings.engine_replica_devices}")
+
+        # Start preprocessing workers (warms one DeepseekOCRProcessor each)
+        PreprocessPool.start()
+
+        # Open result cache tiers (scans the shared disk tier once)
+        ResultCache.configure()
+
+        engine_startup = asyncio.create_task(start_engine())
+        logger.info(
+            f"Listening on {settings.api_host}:{settings.api_port} "
+            "(engine loading, see /health/ready)"
+        )
 
         yield
 
@@ -69,7 +106,13 @@ async def lifespan(app: FastAPI):
         logger.info("DeepSeek-OCR API Server Shutting Down...")
         logger.info("=" * 80)
 
+        if engine_startup is not None and not engine_startup.done():
+            engine_startup.cancel()
+            await asyncio.gather(engine_startup, return_exceptions=True)
+        if settings.jobs_enabled:
+            await JobManager.stop()
         await EngineManager.shutdown()
+        PreprocessPool.shutdown()
 
         logger.info("Shutdown complete")
         logger.info("=" * 80)
@@ -105,7 +148,10 @@ app.add_middleware(
 
 # Include routers
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(ocr.router)
+if settings.jobs_enabled:
+    app.include_router(jobs.router)
 
 
 @app.get("/", tags=["root"])
@@ -117,6 +163,9 @@ async def root():
         "status": "running",
         "docs": "/docs",
         "health": "/health",
+        "liveness": "/health/live",
+        "readiness": "/health/ready",
+        "metrics": "/metrics",
         "model_info": "/models",
     }
 
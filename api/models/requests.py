@@ -15,6 +15,17 @@ class OCRType(str, Enum):
     IMAGE = "image"
 
 
+class ResolutionMode(str, Enum):
+    """Resolution mode the image is encoded in (see MODES in config.py)."""
+
+    TINY = "tiny"
+    SMALL = "small"
+    BASE = "base"
+    LARGE = "large"
+    GUNDAM = "gundam"
+    AUTO = "auto"
+
+
 class OCRRequest(BaseModel):
     """Request model for OCR endpoint (form fields only, file uploaded separately)."""
 
@@ -27,9 +38,18 @@ class OCRRequest(BaseModel):
         description="Custom prompt to override default. Use '<image>' as placeholder for image.",
         max_length=1000,
     )
+    mode: ResolutionMode = Field(
+        default=ResolutionMode.GUNDAM,
+        description=(
+            "Resolution mode: 'tiny' (512px, 64 vision tokens), 'small' (640px), "
+            "'base' (1024px), 'large' (1280px) or 'gundam' (1024px global view plus "
+            "640px tiles), or 'auto' to pick the cheapest mode expected to read the "
+            "image accurately"
+        ),
+    )
     crop_mode: bool = Field(
         default=True,
-        description="Whether to enable image cropping during preprocessing",
+        description="Whether to enable image cropping during preprocessing (gundam mode only)",
     )
     temperature: Optional[float] = Field(
         default=None,
@@ -43,6 +63,11 @@ class OCRRequest(BaseModel):
         le=8192,
         description="Maximum number of tokens to generate",
     )
+    timeout: Optional[float] = Field(
+        default=None,
+        gt=0.0,
+        description="Deadline in seconds; generation is aborted once it expires",
+    )
     include_raw: bool = Field(
         default=False,
         description="Include raw model output (with special tokens) in response",
@@ -51,6 +76,12 @@ class OCRRequest(BaseModel):
         default=False,
         description="Preserve image reference placeholders in markdown output",
     )
+    tenant: Optional[str] = Field(
+        default=None,
+        max_length=64,
+        pattern=r"^[A-Za-z0-9_.-]+$",
+        description="Tenant the request is scheduled under (from the X-Tenant-ID header)",
+    )
 
     @field_validator("custom_prompt")
     @classmethod
@@ -24,6 +24,211 @@ class OCRResponse(BaseModel):
     prompt_used: str = Field(
         description="The actual prompt that was used for inference",
     )
+    request_id: Optional[str] = Field(
+        default=None,
+        description="Unique engine request ID, useful for correlating server logs",
+    )
+    cache_hit: Optional[bool] = Field(
+        default=None,
+        description="Whether the result came from the result cache (null if the request was not cacheable)",
+    )
+    coalesced: Optional[bool] = Field(
+        default=None,
+        description="Whether this request shared the generation of an identical in-flight request",
+    )
+    mode: Optional[str] = Field(
+        default=None,
+        description="Resolution mode the image was encoded in (the one picked for 'auto')",
+    )
+    vision_tokens: Optional[int] = Field(
+        default=None,
+        description="Number of image tokens in the prompt for that mode",
+        ge=0,
+    )
+    cached_tokens: Optional[int] = Field(
+        default=None,
+        description="Prompt tokens served from the vLLM prefix cache (multi-prompt endpoint)",
+        ge=0,
+    )
+    blank_page: Optional[bool] = Field(
+        default=None,
+        description="True if the page was detected as blank and answered without running the model",
+    )
+
+
+class MultiPromptResponse(BaseModel):
+    """Response model for the multi-prompt OCR endpoint."""
+
+    results: list[OCRResponse] = Field(
+        description="One result per prompt, in request order",
+    )
+    processing_time: float = Field(
+        description="Total processing time in seconds",
+        ge=0.0,
+    )
+    mode: str = Field(
+        description="Resolution mode the image was encoded in",
+    )
+    vision_tokens: Optional[int] = Field(
+        default=None,
+        description="Image tokens shared by every prompt",
+        ge=0,
+    )
+    cached_tokens: int = Field(
+        default=0,
+        description="Prompt tokens served from the vLLM prefix cache, summed over all prompts",
+        ge=0,
+    )
+
+
+class BatchOCRItem(BaseModel):
+    """One NDJSON line of the batch OCR endpoint, emitted as each file finishes."""
+
+    index: int = Field(
+        description="Position of the file in the uploaded batch (0-based)",
+        ge=0,
+    )
+    filename: str = Field(
+        description="Original filename of the uploaded file",
+    )
+    result: Optional[OCRResponse] = Field(
+        default=None,
+        description="OCR result (absent if processing this file failed)",
+    )
+    error: Optional[dict] = Field(
+        default=None,
+        description="Error payload with 'error', 'details' and 'status_code' (absent on success)",
+    )
+
+
+class PDFPageItem(BaseModel):
+    """One NDJSON line of the PDF OCR endpoint, emitted per page."""
+
+    page: int = Field(
+        description="Page number in the PDF (1-based)",
+        ge=1,
+    )
+    result: Optional[OCRResponse] = Field(
+        default=None,
+        description="OCR result (absent if processing this page failed)",
+    )
+    error: Optional[dict] = Field(
+        default=None,
+        description="Error payload with 'error', 'details' and 'status_code' (absent on success)",
+    )
+
+
+class JobResponse(BaseModel):
+    """Status and progress of a background OCR job."""
+
+    job_id: str = Field(
+        description="Job identifier",
+    )
+    status: str = Field(
+        description="Job status",
+        examples=["queued", "running", "completed", "failed"],
+    )
+    kind: str = Field(
+        description="Job input type",
+        examples=["pdf", "images"],
+    )
+    filename: str = Field(
+        description="Uploaded filename (or image count for multi-image jobs)",
+    )
+    total_items: int = Field(
+        description="Number of pages or images in the job",
+        ge=0,
+    )
+    completed_items: int = Field(
+        description="Pages or images processed successfully",
+        ge=0,
+    )
+    failed_items: int = Field(
+        description="Pages or images that failed",
+        ge=0,
+    )
+    progress: float = Field(
+        description="Fraction of items finished (successfully or not)",
+        ge=0.0,
+        le=1.0,
+    )
+    created_at: float = Field(
+        description="Submission time (Unix timestamp)",
+    )
+    updated_at: float = Field(
+        description="Time of the last status change (Unix timestamp)",
+    )
+    finished_at: Optional[float] = Field(
+        default=None,
+        description="Completion time (Unix timestamp), null while the job is unfinished",
+    )
+
+
+class JobItemResult(BaseModel):
+    """Outcome of one page or image of a background job."""
+
+    index: int = Field(
+        description="Position of the item in the job (0-based)",
+        ge=0,
+    )
+    page: Optional[int] = Field(
+        default=None,
+        description="PDF page number (1-based), null for image jobs",
+        ge=1,
+    )
+    result: Optional[OCRResponse] = Field(
+        default=None,
+        description="OCR result (absent if processing this item failed)",
+    )
+    duplicate_of: Optional[int] = Field(
+        default=None,
+        description="Index of the earlier item this one repeats and whose result it reuses",
+        ge=0,
+    )
+    error: Optional[dict] = Field(
+        default=None,
+        description="Error payload with 'error', 'details' and 'status_code' (absent on success)",
+    )
+
+
+class JobResultResponse(BaseModel):
+    """Results of a finished background job."""
+
+    job: JobResponse = Field(
+        description="Final job status",
+    )
+    items: list[JobItemResult] = Field(
+        description="Per-item results in page/upload order",
+    )
+
+
+class StartupInfo(BaseModel):
+    """Engine start-up progress and timings."""
+
+    state: str = Field(
+        description="Engine start-up state",
+        examples=["loading", "warming_up", "ready", "failed"],
+    )
+    elapsed_seconds: Optional[float] = Field(
+        default=None,
+        description="Seconds since start-up began, or total start-up time once ready",
+        ge=0.0,
+    )
+    phases: dict[str, dict[str, float]] = Field(
+        default_factory=dict,
+        description=(
+            "Seconds per start-up phase for each engine backend "
+            "(load_model, profile_memory, kv_cache_and_cuda_graphs, total)"
+        ),
+    )
+    warmup: dict[str, float] = Field(
+        default_factory=dict,
+        description="Seconds the warmup request of each crop-ratio bucket took (e.g. '2x3')",
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Why start-up failed (only if state is 'failed')",
+    )
 
 
 class HealthResponse(BaseModel):
@@ -40,6 +245,10 @@ class HealthResponse(BaseModel):
         default=None,
         description="Additional status information",
     )
+    startup: Optional[StartupInfo] = Field(
+        default=None,
+        description="Engine start-up progress and per-phase timings",
+    )
 
 
 class ModelInfo(BaseModel):
@@ -2,15 +2,20 @@
 Health check and model info endpoints.
 """
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Response, status
 
 from api.core.config import settings
-from api.models.responses import HealthResponse, ModelInfo
+from api.models.responses import HealthResponse, ModelInfo, StartupInfo
 from api.services.engine_manager import EngineManager
 
 router = APIRouter(tags=["health"])
 
 
+def _startup_info() -> StartupInfo:
+    """Current engine start-up state and timings."""
+    return StartupInfo(**EngineManager.startup_status())
+
+
 @router.get(
     "/health",
     response_model=HealthResponse,
@@ -23,23 +28,108 @@ async def health_check() -> HealthResponse:
     Check service health status.
 
     Returns:
-        HealthResponse with service status and model readiness
+        HealthResponse with service status, model readiness and start-up timings
     """
     is_ready = EngineManager.is_ready()
+    startup = _startup_info()
 
     if is_ready:
         return HealthResponse(
             status="healthy",
             model_loaded=True,
             message="Service is ready to process requests",
+            startup=startup,
+        )
+    elif startup.state == "failed":
+        return HealthResponse(
+            status="unhealthy",
+            model_loaded=False,
+            message="Engine failed to start",
+            startup=startup,
         )
     else:
         return HealthResponse(
             status="initializing",
             model_loaded=False,
             message="Model is still loading, please wait",
+            startup=startup,
+        )
+
+
+@router.get(
+    "/health/live",
+    response_model=HealthResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Liveness probe",
+    description=(
+        "200 while the process is serving, including while the model loads; "
+        "503 only if the engine failed to start and the process should be restarted"
+    ),
+    responses={503: {"model": HealthResponse}},
+)
+async def liveness(response: Response) -> HealthResponse:
+    """
+    Report whether the process is alive.
+
+    Returns:
+        HealthResponse; status code 503 if engine start-up failed
+    """
+    startup = _startup_info()
+    if startup.state == "failed":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return HealthResponse(
+            status="unhealthy",
+            model_loaded=False,
+            message="Engine failed to start",
+            startup=startup,
+        )
+    return HealthResponse(
+        status="alive",
+        model_loaded=EngineManager.is_ready(),
+        startup=startup,
+    )
+
+
+@router.get(
+    "/health/ready",
+    response_model=HealthResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Readiness probe",
+    description="200 once the engine can serve requests; 503 with Retry-After until then",
+    responses={503: {"model": HealthResponse}},
+)
+async def readiness(response: Response) -> HealthResponse:
+    """
+    Report whether the service can process OCR requests.
+
+    Returns:
+        HealthResponse; status code 503 (with Retry-After) until the engine is ready
+    """
+    startup = _startup_info()
+    if EngineManager.is_ready():
+        return HealthResponse(
+            status="ready",
+            model_loaded=True,
+            message="Service is ready to process requests",
+            startup=startup,
         )
 
+    response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    if startup.state == "failed":
+        return HealthResponse(
+            status="unhealthy",
+            model_loaded=False,
+            message="Engine failed to start",
+            startup=startup,
+        )
+    response.headers["Retry-After"] = str(settings.engine_startup_retry_after)
+    return HealthResponse(
+        status="initializing",
+        model_loaded=False,
+        message="Model is still loading, please wait",
+        startup=startup,
+    )
+
 
 @router.get(
     "/models",
@@ -0,0 +1,195 @@
+"""
+Background job endpoints for large documents.
+"""
+
+from pathlib import Path
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+
+from api.core.config import settings
+from api.core.errors import UnsupportedFileTypeError
+from api.core.logging import get_logger
+from api.models.requests import OCRRequest
+from api.models.responses import ErrorResponse, JobItemResult, JobResponse, JobResultResponse
+from api.routers.ocr import _http_error, _spool_upload, ocr_request_form
+from api.services.jobs import JobManager
+from api.services.pdf import PDFRasterizer
+
+logger = get_logger(__name__)
+router = APIRouter(prefix="/api/v1", tags=["jobs"])
+
+
+def _job_response(job: dict[str, Any]) -> JobResponse:
+    """Convert a stored job row to the response model."""
+    total = job["total_items"]
+    done = job["completed_items"] + job["failed_items"]
+    return JobResponse(
+        job_id=job["id"],
+        status=job["status"],
+        kind=job["kind"],
+        filename=job["filename"],
+        total_items=total,
+        completed_items=job["completed_items"],
+        failed_items=job["failed_items"],
+        progress=done / total if total else 1.0,
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+        finished_at=job["finished_at"],
+    )
+
+
+_PDF_MAGIC = b"%PDF"
+
+
+def _is_pdf(filename: str, head: bytes) -> bool:
+    return Path(filename).suffix.lower() == ".pdf" or head.startswith(_PDF_MAGIC)
+
+
+@router.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit a background OCR job",
+    description=(
+        "Upload one PDF or several images to be processed in the background. "
+        "Poll GET /api/v1/jobs/{job_id} for progress and fetch the results from "
+        "GET /api/v1/jobs/{job_id}/result once the job has finished."
+    ),
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid file, options or page range"},
+        413: {"model": ErrorResponse, "description": "Upload too large or too many files"},
+    },
+)
+async def submit_job(
+    files: Annotated[list[UploadFile], File(description="One PDF, or image files")],
+    request: Annotated[OCRRequest, Depends(ocr_request_form)],
+    first_page: Annotated[int | None, Form(ge=1, description="First PDF page (1-based)")] = None,
+    last_page: Annotated[int | None, Form(ge=1, description="Last PDF page (inclusive)")] = None,
+) -> JobResponse:
+    """
+    Persist the uploads and queue them for the background worker.
+
+    Returns:
+        JobResponse of the queued job
+
+    Raises:
+        HTTPException: If the upload is invalid
+    """
+    try:
+        # Checked before anything is read: each file may be up to max_file_size
+        if len(files) > settings.max_job_files:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail={
+                    "error": f"Too many files ({len(files)}), maximum is {settings.max_job_files}",
+                    "details": {"max_job_files": settings.max_job_files},
+                    "status_code": 413,
+                },
+            )
+
+        first = files[0]
+        head = await first.read(len(_PDF_MAGIC))
+        await first.seek(0)
+        is_pdf = len(files) == 1 and _is_pdf(first.filename or "unknown", head)
+
+        if not is_pdf:
+            # Full validation happens per item; reject obviously wrong types up front
+            for file in files:
+                file_ext = Path(file.filename or "unknown").suffix.lower().lstrip(".")
+                if file_ext not in settings.allowed_extensions:
+                    raise UnsupportedFileTypeError(
+                        message=f"File type '.{file_ext}' is not supported in multi-file jobs",
+                        allowed_types=settings.allowed_extensions,
+                    )
+
+        # Uploads go straight to the job's input directory instead of memory
+        job_id, input_dir = await JobManager.create_input_dir()
+        try:
+            if is_pdf:
+                path = input_dir / "document.pdf"
+                await _spool_upload(first, path, settings.max_pdf_size)
+                page_count = await PDFRasterizer.page_count(str(path))
+                pages = PDFRasterizer.page_range(page_count, first_page, last_page)
+                job = await JobManager.submit_pdf(
+                    job_id, path, first.filename or "unknown", request, pages
+                )
+            else:
+                inputs = []
+                for idx, file in enumerate(files):
+                    filename = file.filename or "unknown"
+                    path = input_dir / f"{idx:05d}{Path(filename).suffix.lower()}"
+                    await _spool_upload(file, path, settings.max_file_size)
+                    inputs.append((filename, path))
+                job = await JobManager.submit_images(job_id, inputs, request)
+        except BaseException:
+            await JobManager.discard_inputs(job_id)
+            raise
+
+        return _job_response(job)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _http_error(e)
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Get job status",
+    description="Status and progress of a background OCR job",
+    responses={
+        404: {"model": ErrorResponse, "description": "Job not found"},
+    },
+)
+async def get_job(job_id: str) -> JobResponse:
+    """
+    Return the status and progress of a job.
+
+    Raises:
+        HTTPException: If the job does not exist
+    """
+    try:
+        return _job_response(await JobManager.get(job_id))
+    except Exception as e:
+        raise _http_error(e)
+
+
+@router.get(
+    "/jobs/{job_id}/result",
+    response_model=JobResultResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Get job results",
+    description="Per-page (or per-image) results of a finished background OCR job",
+    responses={
+        404: {"model": ErrorResponse, "description": "Job not found"},
+        409: {"model": ErrorResponse, "description": "Job has not finished yet"},
+    },
+)
+async def get_job_result(job_id: str) -> JobResultResponse:
+    """
+    Return the results of a finished job.
+
+    Raises:
+        HTTPException: If the job does not exist or has not finished
+    """
+    try:
+        job, items = await JobManager.result(job_id)
+    except Exception as e:
+        raise _http_error(e)
+
+    return JobResultResponse(
+        job=_job_response(job),
+        items=[
+            JobItemResult(
+                index=item["idx"],
+                page=item["page"],
+                result=item["result"],
+                duplicate_of=item["duplicate_of"],
+                error=item["error"],
+            )
+            for item in items
+        ],
+    )
@@ -0,0 +1,25 @@
+"""
+Prometheus metrics endpoint.
+"""
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description="Per-stage latency histograms, queue gauges and counters in Prometheus text format",
+    response_class=Response,
+    include_in_schema=False,
+)
+async def metrics() -> Response:
+    """
+    Export all registered collectors.
+
+    Returns:
+        Prometheus text exposition of the default registry
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -2,22 +2,266 @@
 OCR endpoint for processing images.
 """
 
-import time
-from typing import Annotated
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Annotated, AsyncIterator, Awaitable, Literal, TypeVar
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
-from api.core.errors import DeepSeekOCRError
+from api.core.config import settings
+from api.core.errors import (
+    ClientDisconnectedError,
+    DeepSeekOCRError,
+    FileTooLargeError,
+    error_payload,
+)
 from api.core.logging import get_logger
-from api.models.requests import OCRRequest, OCRType
-from api.models.responses import ErrorResponse, OCRResponse
-from api.services.engine_manager import EngineManager
-from api.services.postprocessor import OutputPostprocessor
-from api.services.preprocessor import ImagePreprocessor
+from api.models.requests import OCRRequest, OCRType, ResolutionMode
+from api.models.responses import (
+    BatchOCRItem,
+    ErrorResponse,
+    MultiPromptResponse,
+    OCRResponse,
+    PDFPageItem,
+)
+from api.services.ocr_pipeline import OCRPipeline
+from api.services.pdf import PDFRasterizer
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/api/v1", tags=["ocr"])
 
+T = TypeVar("T")
+
+# Bytes read per step while ingesting an upload
+_READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _http_error(e: Exception) -> HTTPException:
+    """Log an exception and convert it to an HTTPException."""
+    if isinstance(e, DeepSeekOCRError):
+        # Handle known application errors
+        logger.error(f"OCR processing failed: {e.message}", exc_info=True)
+        return HTTPException(
+            status_code=e.status_code,
+            detail=error_payload(e),
+            headers=e.headers or None,
+        )
+
+    # Handle unexpected errors
+    logger.error(f"Unexpected error during OCR processing: {e}", exc_info=True)
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=error_payload(e),
+    )
+
+
+def _too_large(max_size: int) -> FileTooLargeError:
+    return FileTooLargeError(
+        message=f"File size exceeds maximum ({max_size} bytes)",
+        max_size=max_size,
+    )
+
+
+async def _read_limited(chunks: AsyncIterator[bytes], max_size: int) -> bytes:
+    """Collect chunks, failing as soon as more than max_size bytes arrive."""
+    parts = []
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_size:
+            raise _too_large(max_size)
+        parts.append(chunk)
+    return b"".join(parts)
+
+
+async def _read_upload(file: UploadFile, max_size: int | None = None) -> bytes:
+    """
+    Read an uploaded file in chunks, enforcing max_size (defaults to settings.max_file_size).
+
+    Raises:
+        FileTooLargeError: If the file is larger than max_size
+    """
+    if max_size is None:
+        max_size = settings.max_file_size
+    if file.size is not None and file.size > max_size:
+        raise _too_large(max_size)
+
+    async def chunks() -> AsyncIterator[bytes]:
+        while chunk := await file.read(_READ_CHUNK_SIZE):
+            yield chunk
+
+    return await _read_limited(chunks(), max_size)
+
+
+async def _spool_upload(file: UploadFile, path: Path, max_size: int) -> None:
+    """
+    Copy an uploaded file to path in chunks, enforcing max_size.
+
+    Raises:
+        FileTooLargeError: If the file is larger than max_size (path is left
+            partially written; the caller removes it)
+    """
+    if file.size is not None and file.size > max_size:
+        raise _too_large(max_size)
+
+    size = 0
+    with open(path, "wb") as out:
+        while chunk := await file.read(_READ_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise _too_large(max_size)
+            await asyncio.to_thread(out.write, chunk)
+
+
+async def _read_body(http_request: Request, max_size: int | None = None) -> bytes:
+    """
+    Read a raw request body while it streams in, enforcing max_size.
+
+    Raises:
+        FileTooLargeError: If Content-Length or the received body exceeds max_size
+    """
+    if max_size is None:
+        max_size = settings.max_file_size
+    content_length = http_request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+        raise _too_large(max_size)
+    return await _read_limited(http_request.stream(), max_size)
+
+
+async def _cancel_on_disconnect(http_request: Request, work: Awaitable[T]) -> T:
+    """
+    Await work, cancelling it if the HTTP client disconnects first.
+
+    Cancellation propagates into EngineManager.generate, which aborts the
+    engine request so an abandoned upload stops consuming GPU time.
+
+    Raises:
+        ClientDisconnectedError: If the client disconnected before completion
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.disconnect_poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise ClientDisconnectedError()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def _build_ocr_request(**options) -> OCRRequest:
+    """
+    Build the OCR request model from endpoint options.
+
+    Raises:
+        HTTPException: If the options are invalid
+    """
+    try:
+        return OCRRequest(**options)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "Invalid request", "details": {"error": str(e)}, "status_code": 400},
+        )
+
+
+def ocr_request_form(
+    type: Annotated[OCRType, Form()] = OCRType.DOCUMENT,
+    custom_prompt: Annotated[str | None, Form()] = None,
+    mode: Annotated[ResolutionMode, Form()] = ResolutionMode.GUNDAM,
+    crop_mode: Annotated[bool, Form()] = True,
+    temperature: Annotated[float | None, Form(ge=0.0, le=2.0)] = None,
+    max_tokens: Annotated[int | None, Form(ge=1, le=8192)] = None,
+    timeout: Annotated[float | None, Form(gt=0.0)] = None,
+    include_raw: Annotated[bool, Form()] = False,
+    save_image_refs: Annotated[bool, Form()] = False,
+    x_tenant_id: Annotated[str | None, Header()] = None,
+) -> OCRRequest:
+    """
+    Build the OCR request model from form fields shared by all OCR endpoints.
+
+    Args:
+        type: Type of OCR (document or image)
+        custom_prompt: Custom prompt (must contain '<image>')
+        mode: Resolution mode (tiny, small, base, large or gundam)
+        crop_mode: Enable image cropping (gundam mode)
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens to generate
+        timeout: Deadline in seconds after which generation is aborted
+        include_raw: Include raw output with special tokens
+        save_image_refs: Preserve image reference placeholders
+        x_tenant_id: Tenant for fair scheduling (X-Tenant-ID header)
+
+    Raises:
+        HTTPException: If the options are invalid
+    """
+    return _build_ocr_request(
+        type=type,
+        custom_prompt=custom_prompt,
+        mode=mode,
+        crop_mode=crop_mode,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        include_raw=include_raw,
+        save_image_refs=save_image_refs,
+        tenant=x_tenant_id,
+    )
+
+
+def ocr_request_query(
+    type: Annotated[OCRType, Query()] = OCRType.DOCUMENT,
+    custom_prompt: Annotated[str | None, Query()] = None,
+    mode: Annotated[ResolutionMode, Query()] = ResolutionMode.GUNDAM,
+    crop_mode: Annotated[bool, Query()] = True,
+    temperature: Annotated[float | None, Query(ge=0.0, le=2.0)] = None,
+    max_tokens: Annotated[int | None, Query(ge=1, le=8192)] = None,
+    timeout: Annotated[float | None, Query(gt=0.0)] = None,
+    include_raw: Annotated[bool, Query()] = False,
+    save_image_refs: Annotated[bool, Query()] = False,
+    x_tenant_id: Annotated[str | None, Header()] = None,
+) -> OCRRequest:
+    """
+    Build the OCR request model from query parameters (for raw-body endpoints).
+
+    Takes the same options as ocr_request_form.
+
+    Raises:
+        HTTPException: If the options are invalid
+    """
+    return _build_ocr_request(
+        type=type,
+        custom_prompt=custom_prompt,
+        mode=mode,
+        crop_mode=crop_mode,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        include_raw=include_raw,
+        save_image_refs=save_image_refs,
+        tenant=x_tenant_id,
+    )
+
 
 @router.post(
     "/ocr",
@@ -28,32 +272,27 @@ router = APIRouter(prefix="/api/v1", tags=["ocr"])
     responses={
         400: {"model": ErrorResponse, "description": "Invalid request or file"},
         413: {"model": ErrorResponse, "description": "File too large"},
+        429: {"model": ErrorResponse, "description": "Token budget exhausted, see Retry-After"},
         500: {"model": ErrorResponse, "description": "Server error"},
         503: {"model": ErrorResponse, "description": "Model not ready"},
+        504: {"model": ErrorResponse, "description": "Request deadline exceeded"},
     },
 )
 async def perform_ocr(
+    http_request: Request,
     file: Annotated[UploadFile, File(description="Image file to process")],
-    type: Annotated[OCRType, Form()] = OCRType.DOCUMENT,
-    custom_prompt: Annotated[str | None, Form()] = None,
-    crop_mode: Annotated[bool, Form()] = True,
-    temperature: Annotated[float | None, Form(ge=0.0, le=2.0)] = None,
-    max_tokens: Annotated[int | None, Form(ge=1, le=8192)] = None,
-    include_raw: Annotated[bool, Form()] = False,
-    save_image_refs: Annotated[bool, Form()] = False,
+    request: Annotated[OCRRequest, Depends(ocr_request_form)],
 ) -> OCRResponse:
     """
     Process an image and extract text using DeepSeek-OCR.
 
+    Generation is aborted if the client disconnects or the request's
+    deadline expires.
+
     Args:
+        http_request: Incoming HTTP request (used for disconnect detection)
         file: Image file to process
-        type: Type of OCR (document or image)
-        custom_prompt: Custom prompt (must contain '<image>')
-        crop_mode: Enable image cropping
-        temperature: Sampling temperature
-        max_tokens: Maximum tokens to generate
-        include_raw: Include raw output with special tokens
-        save_image_refs: Preserve image reference placeholders
+        request: OCR options from the form fields
 
     Returns:
         OCRResponse with extracted markdown text
@@ -61,87 +300,429 @@ async def perform_ocr(
     Raises:
         HTTPException: If processing fails
     """
-    start_time = time.time()
-
     try:
-        # Build request model from form data
-        request = OCRRequest(
-            type=type,
-            custom_prompt=custom_prompt,
-            crop_mode=crop_mode,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            include_raw=include_raw,
-            save_image_refs=save_image_refs,
-        )
-
         logger.info(f"Processing OCR request: type={request.type}, file={file.filename}")
 
         # Read file data
-        file_data = await file.read()
-
-        # Preprocess image
-        preprocessor = ImagePreprocessor()
-        original_image, image_features = await preprocessor.preprocess(
-            file_data=file_data,
-            filename=file.filename or "unknown",
-            crop_mode=request.crop_mode,
+        file_data = await _read_upload(file)
+
+        return await _cancel_on_disconnect(
+            http_request,
+            OCRPipeline.run(
+                file_data=file_data,
+                filename=file.filename or "unknown",
+                request=request,
+            ),
         )
 
-        # Get prompt
-        prompt = request.get_prompt()
+    except Exception as e:
+        raise _http_error(e)
 
-        # Generate text using engine
-        raw_output = await EngineManager.generate(
-            prompt=prompt,
-            image_features=image_features,
-            temperature=request.temperature,
-            max_tokens=request.max_tokens,
-        )
 
-        # Post-process output
-        postprocessor = OutputPostprocessor()
-        processed = postprocessor.postprocess(
-            raw_output=raw_output,
-            save_image_refs=request.save_image_refs,
-            include_raw=request.include_raw,
-        )
+@router.post(
+    "/ocr/raw",
+    response_model=OCRResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Perform OCR on a raw image body",
+    description=(
+        "Send the image bytes as the request body (e.g. application/octet-stream) "
+        "with options as query parameters; skips multipart parsing"
+    ),
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid request or file"},
+        413: {"model": ErrorResponse, "description": "File too large"},
+        429: {"model": ErrorResponse, "description": "Token budget exhausted, see Retry-After"},
+        500: {"model": ErrorResponse, "description": "Server error"},
+        503: {"model": ErrorResponse, "description": "Model not ready"},
+        504: {"model": ErrorResponse, "description": "Request deadline exceeded"},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/octet-stream": {"schema": {"type": "string", "format": "binary"}}
+            },
+        }
+    },
+)
+async def perform_ocr_raw(
+    http_request: Request,
+    request: Annotated[OCRRequest, Depends(ocr_request_query)],
+    filename: Annotated[
+        str | None,
+        Query(description="Original filename; without it the format is detected from the data"),
+    ] = None,
+) -> OCRResponse:
+    """
+    Process an image sent as the raw request body.
 
-        # Calculate processing time
-        processing_time = time.time() - start_time
+    Args:
+        http_request: Incoming HTTP request (body source and disconnect detection)
+        request: OCR options from the query parameters
+        filename: Optional original filename
 
-        logger.info(
-            f"OCR request completed successfully in {processing_time:.2f}s "
-            f"(output: {len(processed['text'])} chars)"
-        )
+    Returns:
+        OCRResponse with extracted markdown text
+
+    Raises:
+        HTTPException: If processing fails
+    """
+    try:
+        logger.info(f"Processing raw OCR request: type={request.type}, file={filename}")
 
-        return OCRResponse(
-            text=processed["text"],
-            raw=processed.get("raw"),
-            processing_time=processing_time,
-            prompt_used=prompt,
+        file_data = await _read_body(http_request)
+
+        return await _cancel_on_disconnect(
+            http_request,
+            OCRPipeline.run(
+                file_data=file_data,
+                filename=filename or "upload",
+                request=request,
+            ),
         )
 
-    except DeepSeekOCRError as e:
-        # Handle known application errors
-        logger.error(f"OCR processing failed: {e.message}", exc_info=True)
+    except Exception as e:
+        raise _http_error(e)
+
+
+@router.post(
+    "/ocr/prompts",
+    response_model=MultiPromptResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Run several prompts on one image",
+    description=(
+        "Upload one image with several prompts (e.g. markdown conversion, free OCR and "
+        "'Locate <|ref|>...<|/ref|>' queries). The image is preprocessed once and the "
+        "prompts are generated concurrently"
+    ),
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid request, prompts or file"},
+        413: {"model": ErrorResponse, "description": "File too large or too many prompts"},
+        429: {"model": ErrorResponse, "description": "Token budget exhausted, see Retry-After"},
+        500: {"model": ErrorResponse, "description": "Server error"},
+        503: {"model": ErrorResponse, "description": "Model not ready"},
+        504: {"model": ErrorResponse, "description": "Request deadline exceeded"},
+    },
+)
+async def perform_multi_prompt_ocr(
+    http_request: Request,
+    file: Annotated[UploadFile, File(description="Image file to process")],
+    prompts: Annotated[
+        list[str],
+        Form(description="Prompts to run on the image; '<image>' placeholders are optional"),
+    ],
+    request: Annotated[OCRRequest, Depends(ocr_request_form)],
+) -> MultiPromptResponse:
+    """
+    Run every prompt on the image, preprocessing it once.
+
+    Args:
+        http_request: Incoming HTTP request (used for disconnect detection)
+        file: Image file to process
+        prompts: Prompts to run (repeat the form field once per prompt)
+        request: OCR options shared by all prompts
+
+    Returns:
+        MultiPromptResponse with one result per prompt, in request order
+
+    Raises:
+        HTTPException: If processing fails
+    """
+    if len(prompts) > settings.max_prompts_per_image:
         raise HTTPException(
-            status_code=e.status_code,
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail={
-                "error": e.message,
-                "details": e.details,
-                "status_code": e.status_code,
+                "error": (
+                    f"Too many prompts ({len(prompts)}), "
+                    f"maximum is {settings.max_prompts_per_image}"
+                ),
+                "details": {"max_prompts_per_image": settings.max_prompts_per_image},
+                "status_code": 413,
             },
         )
+    for prompt in prompts:
+        # Same limit as custom_prompt
+        _build_ocr_request(custom_prompt=OCRPipeline.image_prompt(prompt))
+
+    try:
+        logger.info(
+            f"Processing multi-prompt OCR request: prompts={len(prompts)}, file={file.filename}"
+        )
+
+        file_data = await _read_upload(file)
+
+        return await _cancel_on_disconnect(
+            http_request,
+            OCRPipeline.run_prompts(
+                file_data=file_data,
+                filename=file.filename or "unknown",
+                request=request,
+                prompts=prompts,
+            ),
+        )
 
     except Exception as e:
-        # Handle unexpected errors
-        logger.error(f"Unexpected error during OCR processing: {e}", exc_info=True)
+        raise _http_error(e)
+
+
+@router.post(
+    "/ocr/batch",
+    status_code=status.HTTP_200_OK,
+    summary="Perform OCR on many images",
+    description=(
+        "Upload several images in one request. All images are submitted to the engine "
+        "concurrently and each result is streamed back as one NDJSON line "
+        "(see BatchOCRItem) as soon as that image finishes, in completion order."
+    ),
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"application/x-ndjson": {}}, "description": "Stream of BatchOCRItem"},
+        400: {"model": ErrorResponse, "description": "Invalid request"},
+        413: {"model": ErrorResponse, "description": "Too many files"},
+    },
+)
+async def perform_batch_ocr(
+    files: Annotated[list[UploadFile], File(description="Image files to process")],
+    request: Annotated[OCRRequest, Depends(ocr_request_form)],
+) -> StreamingResponse:
+    """
+    Process several images concurrently and stream results as they complete.
+
+    The same OCR options apply to every file. A failure on one file is
+    reported in that file's line and does not abort the rest of the batch.
+
+    Returns:
+        StreamingResponse of newline-delimited BatchOCRItem JSON objects
+
+    Raises:
+        HTTPException: If the request itself is invalid
+    """
+    if len(files) > settings.max_batch_files:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail={
-                "error": "An unexpected error occurred",
-                "details": {"error": str(e)},
-                "status_code": 500,
+                "error": f"Too many files ({len(files)}), maximum is {settings.max_batch_files}",
+                "details": {"max_batch_files": settings.max_batch_files},
+                "status_code": 413,
             },
         )
+
+    # Uploaded files are closed once this handler returns, so read them
+    # before handing control to the streaming response.
+    # An oversized file only fails its own line.
+    uploads: list[tuple[str, bytes | FileTooLargeError]] = []
+    for file in files:
+        try:
+            uploads.append((file.filename or "unknown", await _read_upload(file)))
+        except FileTooLargeError as e:
+            uploads.append((file.filename or "unknown", e))
+
+    logger.info(f"Processing batch OCR request: type={request.type}, files={len(uploads)}")
+
+    async def process_one(
+        index: int, filename: str, file_data: bytes | FileTooLargeError
+    ) -> BatchOCRItem:
+        try:
+            if isinstance(file_data, FileTooLargeError):
+                raise file_data
+            result = await OCRPipeline.run(
+                file_data=file_data,
+                filename=filename,
+                request=request,
+            )
+            return BatchOCRItem(index=index, filename=filename, result=result)
+        except Exception as e:
+            logger.error(f"Batch OCR failed for {filename}: {e}", exc_info=True)
+            return BatchOCRItem(index=index, filename=filename, error=error_payload(e))
+
+    async def stream_results() -> AsyncIterator[str]:
+        tasks = [
+            asyncio.create_task(process_one(index, filename, file_data))
+            for index, (filename, file_data) in enumerate(uploads)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                yield item.model_dump_json(exclude_none=True) + "\n"
+        finally:
+            # Client went away or the stream was closed early: stop remaining work
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/ocr/pdf",
+    status_code=status.HTTP_200_OK,
+    summary="Perform OCR on a PDF",
+    description=(
+        "Upload a PDF. Pages are rasterized server-side and submitted to the engine "
+        "concurrently; each page result is streamed back as one NDJSON line (see "
+        "PDFPageItem), either in page order or as soon as each page finishes."
+    ),
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"application/x-ndjson": {}}, "description": "Stream of PDFPageItem"},
+        400: {"model": ErrorResponse, "description": "Invalid PDF or page range"},
+        413: {"model": ErrorResponse, "description": "PDF too large"},
+        503: {"model": ErrorResponse, "description": "Server busy"},
+    },
+)
+async def perform_pdf_ocr(
+    file: Annotated[UploadFile, File(description="PDF file to process")],
+    request: Annotated[OCRRequest, Depends(ocr_request_form)],
+    first_page: Annotated[int | None, Form(ge=1, description="First page (1-based)")] = None,
+    last_page: Annotated[int | None, Form(ge=1, description="Last page (inclusive)")] = None,
+    order: Annotated[
+        Literal["page", "completion"],
+        Form(description="Emit pages in page order or as each page completes"),
+    ] = "page",
+) -> StreamingResponse:
+    """
+    Rasterize a PDF and stream per-page OCR results.
+
+    At most settings.pdf_page_concurrency pages are rendered and generated
+    at a time; admission control decides how many of those reach the engine.
+    A failure on one page is reported in that page's line and does not abort
+    the rest of the document.
+
+    Returns:
+        StreamingResponse of newline-delimited PDFPageItem JSON objects
+
+    Raises:
+        HTTPException: If the PDF or the page range is invalid
+    """
+    filename = file.filename or "document.pdf"
+
+    # Pages are rendered from a file, so workers do not receive (and reparse) the
+    # whole upload for every page
+    fd, spool_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        try:
+            await _spool_upload(file, Path(spool_path), settings.max_pdf_size)
+            page_count = await PDFRasterizer.page_count(spool_path)
+            pages = PDFRasterizer.page_range(page_count, first_page, last_page)
+        except Exception as e:
+            raise _http_error(e)
+    except BaseException:
+        os.unlink(spool_path)
+        raise
+
+    logger.info(
+        f"Processing PDF OCR request: type={request.type}, file={filename}, "
+        f"pages={pages.start + 1}-{pages.stop} of {page_count}, order={order}"
+    )
+
+    stem = Path(filename).stem
+    slots = asyncio.Semaphore(settings.pdf_page_concurrency)
+
+    async def process_page(page_index: int) -> PDFPageItem:
+        page = page_index + 1
+        try:
+            async with slots:
+                image_data = await PDFRasterizer.render_page(spool_path, page_index)
+                result = await OCRPipeline.run(
+                    file_data=image_data,
+                    filename=f"{stem}-page-{page:04d}.png",
+                    request=request,
+                )
+            return PDFPageItem(page=page, result=result)
+        except Exception as e:
+            logger.error(f"PDF OCR failed for {filename} page {page}: {e}", exc_info=True)
+            return PDFPageItem(page=page, error=error_payload(e))
+
+    async def stream_results() -> AsyncIterator[str]:
+        # Tasks acquire the semaphore in creation order, so pages start in order
+        tasks = [asyncio.create_task(process_page(page_index)) for page_index in pages]
+        try:
+            ordered = tasks if order == "page" else asyncio.as_completed(tasks)
+            for next_done in ordered:
+                item = await next_done
+                yield item.model_dump_json(exclude_none=True) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # Runs after the stream ends, also if the client disconnected before it started
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(os.unlink, spool_path),
+    )
+
+
+def _sse_event(event: str, data: str) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.post(
+    "/ocr/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Perform OCR on an image, streaming tokens",
+    description=(
+        "Upload an image and receive the raw model output as Server-Sent Events while "
+        "it is generated. 'delta' events carry {\"text\": ...} chunks; a final 'done' "
+        "event carries the post-processed OCRResponse, or an 'error' event the error payload."
+    ),
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "SSE stream"},
+        400: {"model": ErrorResponse, "description": "Invalid request or file"},
+        413: {"model": ErrorResponse, "description": "File too large"},
+        429: {"model": ErrorResponse, "description": "Token budget exhausted, see Retry-After"},
+        503: {"model": ErrorResponse, "description": "Model not ready"},
+        504: {"model": ErrorResponse, "description": "Request deadline exceeded"},
+    },
+)
+async def perform_ocr_stream(
+    http_request: Request,
+    file: Annotated[UploadFile, File(description="Image file to process")],
+    request: Annotated[OCRRequest, Depends(ocr_request_form)],
+) -> StreamingResponse:
+    """
+    Process an image and stream generated text as Server-Sent Events.
+
+    Preprocessing, admission and the first generated chunk happen before
+    the response starts, so invalid files, backpressure (429) and engine
+    errors are still reported with a regular HTTP error status.
+
+    Returns:
+        StreamingResponse with 'delta', 'done' and 'error' events
+
+    Raises:
+        HTTPException: If the request fails before the first chunk
+    """
+    filename = file.filename or "unknown"
+
+    try:
+        logger.info(f"Processing streaming OCR request: type={request.type}, file={filename}")
+        file_data = await _read_upload(file)
+        items = OCRPipeline.stream(file_data, filename, request)
+        first_item = await _cancel_on_disconnect(http_request, items.__anext__())
+    except Exception as e:
+        raise _http_error(e)
+
+    async def stream_events() -> AsyncIterator[str]:
+        async def all_items() -> AsyncIterator[str | OCRResponse]:
+            yield first_item
+            async for item in items:
+                yield item
+
+        try:
+            async for item in all_items():
+                if isinstance(item, OCRResponse):
+                    yield _sse_event("done", item.model_dump_json(exclude_none=True))
+                else:
+                    yield _sse_event("delta", json.dumps({"text": item}, ensure_ascii=False))
+        except Exception as e:
+            logger.error(f"Streaming OCR failed for {filename}: {e}", exc_info=True)
+            yield _sse_event("error", json.dumps(error_payload(e), ensure_ascii=False))
+
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
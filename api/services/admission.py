@@ -0,0 +1,327 @@
+"""
+Token-budget admission control in front of the vLLM engine.
+
+Every request is charged its vision tokens plus max_tokens. While the sum of
+admitted charges is at the budget, new requests wait in a bounded FIFO queue
+and are rejected with 429 + Retry-After when the queue is full or the wait
+times out, so a load balancer can send overflow to other replicas instead of
+letting the vLLM queue (and everyone's latency) grow without bound.
+
+Waiting requests are grouped into lanes: "interactive" and "bulk" (job
+pages), optionally split per tenant ("interactive:acme"; at most
+scheduler_max_tenant_lanes per class, further tenants share the class lane,
+since the tenant header is not authenticated). Freed budget is
+handed out by start-time fair queuing over the lanes, so each lane receives a
+share of the engine proportional to its weight no matter how many requests
+it has queued. Bulk lanes never use the share of the budget reserved for
+interactive requests, and every lane maps to a vLLM request priority.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from api.core.config import settings
+from api.core.errors import AdmissionRejectedError
+from api.core.logging import get_logger
+from api.core.metrics import (
+    ADMISSION_LANE_OUTSTANDING_TOKENS,
+    ADMISSION_LANE_SHARE,
+    ADMISSION_OUTSTANDING_TOKENS,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_QUEUED,
+    ADMISSION_REJECTED,
+)
+from config import MODES
+from process.image_process import count_tiles
+
+logger = get_logger(__name__)
+
+
+def estimate_vision_tokens(
+    width: int,
+    height: int,
+    crop_mode: bool = True,
+    mode: str = "gundam",
+) -> int:
+    """
+    Number of image tokens DeepseekOCRProcessor emits for an image.
+
+    Same formula as DeepseekOCRProcessingInfo.get_num_image_tokens: a global
+    view of the mode's base size plus, for images larger than 640px in a
+    cropping mode, a grid of tiles of the mode's image size.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        crop_mode: Whether cropping (local tiles) is enabled
+        mode: Resolution mode (key of MODES)
+
+    Returns:
+        Vision token count
+    """
+    base_size, image_size, cropping = MODES[mode]
+    if cropping and crop_mode and (width > 640 or height > 640):
+        num_width_tiles, num_height_tiles = count_tiles(width, height, image_size=image_size)
+    else:
+        num_width_tiles = num_height_tiles = 1
+
+    patch_size = 16
+    downsample_ratio = 4
+    h = w = math.ceil((base_size // patch_size) / downsample_ratio)
+    h2 = w2 = math.ceil((image_size // patch_size) / downsample_ratio)
+
+    global_views_tokens = h * (w + 1)
+    if num_width_tiles > 1 or num_height_tiles > 1:
+        local_views_tokens = (num_height_tiles * h2) * (num_width_tiles * w2 + 1)
+    else:
+        local_views_tokens = 0
+
+    return global_views_tokens + local_views_tokens + 1
+
+
+class Lane:
+    """Queue and accounting of one scheduling lane."""
+
+    def __init__(self, name: str, weight: float, bulk: bool) -> None:
+        self.name = name
+        self.weight = weight
+        self.bulk = bulk
+        # Entries: (cost, start_tag, enqueued_at, future)
+        self.waiters: deque = deque()
+        self.outstanding = 0
+        self.last_finish = 0.0
+
+    def head(self) -> Optional[tuple]:
+        """First waiter that has not given up, discarding abandoned ones."""
+        while self.waiters:
+            entry = self.waiters[0]
+            if not entry[3].done():
+                return entry
+            self.waiters.popleft()
+        return None
+
+
+class AdmissionController:
+    """
+    Process-wide token budget shared by all OCR endpoints.
+
+    Each lane is served in FIFO order. Across lanes, the waiter with the
+    smallest start tag goes first; a lane's tags advance by cost / weight
+    per request, so a lane with weight 4 gets four times the tokens of a
+    lane with weight 1 while both are backlogged. A request larger than the
+    whole budget is admitted alone once nothing else is outstanding.
+
+    Interactive lanes have a bounded queue and a wait timeout (429 beyond
+    either). Bulk lanes wait without limit (their callers bound their own
+    concurrency) and only use the budget outside the interactive reserve.
+    """
+
+    _outstanding: int = 0
+    _virtual_time: float = 0.0
+    _lanes: dict[str, Lane] = {}
+
+    @staticmethod
+    def lane_name(bulk: bool = False, tenant: Optional[str] = None) -> str:
+        """Lane for a request class and optional tenant."""
+        lane_class = "bulk" if bulk else "interactive"
+        return f"{lane_class}:{tenant}" if tenant else lane_class
+
+    @staticmethod
+    def priority(lane_name: str) -> int:
+        """vLLM request priority for a lane (lower is scheduled earlier)."""
+        if lane_name.split(":", 1)[0] == "bulk":
+            return settings.scheduler_bulk_priority
+        return settings.scheduler_interactive_priority
+
+    @classmethod
+    def _lane(cls, name: str) -> Lane:
+        lane = cls._lanes.get(name)
+        if lane is None:
+            lane_class, _, tenant = name.partition(":")
+            tenant_lanes = sum(1 for other in cls._lanes if other.startswith(f"{lane_class}:"))
+            if tenant and tenant_lanes >= settings.scheduler_max_tenant_lanes:
+                # Tenants are client-chosen: beyond the cap they share the class
+                # lane, so rotating tenant IDs cannot buy more shares
+                return cls._lane(lane_class)
+            bulk = lane_class == "bulk"
+            weight = settings.scheduler_bulk_weight if bulk else settings.scheduler_interactive_weight
+            lane = Lane(name, weight, bulk)
+            cls._lanes[name] = lane
+        return lane
+
+    @classmethod
+    def _fits(cls, cost: int, bulk: bool = False) -> bool:
+        budget = settings.admission_token_budget
+        if budget == 0 or cls._outstanding == 0:
+            return True
+        if bulk:
+            budget = int(budget * (1.0 - settings.admission_interactive_reserve))
+        return cls._outstanding + cost <= budget
+
+    @classmethod
+    def _tag(cls, lane: Lane, cost: int) -> float:
+        """Assign the start tag of a new request and advance the lane's finish tag."""
+        start = max(cls._virtual_time, lane.last_finish)
+        lane.last_finish = start + cost / lane.weight
+        return start
+
+    @classmethod
+    def _grant(cls, lane: Lane, cost: int, start: float, enqueued_at: float) -> None:
+        cls._outstanding += cost
+        lane.outstanding += cost
+        cls._virtual_time = max(cls._virtual_time, start)
+        ADMISSION_QUEUE_WAIT.labels(lane=lane.name).observe(time.monotonic() - enqueued_at)
+
+    @classmethod
+    def _queued(cls, bulk: bool = False) -> int:
+        return sum(len(lane.waiters) for lane in cls._lanes.values() if lane.bulk == bulk)
+
+    @classmethod
+    def _update_gauges(cls) -> None:
+        ADMISSION_OUTSTANDING_TOKENS.set(cls._outstanding)
+        for name, lane in list(cls._lanes.items()):
+            if ":" in name and not lane.waiters and lane.outstanding == 0:
+                # Idle tenant lane: forget it so labels do not accumulate
+                del cls._lanes[name]
+                for gauge in (ADMISSION_QUEUED, ADMISSION_LANE_OUTSTANDING_TOKENS, ADMISSION_LANE_SHARE):
+                    try:
+                        gauge.remove(name)
+                    except KeyError:
+                        pass
+                continue
+            ADMISSION_QUEUED.labels(lane=name).set(len(lane.waiters))
+            ADMISSION_LANE_OUTSTANDING_TOKENS.labels(lane=name).set(lane.outstanding)
+            ADMISSION_LANE_SHARE.labels(lane=name).set(
+                lane.outstanding / cls._outstanding if cls._outstanding else 0.0
+            )
+
+    @classmethod
+    def _reject(cls, reason: str, cost: int, lane: str) -> AdmissionRejectedError:
+        ADMISSION_REJECTED.labels(reason=reason).inc()
+        queued = cls._queued()
+        logger.warning(
+            f"Admission rejected ({reason}): lane={lane}, cost={cost}, "
+            f"outstanding={cls._outstanding}, queued={queued}"
+        )
+        return AdmissionRejectedError(
+            retry_after=settings.admission_retry_after,
+            details={
+                "reason": reason,
+                "lane": lane,
+                "cost_tokens": cost,
+                "outstanding_tokens": cls._outstanding,
+                "budget_tokens": settings.admission_token_budget,
+                "queued_requests": queued,
+            },
+        )
+
+    @classmethod
+    async def acquire(cls, cost: int, lane_name: str = "interactive") -> str:
+        """
+        Reserve cost tokens of budget, waiting for the lane's turn if necessary.
+
+        Args:
+            cost: Estimated tokens (vision + max_tokens) of the request
+            lane_name: Scheduling lane, see lane_name()
+
+        Returns:
+            Lane the tokens were charged to (the class lane if the tenant
+            lane cap was reached); pass it to release()
+
+        Raises:
+            AdmissionRejectedError: If the queue is full or the wait times out
+        """
+        lane = cls._lane(lane_name)
+        now = time.monotonic()
+
+        if not any(other.waiters for other in cls._lanes.values()) and cls._fits(cost, lane.bulk):
+            cls._grant(lane, cost, cls._tag(lane, cost), now)
+            cls._update_gauges()
+            return lane.name
+
+        if not lane.bulk and cls._queued() >= settings.admission_max_queue:
+            raise cls._reject("queue_full", cost, lane.name)
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (cost, cls._tag(lane, cost), now, waiter)
+        lane.waiters.append(entry)
+        cls._wake()
+        cls._update_gauges()
+        timeout = None if lane.bulk else settings.admission_queue_timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Admitted just as the timeout fired: keep the slot
+                return lane.name
+            raise cls._reject("timeout", cost, lane.name)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted, but the caller went away: hand the budget back
+                cls.release(cost, lane.name)
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            if entry in lane.waiters:
+                lane.waiters.remove(entry)
+                cls._wake()
+            cls._update_gauges()
+        return lane.name
+
+    @classmethod
+    def release(cls, cost: int, lane_name: str = "interactive") -> None:
+        """Return cost tokens of budget and admit waiters that now fit."""
+        lane = cls._lane(lane_name)
+        lane.outstanding = max(0, lane.outstanding - cost)
+        cls._outstanding = max(0, cls._outstanding - cost)
+        cls._wake()
+        cls._update_gauges()
+
+    @classmethod
+    def _wake(cls) -> None:
+        """Admit waiters in start-tag order while they fit."""
+        while True:
+            heads = []
+            for lane in cls._lanes.values():
+                entry = lane.head()
+                if entry is not None:
+                    heads.append((entry[1], lane, entry))
+            heads.sort(key=lambda head: head[0])
+
+            for _, lane, (cost, start, enqueued_at, waiter) in heads:
+                if cls._fits(cost, lane.bulk):
+                    lane.waiters.popleft()
+                    cls._grant(lane, cost, start, enqueued_at)
+                    waiter.set_result(None)
+                    break
+                if not lane.bulk:
+                    # The budget itself is full: keep order rather than
+                    # letting smaller requests overtake this one
+                    return
+                # Only the interactive reserve blocks this bulk lane
+            else:
+                return
+
+    @classmethod
+    @asynccontextmanager
+    async def admit(cls, cost: int, lane_name: str = "interactive") -> AsyncIterator[None]:
+        """
+        Hold cost tokens of budget for the duration of the block.
+
+        Args:
+            cost: Estimated tokens (vision + max_tokens) of the request
+            lane_name: Scheduling lane, see lane_name()
+
+        Raises:
+            AdmissionRejectedError: If the request cannot be admitted
+        """
+        lane_name = await cls.acquire(cost, lane_name)
+        try:
+            yield
+        finally:
+            cls.release(cost, lane_name)
@@ -0,0 +1,149 @@
+"""
+Singleflight coalescing of identical in-flight OCR requests.
+
+When the same document is submitted several times concurrently (client
+retries, fan-out from different services), only the first submission is
+preprocessed and generated. Later identical submissions subscribe to that
+generation and receive the same stream of text chunks, including the chunks
+produced before they joined.
+
+The shared generation runs in its own task so that one client going away
+does not affect the others; it is cancelled (and the engine request
+aborted) only when its last subscriber leaves.
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from api.core.errors import RequestTimeoutError
+from api.core.logging import get_logger
+from api.core.metrics import COALESCED_REQUESTS, INFLIGHT_GENERATIONS
+
+logger = get_logger(__name__)
+
+
+class Flight:
+    """One shared generation and the requests waiting on it."""
+
+    def __init__(self, key: Optional[str], request_id: str) -> None:
+        self.key = key
+        self.request_id = request_id
+        self.chunks: list[str] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _run(self, chunks: AsyncIterator[str]) -> None:
+        """Drain the producer, publishing every chunk to subscribers."""
+        try:
+            async for chunk in chunks:
+                self.chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self._notify()
+            Coalescer.forget(self)
+
+    async def subscribe(self, deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yield every chunk of the shared generation from the beginning.
+
+        Args:
+            deadline: Absolute time.time() after which this subscriber gives up
+
+        Raises:
+            RequestTimeoutError: If the deadline passes before generation finishes
+            DeepSeekOCRError: If the shared generation failed
+        """
+        self.subscribers += 1
+        leave_reason = "cancelled"
+        try:
+            index = 0
+            while True:
+                while index < len(self.chunks):
+                    yield self.chunks[index]
+                    index += 1
+
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+
+                changed = self._changed
+                if deadline is None:
+                    await changed.wait()
+                    continue
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=max(0.0, deadline - time.time()))
+                except asyncio.TimeoutError:
+                    leave_reason = "deadline"
+                    raise RequestTimeoutError(
+                        message="Request deadline exceeded",
+                        details={"request_id": self.request_id},
+                    )
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.finished and self.task is not None:
+                # Nobody is waiting any more: stop the generation
+                Coalescer.forget(self)
+                self.task.cancel(msg=leave_reason)
+
+
+class Coalescer:
+    """Registry of in-flight generations keyed by request content."""
+
+    _flights: dict[str, Flight] = {}
+
+    @classmethod
+    def join(
+        cls,
+        key: Optional[str],
+        request_id: str,
+        produce: Callable[[], AsyncIterator[str]],
+    ) -> tuple[Flight, bool]:
+        """
+        Attach to the in-flight generation for key, or start a new one.
+
+        Args:
+            key: Content key of the request, or None to never coalesce
+            request_id: Engine request ID to use if a new generation starts
+            produce: Factory for the async iterator of generated text chunks
+
+        Returns:
+            Tuple of (flight, joined) where joined is True if an existing
+            generation was reused
+        """
+        if key is not None:
+            flight = cls._flights.get(key)
+            if flight is not None:
+                COALESCED_REQUESTS.inc()
+                logger.info(
+                    f"Coalesced identical request onto {flight.request_id} "
+                    f"({flight.subscribers + 1} waiting)"
+                )
+                return flight, True
+
+        flight = Flight(key, request_id)
+        if key is not None:
+            cls._flights[key] = flight
+        flight.task = asyncio.create_task(flight._run(produce()))
+        INFLIGHT_GENERATIONS.set(len(cls._flights))
+        return flight, False
+
+    @classmethod
+    def forget(cls, flight: Flight) -> None:
+        """Stop routing new requests to flight."""
+        if flight.key is not None and cls._flights.get(flight.key) is flight:
+            del cls._flights[flight.key]
+            INFLIGHT_GENERATIONS.set(len(cls._flights))
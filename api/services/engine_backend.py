@@ -0,0 +1,639 @@
+"""
+Engine backends behind EngineManager.
+
+An engine backend runs generations for EngineManager, which only depends on
+the small EngineBackend protocol below. That lets it drive several engine
+replicas, and lets routing be exercised with a stand-in engine on CPU.
+
+- LocalEngineBackend: a vLLM AsyncLLMEngine in the current process.
+- ProcessEngineBackend: a LocalEngineBackend in a child process pinned to
+  its own CUDA devices. One vLLM V0 engine owns the CUDA context of its
+  process, so data-parallel replicas need one process each.
+- RemoteEngineBackend: a separate engine-owner process (api.engine_server)
+  shared by several API workers; image tensors travel in shared memory.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import AbstractAsyncContextManager, contextmanager, nullcontext
+from dataclasses import dataclass
+from multiprocessing.connection import Client
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Protocol
+
+from api.core.config import settings
+from api.core.errors import DeepSeekOCRError, InferenceError
+from api.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class EngineOutput:
+    """One streaming update of a generation."""
+
+    # Text generated since the previous update
+    delta: str
+    # Total tokens generated so far
+    num_tokens: int
+    finished: bool
+    # Seconds spent waiting in the vLLM scheduler (once known)
+    time_in_queue: Optional[float] = None
+    # Prompt tokens whose KV cache was reused from the prefix cache (once known)
+    num_cached_tokens: Optional[int] = None
+
+
+class EngineBackend(Protocol):
+    """Interface EngineManager uses to run generations."""
+
+    name: str
+    # Seconds spent in each start-up phase, filled in by start()
+    startup_phases: dict[str, float]
+
+    async def start(self) -> None:
+        """Load the model; raises InferenceError on failure."""
+        ...
+
+    async def shutdown(self) -> None:
+        """Release the engine."""
+        ...
+
+    def generate(
+        self,
+        prompt: str,
+        image_features: Optional[Any],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        request_id: str,
+        priority: int = 0,
+        cost: Optional[int] = None,
+    ) -> AsyncIterator[EngineOutput]:
+        """Stream EngineOutput updates until the generation finishes."""
+        ...
+
+    async def abort(self, request_id: str) -> None:
+        """Stop a running generation and free its KV-cache blocks."""
+        ...
+
+
+def build_request(
+    prompt: str,
+    image_features: Optional[Any],
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+) -> tuple[dict[str, Any], Any]:
+    """
+    Build the vLLM prompt dict and sampling params for one generation.
+
+    Raises:
+        InferenceError: If the prompt is empty
+    """
+    from vllm import SamplingParams
+
+    from process.ngram_norepeat import NoRepeatNGramLogitsProcessor
+
+    # Setup logits processors for anti-repetition
+    # Whitelist: <td>, </td> tokens
+    logits_processors = [
+        NoRepeatNGramLogitsProcessor(
+            ngram_size=settings.ngram_size,
+            window_size=settings.window_size,
+            whitelist_token_ids={128821, 128822},
+        )
+    ]
+
+    # Create sampling params
+    sampling_params = SamplingParams(
+        temperature=temperature if temperature is not None else settings.temperature,
+        max_tokens=max_tokens if max_tokens is not None else settings.max_tokens,
+        logits_processors=logits_processors,
+        skip_special_tokens=False,
+    )
+
+    # Build request based on whether we have image features
+    if image_features and "<image>" in prompt:
+        request = {
+            "prompt": prompt,
+            "multi_modal_data": {"image": image_features},
+        }
+    elif prompt:
+        request = {"prompt": prompt}
+    else:
+        raise InferenceError(
+            message="Prompt cannot be empty",
+            details={"prompt": prompt},
+        )
+
+    return request, sampling_params
+
+
+# vLLM V0 executor methods timed as start-up phases
+_EXECUTOR_PHASES = {
+    "__init__": "load_model",
+    "determine_num_available_blocks": "profile_memory",
+    "initialize_cache": "kv_cache_and_cuda_graphs",
+}
+
+
+@contextmanager
+def _time_executor_phases(phases: dict[str, float]) -> Iterator[None]:
+    """
+    Record vLLM start-up phases into phases while an engine is being built.
+
+    The engine constructor does not report its phases, so the executor
+    methods that load weights, profile memory and allocate the KV cache
+    (which also captures CUDA graphs) are wrapped for the duration.
+    """
+    try:
+        from vllm.executor.executor_base import ExecutorBase
+    except ImportError:
+        yield
+        return
+
+    def timed(method: Callable, phase: str) -> Callable:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - start
+
+        return wrapper
+
+    originals = {
+        attr: method for attr, method in vars(ExecutorBase).items() if attr in _EXECUTOR_PHASES
+    }
+    for attr, method in originals.items():
+        setattr(ExecutorBase, attr, timed(method, _EXECUTOR_PHASES[attr]))
+    try:
+        yield
+    finally:
+        for attr, method in originals.items():
+            setattr(ExecutorBase, attr, method)
+
+
+class LocalEngineBackend:
+    """vLLM AsyncLLMEngine running in this process."""
+
+    def __init__(self, name: str = "local", tensor_parallel_size: Optional[int] = None) -> None:
+        self.name = name
+        self.tensor_parallel_size = tensor_parallel_size or settings.tensor_parallel_size
+        self.startup_phases: dict[str, float] = {}
+        self._engine = None
+
+    async def start(self) -> None:
+        # vLLM and the model code import torch; keep them out of module import
+        # so replica parents and CPU-only tooling stay light.
+        from vllm import AsyncLLMEngine
+        from vllm.engine.arg_utils import AsyncEngineArgs
+        from vllm.model_executor.models.registry import ModelRegistry
+
+        from deepseek_ocr import DeepseekOCRForCausalLM
+
+        try:
+            # Register custom model
+            ModelRegistry.register_model("DeepseekOCRForCausalLM", DeepseekOCRForCausalLM)
+            logger.info("Registered DeepseekOCRForCausalLM model")
+
+            # Create engine args
+            engine_args = AsyncEngineArgs(
+                model=settings.model_path,
+                hf_overrides={"architectures": ["DeepseekOCRForCausalLM"]},
+                block_size=256,
+                max_model_len=settings.max_model_len,
+                enforce_eager=False,
+                trust_remote_code=settings.trust_remote_code,
+                tensor_parallel_size=self.tensor_parallel_size,
+                gpu_memory_utilization=settings.gpu_memory_utilization,
+                scheduling_policy=settings.engine_scheduling_policy,
+                enable_prefix_caching=settings.engine_enable_prefix_caching,
+            )
+
+            # Initialize engine off the event loop so the server keeps
+            # answering (health checks, cached results) while it loads
+            start = time.perf_counter()
+            with _time_executor_phases(self.startup_phases):
+                self._engine = await asyncio.to_thread(AsyncLLMEngine.from_engine_args, engine_args)
+            self.startup_phases["total"] = time.perf_counter() - start
+
+        except Exception as e:
+            logger.error(f"Failed to initialize engine {self.name}: {e}", exc_info=True)
+            raise InferenceError(
+                message="Failed to initialize model engine",
+                details={"error": str(e), "engine": self.name},
+            )
+
+    async def shutdown(self) -> None:
+        # Note: vLLM AsyncEngine doesn't have explicit shutdown in current version
+        # Resources will be cleaned up when the process exits
+        self._engine = None
+
+    async def generate(
+        self,
+        prompt: str,
+        image_features: Optional[Any],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        request_id: str,
+        priority: int = 0,
+        cost: Optional[int] = None,
+    ) -> AsyncIterator[EngineOutput]:
+        request, sampling_params = build_request(prompt, image_features, temperature, max_tokens)
+        if settings.engine_scheduling_policy != "priority":
+            # vLLM rejects non-zero priorities under FCFS scheduling
+            priority = 0
+
+        emitted_length = 0
+        async for request_output in self._engine.generate(
+            request, sampling_params, request_id, priority=priority
+        ):
+            if not request_output.outputs:
+                continue
+            completion = request_output.outputs[0]
+            delta = completion.text[emitted_length:]
+            emitted_length = len(completion.text)
+            # RequestMetrics is only populated by the V0 engine; tolerate its absence
+            request_metrics = getattr(request_output, "metrics", None)
+            yield EngineOutput(
+                delta=delta,
+                num_tokens=len(completion.token_ids),
+                finished=request_output.finished,
+                time_in_queue=getattr(request_metrics, "time_in_queue", None),
+                num_cached_tokens=getattr(request_output, "num_cached_tokens", None),
+            )
+
+    async def abort(self, request_id: str) -> None:
+        if self._engine is not None:
+            await self._engine.abort(request_id)
+
+
+def _pump(conn: Any, loop: asyncio.AbstractEventLoop, inbox: asyncio.Queue) -> None:
+    """Forward messages from a connection into an asyncio queue (runs in a thread)."""
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            loop.call_soon_threadsafe(inbox.put_nowait, None)
+            return
+        loop.call_soon_threadsafe(inbox.put_nowait, message)
+
+
+def parse_address(address: str) -> Any:
+    """Turn 'host:port' into a TCP address; anything else is a Unix socket path."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+async def serve_connection(
+    conn: Any,
+    open_backend: Callable[[Optional[int]], AbstractAsyncContextManager[EngineBackend]],
+) -> None:
+    """
+    Serve generate/abort messages from one connection until it closes or sends shutdown.
+
+    Protocol (tuples, pickled by the connection):
+
+    - in: ("generate", request_id, (prompt, image_features, temperature, max_tokens), priority, cost)
+    - in: ("abort", request_id) / ("shutdown",)
+    - out: ("output", request_id, EngineOutput) ... then ("done", request_id)
+      or ("error", request_id, DeepSeekOCRError)
+
+    Args:
+        conn: Connection to the client (already past the ready handshake)
+        open_backend: Called with the request cost; returns a context manager
+            yielding the backend that runs the request
+    """
+    loop = asyncio.get_running_loop()
+    inbox: asyncio.Queue = asyncio.Queue()
+    threading.Thread(target=_pump, args=(conn, loop, inbox), daemon=True).start()
+    send_lock = threading.Lock()
+    running: dict[str, asyncio.Task] = {}
+
+    def send(message: tuple) -> None:
+        with send_lock:
+            conn.send(message)
+
+    async def run(request_id: str, args: tuple, priority: int, cost: Optional[int]) -> None:
+        shm = None
+        try:
+            prompt, image_features, temperature, max_tokens = args
+            # Compared by name so that importing this module does not pull in torch
+            if type(image_features).__name__ == "SharedFeatures":
+                from api.services.shared_tensors import import_features
+
+                image_features, shm = import_features(image_features)
+            async with open_backend(cost) as backend:
+                try:
+                    async for output in backend.generate(
+                        prompt,
+                        image_features,
+                        temperature,
+                        max_tokens,
+                        request_id=request_id,
+                        priority=priority,
+                        cost=cost,
+                    ):
+                        send(("output", request_id, output))
+                except BaseException:
+                    # Cancelled by the client, or the client went away
+                    await backend.abort(request_id)
+                    raise
+            send(("done", request_id))
+        except asyncio.CancelledError:
+            raise
+        except (OSError, ValueError) as e:
+            # The client went away mid-request
+            logger.warning(f"Dropping request {request_id}: {e}")
+        except DeepSeekOCRError as e:
+            send(("error", request_id, e))
+        except Exception as e:
+            error = InferenceError(message="Model inference failed", details={"error": str(e)})
+            send(("error", request_id, error))
+        finally:
+            running.pop(request_id, None)
+            if shm is not None:
+                from api.services.shared_tensors import release
+
+                image_features = None
+                release(shm)
+
+    try:
+        while True:
+            message = await inbox.get()
+            if message is None or message[0] == "shutdown":
+                break
+            if message[0] == "generate":
+                _, request_id, args, priority, cost = message
+                running[request_id] = asyncio.create_task(run(request_id, args, priority, cost))
+            elif message[0] == "abort":
+                task = running.get(message[1])
+                if task is not None:
+                    task.cancel()
+    finally:
+        tasks = list(running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _replica_main(conn: Any, devices: str, tensor_parallel_size: int) -> None:
+    """Entry point of an engine replica process."""
+    # Must be set before anything initializes CUDA in this process
+    os.environ["CUDA_VISIBLE_DEVICES"] = devices
+    os.environ["VLLM_USE_V1"] = "0"
+    asyncio.run(_serve_replica(conn, devices, tensor_parallel_size))
+
+
+async def _serve_replica(conn: Any, devices: str, tensor_parallel_size: int) -> None:
+    """Run a LocalEngineBackend and serve generate/abort messages from the parent."""
+    backend = LocalEngineBackend(name=f"cuda:{devices}", tensor_parallel_size=tensor_parallel_size)
+    try:
+        await backend.start()
+    except DeepSeekOCRError as e:
+        conn.send(("init_failed", e))
+        return
+    conn.send(("ready", backend.startup_phases))
+
+    await serve_connection(conn, lambda cost: nullcontext(backend))
+    await backend.shutdown()
+
+
+class _ConnectionEngineBackend(ABC):
+    """
+    Engine backend reached over a multiprocessing connection.
+
+    Speaks the serve_connection protocol: replica messages are routed to a
+    per-request queue by a dispatcher task.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.startup_phases: dict[str, float] = {}
+        self._conn = None
+        self._send_lock = threading.Lock()
+        self._streams: dict[str, asyncio.Queue] = {}
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def _connect(self) -> Any:
+        """Open the connection to the engine; returns it."""
+
+    def _exit_details(self) -> dict[str, Any]:
+        """Error details when the engine side goes away."""
+        return {"engine": self.name}
+
+    async def start(self) -> None:
+        self._conn = await self._connect()
+
+        loop = asyncio.get_running_loop()
+        inbox: asyncio.Queue = asyncio.Queue()
+        threading.Thread(target=_pump, args=(self._conn, loop, inbox), daemon=True).start()
+
+        message = await inbox.get()
+        if message is None:
+            raise InferenceError(
+                message="Engine exited during start-up",
+                details=self._exit_details(),
+            )
+        if message[0] == "init_failed":
+            raise message[1]
+        if len(message) > 1:
+            self.startup_phases = dict(message[1])
+
+        self._dispatcher = asyncio.create_task(self._dispatch(inbox))
+
+    async def _dispatch(self, inbox: asyncio.Queue) -> None:
+        """Route engine messages to the stream of their request."""
+        while True:
+            message = await inbox.get()
+            if message is None:
+                logger.error(f"Engine {self.name} exited unexpectedly")
+                error = InferenceError(message="Engine exited", details=self._exit_details())
+                for stream in self._streams.values():
+                    stream.put_nowait(("error", None, error))
+                return
+            stream = self._streams.get(message[1])
+            if stream is not None:
+                stream.put_nowait(message)
+
+    async def _send(self, message: tuple) -> None:
+        def send() -> None:
+            with self._send_lock:
+                self._conn.send(message)
+
+        # Image features can be several MB; do not block the event loop
+        await asyncio.to_thread(send)
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+    async def generate(
+        self,
+        prompt: str,
+        image_features: Optional[Any],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        request_id: str,
+        priority: int = 0,
+        cost: Optional[int] = None,
+    ) -> AsyncIterator[EngineOutput]:
+        stream: asyncio.Queue = asyncio.Queue()
+        self._streams[request_id] = stream
+        try:
+            await self._send(
+                (
+                    "generate",
+                    request_id,
+                    (prompt, image_features, temperature, max_tokens),
+                    priority,
+                    cost,
+                )
+            )
+            while True:
+                message = await stream.get()
+                if message[0] == "output":
+                    yield message[2]
+                elif message[0] == "error":
+                    raise message[2]
+                else:
+                    return
+        finally:
+            self._streams.pop(request_id, None)
+
+    async def abort(self, request_id: str) -> None:
+        await self._send(("abort", request_id))
+
+
+class ProcessEngineBackend(_ConnectionEngineBackend):
+    """
+    Engine replica in a child process pinned to a CUDA device list.
+
+    Requests and streamed outputs travel over a multiprocessing pipe; image
+    features are pickled once per request.
+    """
+
+    def __init__(self, name: str, devices: str) -> None:
+        super().__init__(name)
+        self.devices = devices
+        self.tensor_parallel_size = len(devices.split(","))
+        self._process: Optional[multiprocessing.Process] = None
+
+    async def _connect(self) -> Any:
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_replica_main,
+            args=(child_conn, self.devices, self.tensor_parallel_size),
+            name=f"engine-{self.name}",
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        return parent_conn
+
+    def _exit_details(self) -> dict[str, Any]:
+        exitcode = self._process.exitcode if self._process is not None else None
+        return {"engine": self.name, "exitcode": exitcode}
+
+    async def start(self) -> None:
+        await super().start()
+        logger.info(f"Engine replica {self.name} ready on CUDA devices {self.devices}")
+
+    async def shutdown(self) -> None:
+        if self._process is None:
+            return
+        try:
+            await self._send(("shutdown",))
+        except (OSError, ValueError):
+            pass
+        await asyncio.to_thread(self._process.join, 30)
+        if self._process.is_alive():
+            self._process.terminate()
+        await super().shutdown()
+        self._process = None
+
+
+class RemoteEngineBackend(_ConnectionEngineBackend):
+    """
+    Engine-owner process (``python -m api.engine_server``) shared by API workers.
+
+    The tensors of each request's image features are written once into a
+    shared-memory block that the engine maps without copying; only the
+    block name and layout go over the connection.
+    """
+
+    def __init__(self, address: str, name: str = "remote") -> None:
+        super().__init__(name)
+        self.address = address
+
+    async def _connect(self) -> Any:
+        authkey = settings.engine_authkey.encode() if settings.engine_authkey else None
+        address = parse_address(self.address)
+        deadline = time.time() + settings.engine_connect_timeout
+        logger.info(f"Connecting to engine process at {self.address}...")
+        while True:
+            try:
+                return await asyncio.to_thread(Client, address, authkey=authkey)
+            except (ConnectionRefusedError, FileNotFoundError) as e:
+                # The engine process only listens once its model is loaded
+                if time.time() >= deadline:
+                    raise InferenceError(
+                        message="Engine process is not reachable",
+                        details={"address": self.address, "error": str(e)},
+                    )
+                await asyncio.sleep(1.0)
+
+    def _exit_details(self) -> dict[str, Any]:
+        return {"engine": self.name, "address": self.address}
+
+    async def start(self) -> None:
+        await super().start()
+        logger.info(f"Connected to engine process at {self.address}")
+
+    async def shutdown(self) -> None:
+        # Ends this worker's session; the engine process cancels its requests
+        if self._conn is not None:
+            try:
+                await self._send(("shutdown",))
+            except (OSError, ValueError):
+                pass
+        await super().shutdown()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def generate(
+        self,
+        prompt: str,
+        image_features: Optional[Any],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        request_id: str,
+        priority: int = 0,
+        cost: Optional[int] = None,
+    ) -> AsyncIterator[EngineOutput]:
+        from api.services.shared_tensors import export_features, release
+
+        shm = None
+        if image_features:
+            image_features, shm = await asyncio.to_thread(export_features, image_features)
+        try:
+            async for output in super().generate(
+                prompt,
+                image_features,
+                temperature,
+                max_tokens,
+                request_id=request_id,
+                priority=priority,
+                cost=cost,
+            ):
+                yield output
+        finally:
+            release(shm, unlink=True)
@@ -1,42 +1,66 @@
 """
-Singleton manager for vLLM AsyncEngine.
+Singleton manager for the vLLM engine replicas.
 
-This module provides a singleton pattern to manage the DeepSeek-OCR model engine,
-ensuring it's loaded only once at server startup to avoid the 27.3s initialization overhead.
+This module provides a singleton pattern to manage the DeepSeek-OCR model engines,
+ensuring they're loaded only once at server startup to avoid the 27.3s initialization overhead.
+With ``engine_replica_devices`` set, one engine replica process is started per
+device list and requests are routed to the replica with the fewest outstanding tokens.
 """
 
 import asyncio
-import os
 import time
-from typing import Optional
-
-from vllm import AsyncLLMEngine, SamplingParams
-from vllm.engine.arg_utils import AsyncEngineArgs
-from vllm.model_executor.models.registry import ModelRegistry
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
 
 from api.core.config import settings
-from api.core.errors import InferenceError, ModelNotLoadedError
+from api.core.errors import (
+    DeepSeekOCRError,
+    InferenceError,
+    ModelNotLoadedError,
+    RequestTimeoutError,
+)
 from api.core.logging import get_logger
-from process.ngram_norepeat import NoRepeatNGramLogitsProcessor
-
-# Import and register custom model
-from deepseek_ocr import DeepseekOCRForCausalLM
+from api.core.metrics import (
+    ABORTED_TOKENS,
+    DECODE_TOKENS_PER_SECOND,
+    ENGINE_QUEUE_SECONDS,
+    ENGINE_REPLICA_OUTSTANDING_TOKENS,
+    ENGINE_STARTUP_PHASE_SECONDS,
+    GENERATED_TOKENS,
+    PREFIX_CACHE_HIT_TOKENS,
+    REQUESTS_ABORTED,
+    TIME_TO_FIRST_TOKEN,
+)
+from api.services.engine_backend import (
+    EngineBackend,
+    LocalEngineBackend,
+    ProcessEngineBackend,
+    RemoteEngineBackend,
+)
 
 logger = get_logger(__name__)
 
 
 class EngineManager:
     """
-    Singleton manager for vLLM AsyncEngine.
+    Singleton manager for the engine backends.
 
-    Ensures only one instance of the AsyncEngine exists per process,
-    preventing duplicate GPU memory usage and initialization overhead.
+    Ensures only one set of engines exists per process, preventing duplicate
+    GPU memory usage and initialization overhead.
     """
 
     _instance: Optional["EngineManager"] = None
-    _engine: Optional[AsyncLLMEngine] = None
+    _backends: list[EngineBackend] = []
+    _outstanding: dict[str, int] = {}
     _lock: asyncio.Lock = asyncio.Lock()
     _initialized: bool = False
+    # Start-up lifecycle: "stopped" -> "loading" -> "warming_up" -> "ready" (or "failed")
+    _state: str = "stopped"
+    _startup_started: Optional[float] = None
+    _startup_seconds: Optional[float] = None
+    _startup_error: Optional[str] = None
+    _warmup_seconds: dict[str, float] = {}
 
     def __new__(cls) -> "EngineManager":
         """Ensure singleton pattern."""
@@ -44,172 +68,455 @@ class EngineManager:
             cls._instance = super().__new__(cls)
         return cls._instance
 
+    @staticmethod
+    def local_backends() -> list[EngineBackend]:
+        """Engines owned by this process: replica processes or one in-process engine."""
+        if settings.engine_replica_devices:
+            groups = [group.strip() for group in settings.engine_replica_devices.split(";")]
+            return [
+                ProcessEngineBackend(name=f"replica-{index}", devices=devices)
+                for index, devices in enumerate(groups)
+                if devices
+            ]
+
+        # Apply CUDA configuration
+        settings.apply_cuda_config()
+        return [LocalEngineBackend()]
+
     @classmethod
-    async def initialize(cls) -> None:
+    def _create_backends(cls) -> list[EngineBackend]:
+        """Backends described by the settings."""
+        if settings.engine_address:
+            # A separate engine process owns the GPUs (see api.engine_server)
+            return [RemoteEngineBackend(settings.engine_address)]
+        return cls.local_backends()
+
+    @classmethod
+    async def initialize(
+        cls,
+        backends: Optional[list[EngineBackend]] = None,
+        warmup: Optional[bool] = None,
+    ) -> None:
         """
-        Initialize the vLLM AsyncEngine.
+        Start the engine backends, then warm them up.
 
         This should be called once at server startup via the FastAPI lifespan context.
+        The engine only reports ready (is_ready()) once warmup has finished.
+
+        Args:
+            backends: Backends to use instead of those described by the
+                settings (e.g. stand-in engines when testing routing on CPU)
+            warmup: Run one synthetic image per crop-ratio bucket through the
+                full pipeline first (defaults to settings.warmup_enabled)
         """
         async with cls._lock:
             if cls._initialized:
                 logger.warning("Engine already initialized, skipping re-initialization")
                 return
 
-            logger.info("Initializing vLLM AsyncEngine...")
-            start_time = time.time()
+            backends = backends if backends is not None else cls._create_backends()
+            logger.info(f"Initializing {len(backends)} engine backend(s)...")
+            cls._state = "loading"
+            cls._startup_started = time.time()
+            cls._startup_seconds = None
+            cls._startup_error = None
 
             try:
-                # Register custom model
-                ModelRegistry.register_model("DeepseekOCRForCausalLM", DeepseekOCRForCausalLM)
-                logger.info("Registered DeepseekOCRForCausalLM model")
-
-                # Apply CUDA configuration
-                settings.apply_cuda_config()
-
-                # Create engine args
-                engine_args = AsyncEngineArgs(
-                    model=settings.model_path,
-                    hf_overrides={"architectures": ["DeepseekOCRForCausalLM"]},
-                    block_size=256,
-                    max_model_len=settings.max_model_len,
-                    enforce_eager=False,
-                    trust_remote_code=settings.trust_remote_code,
-                    tensor_parallel_size=settings.tensor_parallel_size,
-                    gpu_memory_utilization=settings.gpu_memory_utilization,
+                # Replicas load in parallel, each on its own devices
+                results = await asyncio.gather(
+                    *(backend.start() for backend in backends), return_exceptions=True
                 )
+                failures = [result for result in results if isinstance(result, BaseException)]
+                if failures:
+                    await asyncio.gather(
+                        *(backend.shutdown() for backend in backends), return_exceptions=True
+                    )
+                    logger.error(f"Failed to initialize engine: {failures[0]}")
+                    if isinstance(failures[0], InferenceError):
+                        raise failures[0]
+                    raise InferenceError(
+                        message="Failed to initialize model engine",
+                        details={"error": str(failures[0])},
+                    )
+            except BaseException as e:
+                cls._state = "failed"
+                cls._startup_error = str(e) or type(e).__name__
+                if isinstance(e, DeepSeekOCRError) and "error" in e.details:
+                    cls._startup_error = f"{e.message}: {e.details['error']}"
+                raise
+
+            cls._backends = backends
+            cls._outstanding = {backend.name: 0 for backend in backends}
+            for backend in backends:
+                ENGINE_REPLICA_OUTSTANDING_TOKENS.labels(replica=backend.name).set(0)
+                for phase, seconds in backend.startup_phases.items():
+                    ENGINE_STARTUP_PHASE_SECONDS.labels(replica=backend.name, phase=phase).set(
+                        seconds
+                    )
+            cls._initialized = True
+
+            if warmup is None:
+                warmup = settings.warmup_enabled
+            if warmup:
+                cls._state = "warming_up"
+                try:
+                    await cls._warm_up()
+                except BaseException as e:
+                    await cls._stop_backends()
+                    cls._state = "failed"
+                    cls._startup_error = f"Warmup failed: {e}"
+                    raise
+
+            cls._state = "ready"
+            cls._startup_seconds = time.time() - cls._startup_started
+
+            logger.info(f"Engine initialized successfully in {cls._startup_seconds:.2f}s")
 
-                # Initialize engine
-                cls._engine = AsyncLLMEngine.from_engine_args(engine_args)
-                cls._initialized = True
-
-                elapsed = time.time() - start_time
-                logger.info(f"Engine initialized successfully in {elapsed:.2f}s")
+    @classmethod
+    async def _warm_up(cls) -> None:
+        """Run the shape-bucket warmup and record its timings."""
+        # Imported here: warmup drives the OCR pipeline, which uses this class
+        from api.services.warmup import run_warmup
+
+        logger.info("Warming up engine across crop-ratio buckets...")
+        start = time.time()
+        cls._warmup_seconds = await run_warmup()
+        logger.info(
+            f"Warmup of {len(cls._warmup_seconds)} buckets finished in {time.time() - start:.2f}s"
+        )
 
-            except Exception as e:
-                logger.error(f"Failed to initialize engine: {e}", exc_info=True)
-                cls._initialized = False
-                raise InferenceError(
-                    message="Failed to initialize model engine",
-                    details={"error": str(e)},
-                )
+    @classmethod
+    async def _stop_backends(cls) -> None:
+        """Shut down all backends and forget them."""
+        await asyncio.gather(
+            *(backend.shutdown() for backend in cls._backends), return_exceptions=True
+        )
+        cls._backends = []
+        cls._outstanding = {}
+        cls._initialized = False
 
     @classmethod
     async def shutdown(cls) -> None:
-        """Shutdown the engine and cleanup resources."""
+        """Shutdown the engines and cleanup resources."""
         async with cls._lock:
-            if cls._engine is not None:
-                logger.info("Shutting down vLLM AsyncEngine...")
-                # Note: vLLM AsyncEngine doesn't have explicit shutdown in current version
-                # Resources will be cleaned up when the process exits
-                cls._engine = None
-                cls._initialized = False
+            if cls._backends:
+                logger.info("Shutting down engine backends...")
+                await cls._stop_backends()
+                cls._state = "stopped"
                 logger.info("Engine shutdown complete")
 
     @classmethod
-    def get_engine(cls) -> AsyncLLMEngine:
+    def _pick_backend(cls) -> EngineBackend:
         """
-        Get the AsyncEngine instance.
+        Backend with the fewest outstanding tokens (first one on ties).
 
-        Returns:
-            AsyncLLMEngine instance
+        Raises:
+            ModelNotLoadedError: If engine hasn't been initialized
+        """
+        if not cls._initialized or not cls._backends:
+            cls.check_ready()
+        return min(cls._backends, key=lambda backend: cls._outstanding[backend.name])
+
+    @classmethod
+    def _track(cls, backend: EngineBackend, tokens: int) -> None:
+        """Adjust a backend's outstanding token count."""
+        if backend.name in cls._outstanding:
+            cls._outstanding[backend.name] += tokens
+            ENGINE_REPLICA_OUTSTANDING_TOKENS.labels(replica=backend.name).set(
+                cls._outstanding[backend.name]
+            )
+
+    @classmethod
+    @asynccontextmanager
+    async def lease(cls, cost: Optional[int] = None) -> AsyncIterator[EngineBackend]:
+        """
+        Pick the least-loaded backend and count cost against it until the block exits.
+
+        Args:
+            cost: Estimated tokens of the request (defaults to settings.max_tokens)
 
         Raises:
             ModelNotLoadedError: If engine hasn't been initialized
         """
-        if not cls._initialized or cls._engine is None:
-            raise ModelNotLoadedError("Engine has not been initialized. Call initialize() first.")
-        return cls._engine
+        backend = cls._pick_backend()
+        cost = cost if cost is not None else settings.max_tokens
+        cls._track(backend, cost)
+        try:
+            yield backend
+        finally:
+            cls._track(backend, -cost)
+
+    @staticmethod
+    def new_request_id() -> str:
+        """Return a collision-free vLLM request ID."""
+        return f"ocr-{uuid.uuid4().hex}"
+
+    @staticmethod
+    def _observe_completion(
+        time_in_queue: Optional[float],
+        generated_tokens: int,
+        first_token_time: Optional[float],
+        end_time: float,
+    ) -> None:
+        """Record queue time and decode throughput of a finished generation."""
+        GENERATED_TOKENS.observe(generated_tokens)
+
+        if time_in_queue is not None:
+            ENGINE_QUEUE_SECONDS.observe(time_in_queue)
+
+        if first_token_time is not None and generated_tokens > 1:
+            decode_time = end_time - first_token_time
+            if decode_time > 0:
+                DECODE_TOKENS_PER_SECOND.observe((generated_tokens - 1) / decode_time)
 
     @classmethod
-    async def generate(
+    async def generate_stream(
         cls,
         prompt: str,
-        image_features: Optional[str] = None,
+        image_features: Optional[Any] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
-        stream: bool = False,
-    ) -> str:
+        request_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+        priority: int = 0,
+        cost: Optional[int] = None,
+        stats: Optional[dict[str, int]] = None,
+    ) -> AsyncIterator[str]:
         """
-        Generate text using the AsyncEngine.
+        Generate text on the least-loaded engine, yielding text deltas as they are produced.
+
+        If the consumer is cancelled or stops iterating early (e.g. the HTTP
+        client disconnected), or the deadline passes, the request is aborted
+        in the engine so it stops holding KV-cache blocks.
 
         Args:
             prompt: Text prompt for generation
             image_features: Pre-processed image features from DeepseekOCRProcessor
             temperature: Sampling temperature (defaults to settings.temperature)
             max_tokens: Maximum tokens to generate (defaults to settings.max_tokens)
-            stream: Whether to stream the output (for future implementation)
-
-        Returns:
-            Generated text
+            request_id: Engine request ID (defaults to a new unique ID)
+            deadline: Absolute time.time() after which generation is aborted
+            priority: vLLM request priority (lower runs first); ignored unless
+                the engine uses the 'priority' scheduling policy
+            cost: Estimated tokens of the request (vision + max tokens), used
+                to route to the replica with the fewest outstanding tokens
+            stats: If given, filled with "generated_tokens" and, once the
+                engine reports it, "cached_tokens" (prompt tokens served from
+                the prefix cache)
+
+        Yields:
+            Newly generated text since the previous yield
 
         Raises:
             ModelNotLoadedError: If engine hasn't been initialized
+            RequestTimeoutError: If the deadline passed before generation finished
             InferenceError: If generation fails
         """
-        engine = cls.get_engine()
+        request_id = request_id or cls.new_request_id()
+        if cost is None:
+            cost = max_tokens if max_tokens is not None else settings.max_tokens
 
-        try:
-            # Setup logits processors for anti-repetition
-            # Whitelist: <td>, </td> tokens
-            logits_processors = [
-                NoRepeatNGramLogitsProcessor(
-                    ngram_size=settings.ngram_size,
-                    window_size=settings.window_size,
-                    whitelist_token_ids={128821, 128822},
+        async with cls.lease(cost) as backend:
+            submitted = False
+            finished = False
+            abort_reason = "cancelled"
+            generated_tokens = 0
+            outputs = None
+
+            try:
+                # Generate output
+                logger.info(f"Starting generation for request {request_id} on {backend.name}")
+                start_time = time.time()
+
+                emitted_length = 0
+                first_token_time = None
+                time_in_queue = None
+                cached_tokens = None
+                outputs = backend.generate(
+                    prompt,
+                    image_features,
+                    temperature,
+                    max_tokens,
+                    request_id=request_id,
+                    priority=priority,
+                    cost=cost,
+                )
+                submitted = True
+                while True:
+                    try:
+                        if deadline is None:
+                            output = await outputs.__anext__()
+                        else:
+                            output = await asyncio.wait_for(
+                                outputs.__anext__(),
+                                timeout=max(0.0, deadline - time.time()),
+                            )
+                    except StopAsyncIteration:
+                        break
+
+                    generated_tokens = output.num_tokens
+                    if output.time_in_queue is not None:
+                        time_in_queue = output.time_in_queue
+                    if output.num_cached_tokens is not None:
+                        cached_tokens = output.num_cached_tokens
+                    if first_token_time is None and generated_tokens:
+                        first_token_time = time.time()
+                        TIME_TO_FIRST_TOKEN.observe(first_token_time - start_time)
+                    emitted_length += len(output.delta)
+                    if output.delta:
+                        yield output.delta
+
+                finished = True
+                end_time = time.time()
+                elapsed = end_time - start_time
+                cls._observe_completion(time_in_queue, generated_tokens, first_token_time, end_time)
+                if cached_tokens:
+                    PREFIX_CACHE_HIT_TOKENS.inc(cached_tokens)
+                if stats is not None:
+                    stats["generated_tokens"] = generated_tokens
+                    if cached_tokens is not None:
+                        stats["cached_tokens"] = cached_tokens
+                logger.info(
+                    f"Generation complete for {request_id} in {elapsed:.2f}s "
+                    f"({emitted_length} chars)"
                 )
-            ]
 
-            # Create sampling params
-            sampling_params = SamplingParams(
-                temperature=temperature if temperature is not None else settings.temperature,
-                max_tokens=max_tokens if max_tokens is not None else settings.max_tokens,
-                logits_processors=logits_processors,
-                skip_special_tokens=False,
-            )
+            except asyncio.TimeoutError:
+                abort_reason = "deadline"
+                raise RequestTimeoutError(
+                    message="Request deadline exceeded during generation",
+                    details={"request_id": request_id, "generated_tokens": generated_tokens},
+                )
+
+            except asyncio.CancelledError as e:
+                # Callers may pass the reason as the cancel message (Task.cancel(msg=...))
+                if e.args and e.args[0] in ("cancelled", "deadline"):
+                    abort_reason = e.args[0]
+                raise
+
+            except DeepSeekOCRError:
+                raise
 
-            # Generate unique request ID
-            request_id = f"request-{int(time.time() * 1000)}"
-
-            # Build request based on whether we have image features
-            if image_features and "<image>" in prompt:
-                request = {
-                    "prompt": prompt,
-                    "multi_modal_data": {"image": image_features},
-                }
-            elif prompt:
-                request = {"prompt": prompt}
-            else:
+            except Exception as e:
+                abort_reason = "error"
+                logger.error(f"Generation failed: {e}", exc_info=True)
                 raise InferenceError(
-                    message="Prompt cannot be empty",
-                    details={"prompt": prompt},
+                    message="Model inference failed",
+                    details={"error": str(e)},
                 )
 
-            # Generate output
-            logger.info(f"Starting generation for request {request_id}")
-            start_time = time.time()
+            finally:
+                if outputs is not None:
+                    await outputs.aclose()
+                if submitted and not finished:
+                    await backend.abort(request_id)
+                    REQUESTS_ABORTED.labels(reason=abort_reason).inc()
+                    ABORTED_TOKENS.labels(reason=abort_reason).inc(generated_tokens)
+                    logger.info(
+                        f"Aborted request {request_id} ({abort_reason}) "
+                        f"after {generated_tokens} generated tokens"
+                    )
 
-            full_text = ""
-            async for request_output in engine.generate(request, sampling_params, request_id):
-                if request_output.outputs:
-                    full_text = request_output.outputs[0].text
+    @classmethod
+    async def generate(
+        cls,
+        prompt: str,
+        image_features: Optional[Any] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        request_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+        priority: int = 0,
+        cost: Optional[int] = None,
+        stats: Optional[dict[str, int]] = None,
+    ) -> str:
+        """
+        Generate text using the AsyncEngine.
 
-            elapsed = time.time() - start_time
-            logger.info(
-                f"Generation complete for {request_id} in {elapsed:.2f}s "
-                f"({len(full_text)} chars)"
-            )
+        Args:
+            prompt: Text prompt for generation
+            image_features: Pre-processed image features from DeepseekOCRProcessor
+            temperature: Sampling temperature (defaults to settings.temperature)
+            max_tokens: Maximum tokens to generate (defaults to settings.max_tokens)
+            request_id: Engine request ID (defaults to a new unique ID)
+            deadline: Absolute time.time() after which generation is aborted
+            priority: vLLM request priority (lower runs first)
+            cost: Estimated tokens of the request, used for replica routing
+            stats: If given, filled as by generate_stream
 
-            return full_text
+        Returns:
+            Generated text
 
-        except Exception as e:
-            logger.error(f"Generation failed: {e}", exc_info=True)
-            raise InferenceError(
-                message="Model inference failed",
-                details={"error": str(e)},
-            )
+        Raises:
+            ModelNotLoadedError: If engine hasn't been initialized
+            RequestTimeoutError: If the deadline passed before generation finished
+            InferenceError: If generation fails
+        """
+        chunks = []
+        async for delta in cls.generate_stream(
+            prompt=prompt,
+            image_features=image_features,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            request_id=request_id,
+            deadline=deadline,
+            priority=priority,
+            cost=cost,
+            stats=stats,
+        ):
+            chunks.append(delta)
+        return "".join(chunks)
 
     @classmethod
     def is_ready(cls) -> bool:
         """Check if the engine is initialized and ready."""
-        return cls._initialized and cls._engine is not None
+        return cls._state == "ready" and bool(cls._backends)
+
+    @classmethod
+    def check_ready(cls) -> None:
+        """
+        Fail fast while the engine is not serving.
+
+        Raises:
+            ModelNotLoadedError: While the engine is loading (with Retry-After),
+                or after it failed to start
+        """
+        if cls.is_ready():
+            return
+        if cls._state == "failed":
+            raise ModelNotLoadedError(f"Engine failed to start: {cls._startup_error}")
+        if cls._state in ("loading", "warming_up"):
+            raise ModelNotLoadedError(
+                "Model is still loading, please retry later",
+                retry_after=settings.engine_startup_retry_after,
+            )
+        raise ModelNotLoadedError("Engine has not been initialized. Call initialize() first.")
+
+    @classmethod
+    def startup_status(cls) -> dict[str, Any]:
+        """
+        Start-up state and timings.
+
+        Returns:
+            Dict with state, elapsed_seconds (so far, or in total once ready),
+            per-backend phase timings, per-bucket warmup timings and the
+            start-up error, if any
+        """
+        if cls._startup_seconds is not None:
+            elapsed = cls._startup_seconds
+        elif cls._startup_started is not None:
+            elapsed = time.time() - cls._startup_started
+        else:
+            elapsed = None
+        return {
+            "state": cls._state,
+            "elapsed_seconds": elapsed,
+            "phases": {backend.name: dict(backend.startup_phases) for backend in cls._backends},
+            "warmup": dict(cls._warmup_seconds),
+            "error": cls._startup_error,
+        }
+
+    @classmethod
+    def replicas(cls) -> list[str]:
+        """Names of the running engine backends."""
+        return [backend.name for backend in cls._backends]
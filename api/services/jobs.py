@@ -0,0 +1,593 @@
+"""
+Background OCR jobs for large documents.
+
+Jobs (a PDF or a set of images) are persisted in a local SQLite database
+together with their uploaded inputs, so queued work survives restarts. A
+single worker loop keeps up to ``job_page_concurrency`` pages in flight
+through OCRPipeline in the bulk admission lane, which keeps the engine busy
+while leaving the interactive reserve of the token budget to HTTP traffic.
+Pages repeating an earlier page of the same job (by content digest, or
+optionally perceptual hash) reuse that page's result instead of a generation.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+
+from api.core.config import settings
+from api.core.errors import JobNotFinishedError, JobNotFoundError, ServerBusyError, error_payload
+from api.core.logging import get_logger
+from api.core.metrics import JOB_DUPLICATE_ITEMS, JOB_ITEMS_IN_FLIGHT, JOB_ITEMS_PROCESSED
+from api.models.requests import OCRRequest
+from api.services.ocr_pipeline import OCRPipeline
+from api.services.pdf import PDFRasterizer
+from api.services.preprocess_pool import PreprocessPool
+from process.page_hash import PageHashIndex
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total_items INTEGER NOT NULL,
+    completed_items INTEGER NOT NULL DEFAULT 0,
+    failed_items INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    idx INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    page INTEGER,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    digest TEXT,
+    phash TEXT,
+    duplicate_of INTEGER,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status);
+"""
+
+# Columns added to job_items after its first release: name -> type
+_ITEM_COLUMNS = {"digest": "TEXT", "phash": "TEXT", "duplicate_of": "INTEGER"}
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs and their items (pages or images).
+
+    All methods are blocking; JobManager calls them through asyncio.to_thread.
+    One connection is shared and serialized with a lock.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.root / "jobs.sqlite3", check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(job_items)")}
+        for column, kind in _ITEM_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE job_items ADD COLUMN {column} {kind}")
+        self._lock = threading.Lock()
+        self._worker_lock: Optional[int] = None
+
+    def input_dir(self, job_id: str) -> Path:
+        return self.root / "inputs" / job_id
+
+    def create_job(
+        self,
+        job_id: str,
+        kind: str,
+        filename: str,
+        options: str,
+        items: list[tuple[int, str, Optional[int]]],
+    ) -> None:
+        """Insert a queued job and its pending items (index, source, page)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, filename, options, status, total_items, "
+                    "created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, kind, filename, options, len(items), now, now),
+                )
+                self._conn.executemany(
+                    "INSERT INTO job_items (job_id, idx, source, page, status) "
+                    "VALUES (?, ?, ?, ?, 'pending')",
+                    [(job_id, idx, source, page) for idx, source, page in items],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_job(self, job_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_items(self, job_id: str) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM job_items WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim_pending(self, limit: int) -> list[dict[str, Any]]:
+        """Mark up to limit pending items of the oldest jobs as running and return them."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT i.job_id, i.idx, i.source, i.page, j.kind, j.options "
+                    "FROM job_items i JOIN jobs j ON j.id = i.job_id "
+                    "WHERE i.status = 'pending' ORDER BY j.created_at, i.idx LIMIT ?",
+                    (limit,),
+                ).fetchall()
+                now = time.time()
+                for row in rows:
+                    self._conn.execute(
+                        "UPDATE job_items SET status = 'running' WHERE job_id = ? AND idx = ?",
+                        (row["job_id"], row["idx"]),
+                    )
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', updated_at = ? "
+                        "WHERE id = ? AND status = 'queued'",
+                        (now, row["job_id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [dict(row) for row in rows]
+
+    def requeue_item(self, job_id: str, idx: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job_items SET status = 'pending' WHERE job_id = ? AND idx = ?",
+                (job_id, idx),
+            )
+
+    def finish_item(
+        self,
+        job_id: str,
+        idx: int,
+        result: Optional[str] = None,
+        error: Optional[str] = None,
+        digest: Optional[str] = None,
+        phash: Optional[str] = None,
+        duplicate_of: Optional[int] = None,
+    ) -> bool:
+        """
+        Store an item outcome and complete the job once every item is done.
+
+        digest and phash (hex) fingerprint the item's image; duplicate_of is
+        the index of the item whose result it reused.
+
+        Returns:
+            True if this was the job's last outstanding item
+        """
+        now = time.time()
+        counter = "completed_items" if error is None else "failed_items"
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "UPDATE job_items SET status = ?, result = ?, error = ?, digest = ?, "
+                    "phash = ?, duplicate_of = ? WHERE job_id = ? AND idx = ?",
+                    (
+                        "completed" if error is None else "failed",
+                        result,
+                        error,
+                        digest,
+                        phash,
+                        duplicate_of,
+                        job_id,
+                        idx,
+                    ),
+                )
+                self._conn.execute(
+                    f"UPDATE jobs SET {counter} = {counter} + 1, updated_at = ? WHERE id = ?",
+                    (now, job_id),
+                )
+                # A job with no successful item is failed, otherwise completed
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET finished_at = ?, status = CASE "
+                    "WHEN completed_items = 0 THEN 'failed' ELSE 'completed' END "
+                    "WHERE id = ? AND completed_items + failed_items = total_items",
+                    (now, job_id),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount == 1
+
+    def recover(self) -> int:
+        """Requeue items left running by a previous process; returns their count."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE job_items SET status = 'pending' WHERE status = 'running'"
+            )
+        return cursor.rowcount
+
+    def acquire_worker_lock(self) -> bool:
+        """
+        Try to become the process that runs jobs from this store.
+
+        With several API workers only one may recover and process items; the
+        others just submit jobs and read their status. The lock is released
+        when the holding process exits.
+        """
+        fd = os.open(self.root / "worker.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._worker_lock = fd
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        if self._worker_lock is not None:
+            os.close(self._worker_lock)
+            self._worker_lock = None
+
+
+class JobManager:
+    """
+    Process-wide job submission API and background worker loop.
+
+    Items are claimed from the store in job order and processed concurrently;
+    the loop sleeps until an item finishes, a job is submitted, or
+    ``job_poll_interval`` elapses.
+    """
+
+    _store: Optional[JobStore] = None
+    _worker: Optional[asyncio.Task] = None
+    _wakeup: Optional[asyncio.Event] = None
+    _in_flight: set = set()
+    # Per job: fingerprints of pages processed or in flight, and their results
+    # (result JSON, or None if the page failed)
+    _page_indexes: dict[str, PageHashIndex] = {}
+    _page_results: dict[tuple[str, int], asyncio.Future] = {}
+
+    @classmethod
+    def get_store(cls) -> JobStore:
+        if cls._store is None:
+            cls._store = JobStore(Path(settings.jobs_dir))
+        return cls._store
+
+    @classmethod
+    def start(cls) -> None:
+        """Open the store, requeue interrupted items and start the worker loop."""
+        if cls._worker is not None:
+            logger.warning("Job worker already started, skipping")
+            return
+
+        if not cls.get_store().acquire_worker_lock():
+            logger.info("Job worker runs in another API worker process; only accepting jobs here")
+            return
+
+        recovered = cls.get_store().recover()
+        if recovered:
+            logger.info(f"Requeued {recovered} job items interrupted by the last shutdown")
+
+        cls._wakeup = asyncio.Event()
+        cls._worker = asyncio.create_task(cls._run())
+        JOB_ITEMS_IN_FLIGHT.set_function(lambda: len(cls._in_flight))
+        logger.info(
+            f"Job worker started (dir={settings.jobs_dir}, "
+            f"concurrency={settings.job_page_concurrency})"
+        )
+
+    @classmethod
+    async def stop(cls) -> None:
+        """Stop the worker; in-flight items are requeued on the next start."""
+        tasks = list(cls._in_flight)
+        if cls._worker is not None:
+            tasks.append(cls._worker)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        cls._worker = None
+        cls._in_flight.clear()
+        cls._page_indexes.clear()
+        cls._page_results.clear()
+        if cls._store is not None:
+            cls._store.close()
+            cls._store = None
+        logger.info("Job worker stopped")
+
+    @classmethod
+    def _notify(cls) -> None:
+        if cls._wakeup is not None:
+            cls._wakeup.set()
+
+    @classmethod
+    async def create_input_dir(cls) -> tuple[str, Path]:
+        """
+        Allocate a job ID and create the directory its uploads are spooled into.
+
+        Returns:
+            Tuple of (job_id, input directory); pass the ID to submit_pdf or
+            submit_images, or to discard_inputs if the upload is rejected
+        """
+        job_id = uuid.uuid4().hex
+        input_dir = cls.get_store().input_dir(job_id)
+        await asyncio.to_thread(input_dir.mkdir, parents=True, exist_ok=True)
+        return job_id, input_dir
+
+    @classmethod
+    async def discard_inputs(cls, job_id: str) -> None:
+        """Remove the spooled uploads of a job that was not submitted."""
+        input_dir = cls.get_store().input_dir(job_id)
+        await asyncio.to_thread(shutil.rmtree, input_dir, ignore_errors=True)
+
+    @classmethod
+    async def submit_pdf(
+        cls,
+        job_id: str,
+        path: Path,
+        filename: str,
+        request: OCRRequest,
+        pages: range,
+    ) -> dict[str, Any]:
+        """
+        Queue one item per page in pages (0-based indices) of a spooled PDF.
+
+        Returns:
+            The stored job row
+        """
+        await asyncio.to_thread(
+            cls.get_store().create_job,
+            job_id,
+            "pdf",
+            filename,
+            request.model_dump_json(),
+            [(idx, str(path), page_index + 1) for idx, page_index in enumerate(pages)],
+        )
+        cls._notify()
+        logger.info(f"Queued PDF job {job_id} ({filename}, {len(pages)} pages)")
+        return await cls.get(job_id)
+
+    @classmethod
+    async def submit_images(
+        cls,
+        job_id: str,
+        inputs: list[tuple[str, Path]],
+        request: OCRRequest,
+    ) -> dict[str, Any]:
+        """
+        Queue one item per spooled image, given as (filename, path).
+
+        Returns:
+            The stored job row
+        """
+        items = [(idx, str(path), None) for idx, (_, path) in enumerate(inputs)]
+        label = inputs[0][0] if len(inputs) == 1 else f"{len(inputs)} images"
+        await asyncio.to_thread(
+            cls.get_store().create_job, job_id, "images", label, request.model_dump_json(), items
+        )
+        cls._notify()
+        logger.info(f"Queued image job {job_id} ({len(inputs)} images)")
+        return await cls.get(job_id)
+
+    @classmethod
+    async def get(cls, job_id: str) -> dict[str, Any]:
+        """
+        Raises:
+            JobNotFoundError: If the job does not exist
+        """
+        job = await asyncio.to_thread(cls.get_store().get_job, job_id)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job
+
+    @classmethod
+    async def result(cls, job_id: str) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        """
+        Return a finished job and its items with decoded results and errors.
+
+        Raises:
+            JobNotFoundError: If the job does not exist
+            JobNotFinishedError: If items are still pending or running
+        """
+        job = await cls.get(job_id)
+        if job["finished_at"] is None:
+            raise JobNotFinishedError(job_id, job["status"])
+
+        items = await asyncio.to_thread(cls.get_store().get_items, job_id)
+        for item in items:
+            item["result"] = json.loads(item["result"]) if item["result"] else None
+            item["error"] = json.loads(item["error"]) if item["error"] else None
+        return job, items
+
+    @classmethod
+    async def _run(cls) -> None:
+        """Keep up to job_page_concurrency items in flight."""
+        store = cls.get_store()
+        while True:
+            cls._wakeup.clear()
+            free = settings.job_page_concurrency - len(cls._in_flight)
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = await asyncio.to_thread(store.claim_pending, free)
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to claim job items: {e}", exc_info=True)
+
+            for item in claimed:
+                task = asyncio.create_task(cls._process_item(item))
+                cls._in_flight.add(task)
+                task.add_done_callback(cls._item_done)
+
+            if not claimed or len(cls._in_flight) >= settings.job_page_concurrency:
+                try:
+                    await asyncio.wait_for(cls._wakeup.wait(), timeout=settings.job_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    @classmethod
+    def _item_done(cls, task: asyncio.Task) -> None:
+        cls._in_flight.discard(task)
+        cls._notify()
+
+    @classmethod
+    async def _page_index(cls, job_id: str) -> PageHashIndex:
+        """Fingerprint index of a job, rebuilt from its finished items after a restart."""
+        if job_id in cls._page_indexes:
+            return cls._page_indexes[job_id]
+
+        items = await asyncio.to_thread(cls.get_store().get_items, job_id)
+        if job_id in cls._page_indexes:
+            return cls._page_indexes[job_id]
+
+        index = PageHashIndex(settings.job_dedup_max_distance, settings.job_dedup_exact_only)
+        for item in items:
+            if item["status"] == "completed" and item["digest"] and item["duplicate_of"] is None:
+                phash = int(item["phash"], 16) if item["phash"] else None
+                index.add(item["idx"], item["digest"], phash)
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(item["result"])
+                cls._page_results[(job_id, item["idx"])] = future
+        cls._page_indexes[job_id] = index
+        return index
+
+    @classmethod
+    async def _match_page(
+        cls, job_id: str, idx: int, digest: str, phash: Optional[int]
+    ) -> tuple[Optional[int], Optional[str]]:
+        """
+        Find an earlier page of the job that this one repeats.
+
+        Waits for that page if it is still in flight. Without a (successful)
+        match, the page is registered as the one later repeats wait for.
+
+        Returns:
+            Tuple of (index of the repeated item, its result JSON), or
+            (None, None) if the page has to be processed
+        """
+        while True:
+            index = await cls._page_index(job_id)
+            source = index.find(digest, phash)
+            if source is None:
+                index.add(idx, digest, phash)
+                cls._page_results[(job_id, idx)] = asyncio.get_running_loop().create_future()
+                return None, None
+            # Shielded: cancelling this item must not cancel the source's result
+            result = await asyncio.shield(cls._page_results[(job_id, source)])
+            if result is not None:
+                return source, result
+            # The source failed and removed itself from the index: look again
+
+    @classmethod
+    def _publish_page(cls, job_id: str, idx: int, result: Optional[str]) -> None:
+        """Hand a registered page's result (None: failed) to the pages waiting for it."""
+        future = cls._page_results.get((job_id, idx))
+        if future is None or future.done():
+            return
+        if result is None:
+            cls._page_results.pop((job_id, idx))
+            index = cls._page_indexes.get(job_id)
+            if index is not None:
+                index.discard(idx)
+        future.set_result(result)
+
+    @classmethod
+    def _forget_pages(cls, job_id: str) -> None:
+        cls._page_indexes.pop(job_id, None)
+        for key in [key for key in cls._page_results if key[0] == job_id]:
+            del cls._page_results[key]
+
+    @classmethod
+    async def _process_item(cls, item: dict[str, Any]) -> None:
+        """Run one page or image through the pipeline and store the outcome."""
+        store = cls.get_store()
+        job_id, idx = item["job_id"], item["idx"]
+        digest = phash = duplicate_of = result = None
+        try:
+            request = OCRRequest.model_validate_json(item["options"])
+            if item["kind"] == "pdf":
+                image_data = await PDFRasterizer.render_page(item["source"], item["page"] - 1)
+                filename = f"page-{item['page']:04d}.png"
+            else:
+                image_data = await asyncio.to_thread(Path(item["source"]).read_bytes)
+                filename = Path(item["source"]).name
+            if settings.job_dedup_enabled:
+                digest, phash = await PreprocessPool.fingerprint(
+                    image_data, filename, perceptual=not settings.job_dedup_exact_only
+                )
+                duplicate_of, result = await cls._match_page(job_id, idx, digest, phash)
+            if duplicate_of is None:
+                response = await OCRPipeline.run(image_data, filename, request, bulk=True)
+                result = response.model_dump_json(exclude_none=True)
+                cls._publish_page(job_id, idx, result)
+        except ServerBusyError:
+            # Interactive traffic filled the preprocessing queue: back off and retry
+            cls._publish_page(job_id, idx, None)
+            await asyncio.sleep(settings.job_poll_interval)
+            await asyncio.to_thread(store.requeue_item, job_id, idx)
+            return
+        except Exception as e:
+            cls._publish_page(job_id, idx, None)
+            logger.error(f"Job {job_id} item {idx} failed: {e}", exc_info=True)
+            JOB_ITEMS_PROCESSED.labels(result="failed").inc()
+            job_finished = await asyncio.to_thread(
+                store.finish_item, job_id, idx, None, json.dumps(error_payload(e)), digest
+            )
+        else:
+            if duplicate_of is not None:
+                logger.info(
+                    f"Job {job_id} item {idx} repeats item {duplicate_of}, reusing its result"
+                )
+                JOB_DUPLICATE_ITEMS.inc()
+            JOB_ITEMS_PROCESSED.labels(result="completed").inc()
+            job_finished = await asyncio.to_thread(
+                store.finish_item,
+                job_id,
+                idx,
+                result,
+                None,
+                digest,
+                f"{phash:x}" if phash is not None else None,
+                duplicate_of,
+            )
+        finally:
+            # Repeats waiting on this page must never hang: unless its result
+            # was published, release them (requeue, failure, cancellation)
+            cls._publish_page(job_id, idx, None)
+
+        if job_finished:
+            cls._forget_pages(job_id)
+            job = await cls.get(job_id)
+            logger.info(
+                f"Job {job_id} {job['status']} ({job['completed_items']} ok, "
+                f"{job['failed_items']} failed)"
+            )
+            # Results live in the database; the uploaded inputs are no longer needed
+            await asyncio.to_thread(shutil.rmtree, store.input_dir(job_id), ignore_errors=True)
@@ -0,0 +1,185 @@
+"""
+Content-density heuristic behind the 'auto' resolution mode.
+
+DeepSeek-OCR decodes text reliably while a page carries no more than about
+ten text tokens per vision token, and as long as its lines stay a legible
+height once the image is scaled to the mode's view. Both are estimated on a
+downscaled grayscale copy: strong intensity edges mark glyph strokes, and a
+horizontal projection profile of them, taken per vertical strip so that
+side-by-side columns do not merge, splits the page into text lines. Line
+heights give the text size and the inked width of each line a character
+(and so token) count. The cheapest mode satisfying both limits is picked;
+pages that cannot be measured fall back to gundam. The constants were tuned
+on the sample pages in test-data/.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from api.models.requests import ResolutionMode
+from api.services.admission import estimate_vision_tokens
+from config import MODES
+
+# Height of the copy the estimate is computed on (rows resolve text lines,
+# so wide images keep up to twice this width)
+ANALYSIS_SIZE = 1024
+# Vertical strips the line profile is taken in
+_STRIPS = 4
+
+# Gray-level step between neighbouring pixels that counts as a stroke edge
+_EDGE_THRESHOLD = 40
+# Rows of a strip with a larger share of edge pixels belong to a text line
+_LINE_EDGE_RATIO = 0.02
+# Runs thinner than this (in analysis pixels) are rules and borders, not text
+_MIN_LINE_PIXELS = 3
+# Tallest line, relative to the median, that still counts as text (not a figure)
+_MAX_LINE_HEIGHT_FACTOR = 3.0
+
+# Average glyph width relative to line height, and characters per text token
+_CHAR_ASPECT = 0.4
+_CHARS_PER_TOKEN = 3.0
+
+# Text tokens per vision token the model still decodes at ~97% precision
+MAX_COMPRESSION = 10.0
+# Line height (in pixels of the encoded view) below which glyphs blur
+# together: one SAM patch
+MIN_LINE_HEIGHT = 16.0
+
+# Candidates from cheapest to most expensive; gundam is the fallback
+_CANDIDATES = (
+    ResolutionMode.TINY,
+    ResolutionMode.SMALL,
+    ResolutionMode.BASE,
+    ResolutionMode.LARGE,
+)
+
+
+@dataclass
+class DensityEstimate:
+    """What auto mode measured on an image (heights in original pixels)."""
+
+    edge_ratio: float
+    text_lines: int
+    line_height: float
+    text_tokens: int
+
+
+def _edge_mask(gray: np.ndarray) -> np.ndarray:
+    """Pixels with a strong horizontal or vertical intensity step."""
+    gray = gray.astype(np.int16)
+    edges = np.zeros(gray.shape, dtype=bool)
+    edges[:, 1:] |= np.abs(np.diff(gray, axis=1)) > _EDGE_THRESHOLD
+    edges[1:, :] |= np.abs(np.diff(gray, axis=0)) > _EDGE_THRESHOLD
+    return edges
+
+
+def _line_runs(edges: np.ndarray) -> list[tuple[int, int]]:
+    """Row ranges [start, stop) of a strip that contain text."""
+    rows = np.concatenate(([False], edges.mean(axis=1) > _LINE_EDGE_RATIO, [False]))
+    bounds = np.flatnonzero(rows[1:] != rows[:-1])
+    return [
+        (int(start), int(stop))
+        for start, stop in zip(bounds[::2], bounds[1::2])
+        if stop - start >= _MIN_LINE_PIXELS
+    ]
+
+
+def estimate_density(
+    image: Image.Image,
+    size: Optional[tuple[int, int]] = None,
+) -> DensityEstimate:
+    """
+    Measure stroke edges, text lines and their height on a downscaled copy.
+
+    Args:
+        image: Decoded image, possibly at reduced resolution (Image.draft)
+        size: Original (width, height) if image was decoded reduced
+
+    Returns:
+        DensityEstimate in original-image pixels
+    """
+    height = size[1] if size is not None else image.size[1]
+    copy = ImageOps.grayscale(image)
+    copy.thumbnail((2 * ANALYSIS_SIZE, ANALYSIS_SIZE))
+    scale = height / copy.size[1]
+
+    edges = _edge_mask(np.asarray(copy))
+    edge_ratio = float(edges.mean())
+
+    strip_width = max(1, edges.shape[1] // _STRIPS)
+    runs = [
+        (strip, start, stop)
+        for strip in (
+            edges[:, left : left + strip_width]
+            for left in range(0, edges.shape[1] - strip_width + 1, strip_width)
+        )
+        for start, stop in _line_runs(strip)
+    ]
+    if not runs:
+        return DensityEstimate(edge_ratio, 0, 0.0, 0)
+
+    median_height = float(np.median([stop - start for _, start, stop in runs]))
+    lines = [
+        (strip, start, stop)
+        for strip, start, stop in runs
+        if stop - start <= _MAX_LINE_HEIGHT_FACTOR * median_height
+    ]
+
+    chars = 0.0
+    for strip, start, stop in lines:
+        inked_columns = int(strip[start:stop].any(axis=0).sum())
+        chars += inked_columns / (_CHAR_ASPECT * (stop - start))
+
+    return DensityEstimate(
+        edge_ratio=edge_ratio,
+        text_lines=len(lines),
+        line_height=median_height * scale,
+        text_tokens=int(chars / _CHARS_PER_TOKEN),
+    )
+
+
+def _rendered_scale(mode: ResolutionMode, width: int, height: int) -> float:
+    """Smallest factor the mode scales the image by on its way into the encoder."""
+    base_size, image_size, _ = MODES[mode.value]
+    if image_size <= 640:
+        # Small views are resized to a square, squashing the longer side
+        return image_size / max(width, height)
+    return base_size / max(width, height)
+
+
+def select_mode(
+    image: Image.Image,
+    size: Optional[tuple[int, int]] = None,
+) -> tuple[ResolutionMode, DensityEstimate]:
+    """
+    Cheapest resolution mode expected to read image without losing accuracy.
+
+    Args:
+        image: Image to be recognized, possibly decoded at reduced resolution
+        size: Original (width, height) if image was decoded reduced
+
+    Returns:
+        Tuple of (chosen mode, the estimate it was based on)
+    """
+    width, height = size if size is not None else image.size
+    estimate = estimate_density(image, (width, height))
+
+    if estimate.text_lines == 0:
+        # Blank pages need nothing; ink without measurable lines (photos,
+        # tiny print) is left to the full tile budget
+        if estimate.edge_ratio < _LINE_EDGE_RATIO:
+            return ResolutionMode.TINY, estimate
+        return ResolutionMode.GUNDAM, estimate
+
+    for mode in _CANDIDATES:
+        vision_tokens = estimate_vision_tokens(width, height, mode=mode.value)
+        line_height = estimate.line_height * min(1.0, _rendered_scale(mode, width, height))
+        if (
+            estimate.text_tokens <= MAX_COMPRESSION * vision_tokens
+            and line_height >= MIN_LINE_HEIGHT
+        ):
+            return mode, estimate
+    return ResolutionMode.GUNDAM, estimate
@@ -0,0 +1,478 @@
+"""
+OCR pipeline service for DeepSeek-OCR.
+
+Runs a single uploaded image through the result cache, request coalescing,
+preprocessing, admission control, generation and post-processing. Shared by
+every OCR endpoint so that single-image, batch and streaming requests follow
+exactly the same path. Several prompts about one image share a single
+preprocessing pass (run_prompts).
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Optional, Union
+
+from api.core.config import settings
+from api.core.logging import get_logger
+from api.core.metrics import (
+    AUTO_MODE_SELECTED,
+    BLANK_PAGES_SKIPPED,
+    REQUEST_DURATION,
+    REQUESTS_IN_FLIGHT,
+    VISION_TOKENS,
+    VISION_TOKENS_IN_FLIGHT,
+)
+from api.models.requests import OCRRequest, OCRType, ResolutionMode
+from api.models.responses import MultiPromptResponse, OCRResponse
+from api.services.admission import AdmissionController, estimate_vision_tokens
+from api.services.coalescer import Coalescer
+from api.services.engine_manager import EngineManager
+from api.services.postprocessor import OutputPostprocessor
+from api.services.preprocess_pool import PreprocessPool
+from api.services.preprocessor import ImagePreprocessor
+from api.services.result_cache import ResultCache
+
+logger = get_logger(__name__)
+
+
+class BlankPage:
+    """Yielded by OCRPipeline.generate in place of text when the page is blank."""
+
+
+class OCRPipeline:
+    """
+    Orchestrates preprocess -> generate -> postprocess for one image.
+
+    Errors are raised as DeepSeekOCRError subclasses and are translated
+    into HTTP responses by the routers.
+    """
+
+    @staticmethod
+    def deadline(request: OCRRequest, start_time: float) -> Optional[float]:
+        """Absolute deadline for a request, or None if it has none."""
+        timeout = request.timeout if request.timeout is not None else settings.request_timeout
+        return start_time + timeout if timeout is not None else None
+
+    @staticmethod
+    def vision_tokens(request: OCRRequest, image_size: tuple[int, int]) -> int:
+        """Number of image tokens the prompt will contain for this image."""
+        width, height = image_size
+        return estimate_vision_tokens(
+            width, height, crop_mode=request.crop_mode, mode=request.mode.value
+        )
+
+    @staticmethod
+    def cost(request: OCRRequest, image_size: tuple[int, int]) -> int:
+        """Admission cost of a request: vision tokens plus its token budget."""
+        max_tokens = request.max_tokens if request.max_tokens is not None else settings.max_tokens
+        return OCRPipeline.vision_tokens(request, image_size) + max_tokens
+
+    @staticmethod
+    async def resolve_mode(
+        file_data: bytes,
+        filename: str,
+        request: OCRRequest,
+    ) -> tuple[OCRRequest, Optional[tuple[int, int]]]:
+        """
+        Replace an 'auto' mode by the mode picked for this image.
+
+        Resolving before the cache lookup lets auto requests share cached
+        results and in-flight generations with requests naming that mode, at
+        the price of a separate (for non-JPEG images full) decode.
+
+        Returns:
+            Tuple of (request with a concrete mode, (width, height) of the
+            image, or None if its header cannot be read)
+        """
+        if request.mode != ResolutionMode.AUTO:
+            return request, ImagePreprocessor.header_size(file_data)
+
+        mode, image_size = await PreprocessPool.select_mode(file_data, filename)
+        AUTO_MODE_SELECTED.labels(mode=mode).inc()
+        return request.model_copy(update={"mode": ResolutionMode(mode)}), image_size
+
+    @staticmethod
+    def detects_blank(request: OCRRequest) -> bool:
+        """
+        Whether blank pages of this request are answered without the model.
+
+        Only document OCR with the default prompt: photos and custom prompts
+        may be about low-contrast content the ink measure does not see.
+        """
+        return (
+            settings.blank_page_detection
+            and request.type == OCRType.DOCUMENT
+            and not request.custom_prompt
+        )
+
+    @staticmethod
+    async def preprocess(
+        file_data: bytes,
+        filename: str,
+        request: OCRRequest,
+        detect_blank: bool = False,
+    ) -> tuple[tuple[int, int], Any]:
+        """
+        Validate, load and tokenize an image off the event loop.
+
+        Returns:
+            Tuple of ((width, height), tokenized image features for EngineManager),
+            features None if detect_blank found a blank page
+        """
+        return await PreprocessPool.preprocess(
+            file_data=file_data,
+            filename=filename,
+            crop_mode=request.crop_mode,
+            mode=request.mode.value,
+            detect_blank=detect_blank,
+        )
+
+    @staticmethod
+    def finish(
+        raw_output: str,
+        request: OCRRequest,
+        filename: str,
+        start_time: float,
+        request_id: Optional[str] = None,
+        cache_hit: Optional[bool] = None,
+        coalesced: Optional[bool] = None,
+        vision_tokens: Optional[int] = None,
+        blank_page: Optional[bool] = None,
+        cached_tokens: Optional[int] = None,
+        observe_duration: bool = True,
+    ) -> OCRResponse:
+        """
+        Post-process raw model output into the response model.
+
+        Args:
+            raw_output: Raw text from model inference
+            request: Validated OCR request options
+            filename: Original filename (for logging)
+            start_time: time.time() when the request started
+            request_id: Engine request ID to report
+            cache_hit: Result cache outcome to report (None if not cacheable)
+            coalesced: Whether the output was shared with an identical request
+            vision_tokens: Image tokens of the prompt to report
+            blank_page: Whether the page was skipped as blank
+            cached_tokens: Prompt tokens served from the prefix cache to report
+            observe_duration: Record the request in REQUEST_DURATION (False for
+                parts of a larger request that is recorded once)
+
+        Returns:
+            OCRResponse with extracted markdown text
+        """
+        postprocessor = OutputPostprocessor()
+        processed = postprocessor.postprocess(
+            raw_output=raw_output,
+            save_image_refs=request.save_image_refs,
+            include_raw=request.include_raw,
+        )
+
+        # Calculate processing time
+        processing_time = time.time() - start_time
+        if observe_duration:
+            REQUEST_DURATION.observe(processing_time)
+
+        logger.info(
+            f"OCR of {filename} completed in {processing_time:.2f}s "
+            f"(output: {len(processed['text'])} chars, request: {request_id})"
+        )
+
+        return OCRResponse(
+            text=processed["text"],
+            raw=processed.get("raw"),
+            processing_time=processing_time,
+            prompt_used=request.get_prompt(),
+            request_id=request_id,
+            cache_hit=cache_hit,
+            coalesced=coalesced,
+            mode=request.mode.value,
+            vision_tokens=vision_tokens,
+            blank_page=blank_page,
+            cached_tokens=cached_tokens,
+        )
+
+    @staticmethod
+    async def run(
+        file_data: bytes,
+        filename: str,
+        request: OCRRequest,
+        bulk: bool = False,
+    ) -> OCRResponse:
+        """
+        Process one image and extract text using DeepSeek-OCR.
+
+        Args:
+            file_data: Raw image file bytes
+            filename: Original filename
+            request: Validated OCR request options
+            bulk: Background work admitted outside the interactive reserve
+
+        Returns:
+            OCRResponse with extracted markdown text
+
+        Raises:
+            DeepSeekOCRError: If any pipeline stage fails
+        """
+        response = None
+        async for item in OCRPipeline.stream(file_data, filename, request, bulk=bulk):
+            if isinstance(item, OCRResponse):
+                response = item
+        return response
+
+    @staticmethod
+    async def generate(
+        file_data: bytes,
+        filename: str,
+        request: OCRRequest,
+        request_id: str,
+        cache_key: Optional[str] = None,
+        bulk: bool = False,
+    ) -> AsyncIterator[Union[str, BlankPage]]:
+        """
+        Preprocess, admit and generate one image, yielding raw text deltas.
+
+        This is the work shared between coalesced requests; it runs once per
+        flight and stores the finished output in the result cache. The
+        request's scheduling lane (class and tenant) decides its admission
+        share and its vLLM priority. A blank page yields a single BlankPage
+        instead and never reaches the engine; it is not cached, so a repeat
+        is detected again and reported as blank rather than as a cache hit
+        with empty output.
+        """
+        image_size, image_features = await OCRPipeline.preprocess(
+            file_data, filename, request, detect_blank=OCRPipeline.detects_blank(request)
+        )
+        if image_features is None:
+            BLANK_PAGES_SKIPPED.inc()
+            yield BlankPage()
+            return
+
+        vision_tokens = OCRPipeline.vision_tokens(request, image_size)
+        VISION_TOKENS.observe(vision_tokens)
+
+        lane = AdmissionController.lane_name(bulk=bulk, tenant=request.tenant)
+        cost = OCRPipeline.cost(request, image_size)
+        chunks = []
+        async with AdmissionController.admit(cost, lane):
+            VISION_TOKENS_IN_FLIGHT.inc(vision_tokens)
+            try:
+                async for delta in EngineManager.generate_stream(
+                    prompt=request.get_prompt(),
+                    image_features=image_features,
+                    temperature=request.temperature,
+                    max_tokens=request.max_tokens,
+                    request_id=request_id,
+                    priority=AdmissionController.priority(lane),
+                    cost=cost,
+                ):
+                    chunks.append(delta)
+                    yield delta
+            finally:
+                VISION_TOKENS_IN_FLIGHT.dec(vision_tokens)
+
+        if cache_key is not None and ResultCache.enabled():
+            await ResultCache.put(cache_key, "".join(chunks))
+
+    @staticmethod
+    async def stream(
+        file_data: bytes,
+        filename: str,
+        request: OCRRequest,
+        bulk: bool = False,
+    ) -> AsyncIterator[Union[str, OCRResponse]]:
+        """
+        Process one image, streaming generated text as it is produced.
+
+        An 'auto' mode is resolved first. Cached results skip preprocessing
+        and generation and are yielded as a single chunk. Deterministic
+        requests identical to one already in flight join its generation and
+        replay its output from the start. Blank document pages are found on
+        the image decoded for preprocessing and get an empty result.
+
+        Args:
+            file_data: Raw image file bytes
+            filename: Original filename
+            request: Validated OCR request options
+            bulk: Background work admitted outside the interactive reserve
+
+        Yields:
+            Raw text deltas (str) while decoding, then the final OCRResponse
+
+        Raises:
+            ModelNotLoadedError: If the engine is not ready and the result is not cached
+            AdmissionRejectedError: If the token budget is exhausted
+            RequestTimeoutError: If the request deadline passes
+            DeepSeekOCRError: If any pipeline stage fails
+        """
+        start_time = time.time()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            request, image_size = await OCRPipeline.resolve_mode(file_data, filename, request)
+            vision_tokens = (
+                OCRPipeline.vision_tokens(request, image_size) if image_size is not None else None
+            )
+
+            key = await ResultCache.key_for(file_data, request)
+            cacheable = key is not None and ResultCache.enabled()
+            if cacheable:
+                raw_output = await ResultCache.get(key)
+                if raw_output is not None:
+                    logger.info(f"Result cache hit for {filename}")
+                    if raw_output:
+                        yield raw_output
+                    yield OCRPipeline.finish(
+                        raw_output,
+                        request,
+                        filename,
+                        start_time,
+                        cache_hit=True,
+                        vision_tokens=vision_tokens,
+                    )
+                    return
+
+            # Cache hits are served while the engine loads; everything else
+            # gets 503 + Retry-After before spending time on preprocessing
+            EngineManager.check_ready()
+
+            request_id = EngineManager.new_request_id()
+            flight, coalesced = Coalescer.join(
+                key,
+                request_id,
+                lambda: OCRPipeline.generate(
+                    file_data, filename, request, request_id, key, bulk=bulk
+                ),
+            )
+
+            chunks = []
+            blank_page = None
+            async for delta in flight.subscribe(OCRPipeline.deadline(request, start_time)):
+                if isinstance(delta, BlankPage):
+                    blank_page = True
+                    vision_tokens = 0
+                    continue
+                chunks.append(delta)
+                yield delta
+
+            yield OCRPipeline.finish(
+                "".join(chunks),
+                request,
+                filename,
+                start_time,
+                flight.request_id,
+                cache_hit=False if cacheable else None,
+                coalesced=coalesced,
+                vision_tokens=vision_tokens,
+                blank_page=blank_page,
+            )
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+
+    @staticmethod
+    def image_prompt(prompt: str) -> str:
+        """Put an '<image>' placeholder in front of a prompt that has none."""
+        if "<image>" in prompt:
+            return prompt
+        return f"<image>\n{prompt.strip()}"
+
+    @staticmethod
+    async def run_prompts(
+        file_data: bytes,
+        filename: str,
+        request: OCRRequest,
+        prompts: list[str],
+    ) -> MultiPromptResponse:
+        """
+        Run several prompts on one image, preprocessing the image once.
+
+        The image features are built once and submitted with every prompt;
+        the generations run concurrently and are batched by the engine.
+        Results are not cached or coalesced.
+
+        Args:
+            file_data: Raw image file bytes
+            filename: Original filename
+            request: OCR options shared by all prompts (custom_prompt is ignored)
+            prompts: Prompts to run; '<image>' placeholders are optional
+
+        Returns:
+            MultiPromptResponse with one OCRResponse per prompt
+
+        Raises:
+            ModelNotLoadedError: If the engine is not ready
+            AdmissionRejectedError: If the token budget is exhausted
+            RequestTimeoutError: If the request deadline passes
+            DeepSeekOCRError: If any pipeline stage fails
+        """
+        start_time = time.time()
+        deadline = OCRPipeline.deadline(request, start_time)
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            request, _ = await OCRPipeline.resolve_mode(file_data, filename, request)
+            EngineManager.check_ready()
+
+            prompts = [OCRPipeline.image_prompt(prompt) for prompt in prompts]
+            image_size, image_features = await OCRPipeline.preprocess(
+                file_data, filename, request
+            )
+            vision_tokens = OCRPipeline.vision_tokens(request, image_size)
+            lane = AdmissionController.lane_name(bulk=False, tenant=request.tenant)
+            cost = OCRPipeline.cost(request, image_size)
+
+            async def run_one(prompt: str) -> OCRResponse:
+                prompt_request = request.model_copy(update={"custom_prompt": prompt})
+                request_id = EngineManager.new_request_id()
+                stats: dict[str, int] = {}
+                VISION_TOKENS.observe(vision_tokens)
+                async with AdmissionController.admit(cost, lane):
+                    VISION_TOKENS_IN_FLIGHT.inc(vision_tokens)
+                    try:
+                        raw_output = await EngineManager.generate(
+                            prompt=prompt,
+                            image_features=image_features,
+                            temperature=request.temperature,
+                            max_tokens=request.max_tokens,
+                            request_id=request_id,
+                            deadline=deadline,
+                            priority=AdmissionController.priority(lane),
+                            cost=cost,
+                            stats=stats,
+                        )
+                    finally:
+                        VISION_TOKENS_IN_FLIGHT.dec(vision_tokens)
+
+                return OCRPipeline.finish(
+                    raw_output,
+                    prompt_request,
+                    filename,
+                    start_time,
+                    request_id,
+                    vision_tokens=vision_tokens,
+                    cached_tokens=stats.get("cached_tokens"),
+                    observe_duration=False,
+                )
+
+            tasks = [asyncio.create_task(run_one(prompt)) for prompt in prompts]
+            try:
+                results = await asyncio.gather(*tasks)
+            finally:
+                # One prompt failed (or the client went away): stop the others
+                for task in tasks:
+                    task.cancel()
+
+            processing_time = time.time() - start_time
+            REQUEST_DURATION.observe(processing_time)
+            cached_tokens = sum(result.cached_tokens or 0 for result in results)
+            logger.info(
+                f"{len(results)} prompts on {filename} completed in "
+                f"{processing_time:.2f}s ({cached_tokens} prefix-cached tokens)"
+            )
+            return MultiPromptResponse(
+                results=results,
+                processing_time=processing_time,
+                mode=request.mode.value,
+                vision_tokens=vision_tokens,
+                cached_tokens=cached_tokens,
+            )
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
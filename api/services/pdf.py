@@ -0,0 +1,131 @@
+"""
+PDF rasterization service for DeepSeek-OCR.
+
+Pages are rendered with PyMuPDF one at a time inside the preprocessing pool,
+so a long document never holds every page bitmap in memory at once and page
+rendering overlaps with generation of earlier pages.
+"""
+
+from typing import Optional
+
+import fitz
+
+from api.core.config import settings
+from api.core.errors import InvalidFileError
+from api.core.logging import get_logger
+from api.services.preprocess_pool import PreprocessPool
+
+logger = get_logger(__name__)
+
+
+def _open_document(path: str) -> "fitz.Document":
+    """Open a stored PDF, mapping PyMuPDF errors to InvalidFileError."""
+    try:
+        document = fitz.open(path, filetype="pdf")
+    except Exception as e:
+        raise InvalidFileError(
+            message="File is not a valid PDF",
+            details={"error": str(e)},
+        )
+    if document.needs_pass:
+        document.close()
+        raise InvalidFileError(message="Encrypted PDFs are not supported")
+    return document
+
+
+def _count_pages_in_worker(path: str) -> int:
+    """Return the number of pages of a PDF (runs in a pool worker)."""
+    document = _open_document(path)
+    try:
+        return document.page_count
+    finally:
+        document.close()
+
+
+def _render_page_in_worker(path: str, page_index: int, dpi: int) -> bytes:
+    """Render one page to PNG bytes (runs in a pool worker)."""
+    document = _open_document(path)
+    try:
+        zoom = dpi / 72.0
+        pixmap = document[page_index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return pixmap.tobytes("png")
+    except Exception as e:
+        raise InvalidFileError(
+            message=f"Failed to render PDF page {page_index + 1}",
+            details={"error": str(e)},
+        )
+    finally:
+        document.close()
+
+
+class PDFRasterizer:
+    """Validates PDFs and renders their pages to PNG off the event loop."""
+
+    @staticmethod
+    async def page_count(path: str) -> int:
+        """
+        Open a stored PDF in the pool and count its pages.
+
+        Raises:
+            InvalidFileError: If the file is not a readable, unencrypted PDF
+        """
+        return await PreprocessPool.run(_count_pages_in_worker, path)
+
+    @staticmethod
+    def page_range(
+        page_count: int,
+        first_page: Optional[int] = None,
+        last_page: Optional[int] = None,
+    ) -> range:
+        """
+        Resolve a 1-based inclusive page range to 0-based page indices.
+
+        Args:
+            page_count: Number of pages in the document
+            first_page: First page to process (defaults to 1)
+            last_page: Last page to process (defaults to the last page)
+
+        Returns:
+            Range of 0-based page indices
+
+        Raises:
+            InvalidFileError: If the range is empty, out of bounds or too long
+        """
+        first = first_page or 1
+        last = last_page or page_count
+        if first > last or last > page_count:
+            raise InvalidFileError(
+                message=f"Invalid page range {first}-{last} for a {page_count}-page PDF",
+                details={"page_count": page_count, "first_page": first, "last_page": last},
+            )
+
+        pages = range(first - 1, last)
+        if len(pages) > settings.max_pdf_pages:
+            raise InvalidFileError(
+                message=(
+                    f"Page range covers {len(pages)} pages, maximum is {settings.max_pdf_pages}"
+                ),
+                details={"max_pdf_pages": settings.max_pdf_pages},
+            )
+        return pages
+
+    @staticmethod
+    async def render_page(path: str, page_index: int) -> bytes:
+        """
+        Render one page to PNG bytes at settings.pdf_dpi in the pool.
+
+        Only the path is sent to the worker, which opens the stored file
+        (PyMuPDF loads the cross-reference table and the objects of the
+        rendered page) instead of receiving and parsing a copy of the upload.
+
+        Args:
+            path: Path of a stored PDF
+            page_index: 0-based page index
+
+        Raises:
+            ServerBusyError: If the pool queue is full
+            InvalidFileError: If the page cannot be rendered
+        """
+        return await PreprocessPool.run(
+            _render_page_in_worker, path, page_index, settings.pdf_dpi
+        )
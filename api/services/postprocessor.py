@@ -9,6 +9,7 @@ import re
 from typing import Optional
 
 from api.core.logging import get_logger
+from api.core.metrics import POSTPROCESS_SECONDS
 
 logger = get_logger(__name__)
 
@@ -130,7 +131,8 @@ class OutputPostprocessor:
         logger.info(f"Post-processing output ({len(raw_output)} chars)")
 
         # Clean the markdown
-        cleaned_text = OutputPostprocessor.clean_markdown(raw_output, save_image_refs)
+        with POSTPROCESS_SECONDS.time():
+            cleaned_text = OutputPostprocessor.clean_markdown(raw_output, save_image_refs)
 
         result = {"text": cleaned_text}
 
@@ -0,0 +1,241 @@
+"""
+Bounded worker pool for image preprocessing.
+
+Decoding, tiling and tensor building are CPU-bound and would otherwise run on
+the uvicorn event loop, stalling every other request (including /health).
+This module moves that work onto a thread or process pool in which every
+worker keeps its own warm ImagePreprocessor.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from api.core.config import settings
+from api.core.errors import ServerBusyError
+from api.core.logging import get_logger
+from api.core.metrics import (
+    PREPROCESS_ACTIVE,
+    PREPROCESS_QUEUE_DEPTH,
+    PREPROCESS_REJECTED,
+    PREPROCESS_STAGE_SECONDS,
+)
+from api.services.preprocessor import ImagePreprocessor
+
+logger = get_logger(__name__)
+
+# Per-worker state. Thread-local covers thread workers; in process workers
+# each process has its own copy of the module anyway.
+_worker_state = threading.local()
+
+
+def _init_worker() -> None:
+    """Create the warm ImagePreprocessor for the current worker."""
+    _worker_state.preprocessor = ImagePreprocessor()
+
+
+def _get_worker_preprocessor() -> ImagePreprocessor:
+    """Return the current worker's ImagePreprocessor, creating it on first use."""
+    if getattr(_worker_state, "preprocessor", None) is None:
+        _init_worker()
+    return _worker_state.preprocessor
+
+
+def _warm_worker() -> None:
+    """No-op task used to force worker start-up at pool creation."""
+    _get_worker_preprocessor()
+
+
+def _preprocess_in_worker(
+    file_data: bytes,
+    filename: str,
+    crop_mode: bool,
+    mode: str,
+    detect_blank: bool = False,
+) -> tuple[tuple[int, int], Any, dict[str, float]]:
+    """Run the full preprocessing pipeline inside a pool worker."""
+    timings: dict[str, float] = {}
+    image, image_features = _get_worker_preprocessor().preprocess(
+        file_data=file_data,
+        filename=filename,
+        crop_mode=crop_mode,
+        mode=mode,
+        timings=timings,
+        detect_blank=detect_blank,
+    )
+    # Only the size travels back; the decoded image stays in the worker.
+    # Stage timings are returned rather than observed here because process
+    # workers do not share the server's metrics registry.
+    return image.size, image_features, timings
+
+
+def _select_mode_in_worker(file_data: bytes, filename: str) -> tuple[str, tuple[int, int]]:
+    """Pick the resolution mode of an 'auto' request inside a pool worker."""
+    return _get_worker_preprocessor().select_mode(file_data, filename)
+
+
+def _fingerprint_in_worker(
+    file_data: bytes, filename: str, perceptual: bool
+) -> tuple[str, Optional[int]]:
+    """Compute the duplicate-detection fingerprint of an image inside a pool worker."""
+    return _get_worker_preprocessor().fingerprint(file_data, filename, perceptual)
+
+
+class PreprocessPool:
+    """
+    Process-wide executor for CPU-bound preprocessing.
+
+    Submissions beyond ``preprocess_workers + preprocess_queue_size`` are
+    rejected with ServerBusyError instead of queueing without bound.
+    """
+
+    _executor: Optional[Executor] = None
+    _in_flight: int = 0
+
+    @classmethod
+    def start(cls) -> None:
+        """Create the executor and warm one ImagePreprocessor per worker."""
+        if cls._executor is not None:
+            logger.warning("Preprocess pool already started, skipping")
+            return
+
+        workers = settings.preprocess_workers
+        if settings.preprocess_executor == "process":
+            # spawn: never fork a process that holds CUDA state
+            cls._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        else:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="preprocess",
+                initializer=_init_worker,
+            )
+
+        for _ in range(workers):
+            cls._executor.submit(_warm_worker)
+
+        PREPROCESS_QUEUE_DEPTH.set_function(cls.queue_depth)
+        PREPROCESS_ACTIVE.set_function(cls.active_workers)
+
+        logger.info(
+            f"Preprocess pool started ({settings.preprocess_executor}, "
+            f"workers={workers}, queue_size={settings.preprocess_queue_size})"
+        )
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Stop the executor, cancelling work that has not started yet."""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+            logger.info("Preprocess pool shut down")
+
+    @classmethod
+    def capacity(cls) -> int:
+        """Maximum number of images running or waiting in the pool."""
+        return settings.preprocess_workers + settings.preprocess_queue_size
+
+    @classmethod
+    def active_workers(cls) -> int:
+        """Number of workers currently busy."""
+        return min(cls._in_flight, settings.preprocess_workers)
+
+    @classmethod
+    def queue_depth(cls) -> int:
+        """Number of submissions waiting for a free worker."""
+        return max(0, cls._in_flight - settings.preprocess_workers)
+
+    @classmethod
+    async def run(cls, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a picklable, module-level function in the pool.
+
+        Raises:
+            ServerBusyError: If the pool queue is full
+        """
+        if cls._executor is None:
+            cls.start()
+
+        if cls._in_flight >= cls.capacity():
+            PREPROCESS_REJECTED.inc()
+            raise ServerBusyError(
+                message="Preprocessing queue is full, please retry later",
+                details={
+                    "queue_depth": cls.queue_depth(),
+                    "capacity": cls.capacity(),
+                },
+            )
+
+        loop = asyncio.get_running_loop()
+        future = cls._executor.submit(fn, *args)
+        cls._in_flight += 1
+
+        # Release the slot when the worker finishes, not when the caller stops
+        # waiting: a cancelled request still occupies its worker until then.
+        def _release(_: Any) -> None:
+            cls._in_flight -= 1
+
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(_release, f))
+        return await asyncio.wrap_future(future)
+
+    @classmethod
+    async def preprocess(
+        cls,
+        file_data: bytes,
+        filename: str,
+        crop_mode: bool = True,
+        mode: str = "gundam",
+        detect_blank: bool = False,
+    ) -> tuple[tuple[int, int], Any]:
+        """
+        Validate, load and tokenize an image in the pool.
+
+        Returns:
+            Tuple of ((width, height) of the loaded image, tokenized_features),
+            features None if detect_blank found a blank page
+
+        Raises:
+            ServerBusyError: If the pool queue is full
+            DeepSeekOCRError: If preprocessing fails
+        """
+        image_size, image_features, timings = await cls.run(
+            _preprocess_in_worker, file_data, filename, crop_mode, mode, detect_blank
+        )
+        for stage, seconds in timings.items():
+            PREPROCESS_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+        return image_size, image_features
+
+    @classmethod
+    async def select_mode(cls, file_data: bytes, filename: str) -> tuple[str, tuple[int, int]]:
+        """
+        Pick the resolution mode of an 'auto' request in the pool.
+
+        Returns:
+            Tuple of (mode name, (width, height) of the image)
+
+        Raises:
+            ServerBusyError: If the pool queue is full
+            DeepSeekOCRError: If the image is invalid
+        """
+        return await cls.run(_select_mode_in_worker, file_data, filename)
+
+    @classmethod
+    async def fingerprint(
+        cls, file_data: bytes, filename: str, perceptual: bool = True
+    ) -> tuple[str, Optional[int]]:
+        """
+        Compute an image's duplicate-detection fingerprint in the pool.
+
+        Returns:
+            Tuple of (content digest, dHash or None if perceptual is False)
+
+        Raises:
+            ServerBusyError: If the pool queue is full
+            DeepSeekOCRError: If the image is invalid
+        """
+        return await cls.run(_fingerprint_in_worker, file_data, filename, perceptual)
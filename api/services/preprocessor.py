@@ -4,11 +4,13 @@ Image preprocessing service for DeepSeek-OCR.
 Handles image loading, validation, and preprocessing using DeepseekOCRProcessor.
 """
 
+import hashlib
 import io
+import time
 from pathlib import Path
 from typing import Optional, Union
 
-from PIL import Image, ImageOps
+from PIL import ExifTags, Image, ImageOps
 
 from api.core.config import settings
 from api.core.errors import (
@@ -18,7 +20,11 @@ from api.core.errors import (
     UnsupportedFileTypeError,
 )
 from api.core.logging import get_logger
-from process.image_process import DeepseekOCRProcessor
+from api.services.mode_selector import ANALYSIS_SIZE, select_mode
+from config import MODES
+from process.blank_page import THUMBNAIL_SIZE, ink_ratio
+from process.image_process import DeepseekOCRProcessor, decode_reduced
+from process.page_hash import dhash
 
 logger = get_logger(__name__)
 
@@ -33,18 +39,19 @@ class ImagePreprocessor:
 
     def __init__(self) -> None:
         """Initialize the preprocessor with DeepseekOCRProcessor."""
-        self.processor = DeepseekOCRProcessor()
+        self.processor = DeepseekOCRProcessor(uint8_pixels=settings.preprocess_uint8_pixels)
         logger.info("ImagePreprocessor initialized")
 
     @staticmethod
-    def load_image(image_data: Union[bytes, str, Path]) -> Image.Image:
+    def load_image(image_data: Union[bytes, str, Path, Image.Image]) -> Image.Image:
         """
         Load and normalize an image from various sources.
 
         Handles EXIF orientation correction to ensure images are properly oriented.
 
         Args:
-            image_data: Image data as bytes, file path string, or Path object
+            image_data: Image data as bytes, file path string, Path object, or
+                an image opened (but not yet decoded) by validate_file
 
         Returns:
             PIL Image in RGB mode
@@ -54,11 +61,16 @@ class ImagePreprocessor:
         """
         try:
             # Load image based on input type
-            if isinstance(image_data, bytes):
+            if isinstance(image_data, Image.Image):
+                image = image_data
+            elif isinstance(image_data, bytes):
                 image = Image.open(io.BytesIO(image_data))
             else:
                 image = Image.open(image_data)
 
+            # The single full decode of the pixel data
+            image.load()
+
             # Apply EXIF transpose to handle rotation metadata
             corrected_image = ImageOps.exif_transpose(image)
 
@@ -80,17 +92,21 @@ class ImagePreprocessor:
         file_data: bytes,
         filename: str,
         max_size: Optional[int] = None,
-    ) -> None:
+    ) -> Image.Image:
         """
-        Validate uploaded file meets requirements.
+        Validate uploaded file meets requirements, reading only the image header.
 
         Args:
             file_data: Raw file bytes
-            filename: Original filename
+            filename: Original filename; without an extension (e.g. raw
+                request bodies) the detected image format is checked instead
             max_size: Maximum file size in bytes (defaults to settings.max_file_size)
 
+        Returns:
+            The opened image; its pixel data is decoded later by load_image
+
         Raises:
-            FileTooLargeError: If file exceeds size limit
+            FileTooLargeError: If file exceeds size or pixel limits
             UnsupportedFileTypeError: If file extension not allowed
             InvalidFileError: If file is invalid
         """
@@ -107,33 +123,211 @@ class ImagePreprocessor:
 
         # Check file extension
         file_ext = Path(filename).suffix.lower().lstrip(".")
-        if file_ext not in settings.allowed_extensions:
+        if file_ext and file_ext not in settings.allowed_extensions:
             raise UnsupportedFileTypeError(
                 message=f"File type '.{file_ext}' is not supported",
                 allowed_types=settings.allowed_extensions,
             )
 
-        # Validate it's actually an image by trying to open it
+        # Parse the header only; corrupt pixel data fails the decode in load_image
         try:
             image = Image.open(io.BytesIO(file_data))
-            image.verify()  # Verify it's a valid image
         except Exception as e:
             raise InvalidFileError(
                 message="File is not a valid image",
                 details={"error": str(e)},
             )
 
+        if not file_ext and (image.format or "").lower() not in settings.allowed_extensions:
+            raise UnsupportedFileTypeError(
+                message=f"Image format '{image.format}' is not supported",
+                allowed_types=settings.allowed_extensions,
+            )
+
+        # Reject decompression bombs before allocating their pixels
+        width, height = image.size
+        if width * height > settings.max_image_pixels:
+            raise FileTooLargeError(
+                message=(
+                    f"Image dimensions ({width}x{height}) exceed maximum of "
+                    f"{settings.max_image_pixels} pixels"
+                ),
+            )
+
+        return image
+
+    @staticmethod
+    def upright_size(image: Image.Image) -> tuple[int, int]:
+        """(width, height) of an opened image once load_image applies its EXIF rotation."""
+        width, height = image.size
+        # Orientations 5-8 are rotated by 90 degrees
+        if image.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8):
+            return height, width
+        return width, height
+
+    @staticmethod
+    def header_size(file_data: bytes) -> Optional[tuple[int, int]]:
+        """Upright (width, height) read from the image header, or None if unreadable."""
+        try:
+            return ImagePreprocessor.upright_size(Image.open(io.BytesIO(file_data)))
+        except Exception:
+            return None
+
+    def select_mode(self, file_data: bytes, filename: str) -> tuple[str, tuple[int, int]]:
+        """
+        Pick the resolution mode for an 'auto' request from a reduced decode.
+
+        JPEGs are decoded straight at reduced scale; the density estimate
+        only looks at a downscaled copy anyway. Other formats cannot be
+        decoded reduced, so for them this is a full decode on top of the one
+        in preprocess.
+
+        Args:
+            file_data: Raw image file bytes
+            filename: Original filename
+
+        Returns:
+            Tuple of (mode name, (width, height) of the upright image)
+
+        Raises:
+            FileTooLargeError: If file exceeds size or pixel limits
+            UnsupportedFileTypeError: If file extension not allowed
+            InvalidFileError: If file is invalid
+            ImageProcessingError: If decoding fails
+        """
+        image = self.validate_file(file_data, filename)
+        width, height = self.upright_size(image)
+
+        image.draft("RGB", (ANALYSIS_SIZE, ANALYSIS_SIZE))
+        image = self.load_image(image)
+
+        mode, estimate = select_mode(image, (width, height))
+        logger.info(
+            f"Auto mode picked {mode.value} for {filename} ({width}x{height}, "
+            f"{estimate.text_lines} lines of {estimate.line_height:.0f}px, "
+            f"~{estimate.text_tokens} text tokens)"
+        )
+        return mode.value, (width, height)
+
+    @staticmethod
+    def decode_reduced(
+        image: Image.Image,
+        crop_mode: bool = True,
+        mode: str = "gundam",
+    ) -> Image.Image:
+        """
+        Decode an opened image at the smallest size the mode's views are built from.
+
+        A 6000x8000 photo read by a 1024px global view and 640px tiles is
+        decoded at 1/4 scale (JPEG) or box-reduced right after decoding, so
+        the processor resizes far fewer pixels. EXIF rotation is still applied
+        afterwards by load_image.
+
+        Args:
+            image: Image opened (not yet decoded) by validate_file
+            crop_mode: Whether cropping mode is enabled
+            mode: Resolution mode (key of MODES in config.py)
+
+        Returns:
+            Decoded image, unrotated
+
+        Raises:
+            ImageProcessingError: If decoding fails
+        """
+        base_size, image_size, cropping = MODES[mode]
+        original_size = image.size
+        try:
+            image = decode_reduced(image, base_size, image_size, cropping and crop_mode)
+        except Exception as e:
+            logger.error(f"Failed to decode image: {e}", exc_info=True)
+            raise ImageProcessingError(
+                message="Failed to load and process image",
+                details={"error": str(e)},
+            )
+        if image.size != original_size:
+            logger.debug(f"Decoded {original_size} image at {image.size} for mode {mode}")
+        return image
+
+    @staticmethod
+    def is_blank(image: Image.Image, filename: str) -> bool:
+        """
+        Whether a decoded image is a blank page, judged on a grayscale thumbnail.
+
+        Args:
+            image: Image decoded by load_image
+            filename: Original filename (for logging)
+
+        Returns:
+            True if its ink ratio is at most settings.blank_page_max_ink_ratio
+
+        Raises:
+            ImageProcessingError: If the check fails
+        """
+        try:
+            ratio = ink_ratio(image, THUMBNAIL_SIZE)
+        except Exception as e:
+            logger.error(f"Blank page check failed: {e}", exc_info=True)
+            raise ImageProcessingError(
+                message="Failed to load and process image",
+                details={"error": str(e)},
+            )
+
+        blank = ratio <= settings.blank_page_max_ink_ratio
+        if blank:
+            logger.info(f"{filename} is a blank page (ink ratio {ratio:.5f})")
+        return blank
+
+    def fingerprint(
+        self,
+        file_data: bytes,
+        filename: str,
+        perceptual: bool = True,
+    ) -> tuple[str, Optional[int]]:
+        """
+        Identify an image for duplicate detection.
+
+        Args:
+            file_data: Raw image file bytes
+            filename: Original filename
+            perceptual: Also compute the dHash (needs a reduced decode)
+
+        Returns:
+            Tuple of (SHA-256 of the file bytes, dHash or None)
+
+        Raises:
+            FileTooLargeError: If file exceeds size or pixel limits
+            UnsupportedFileTypeError: If file extension not allowed
+            InvalidFileError: If file is invalid
+            ImageProcessingError: If decoding fails
+        """
+        digest = hashlib.sha256(file_data).hexdigest()
+        if not perceptual:
+            return digest, None
+
+        # Hashed as stored (no EXIF rotation): copies of a scan share orientation
+        image = self.validate_file(file_data, filename)
+        try:
+            return digest, dhash(image)
+        except Exception as e:
+            logger.error(f"Perceptual hash failed: {e}", exc_info=True)
+            raise ImageProcessingError(
+                message="Failed to load and process image",
+                details={"error": str(e)},
+            )
+
     def tokenize_image(
         self,
         image: Image.Image,
         crop_mode: bool = True,
+        mode: str = "gundam",
     ) -> str:
         """
         Tokenize image using DeepseekOCRProcessor.
 
         Args:
             image: PIL Image to process
-            crop_mode: Whether to enable cropping mode
+            crop_mode: Whether to enable cropping mode (modes that crop only)
+            mode: Resolution mode (key of MODES in config.py)
 
         Returns:
             Tokenized image features as string
@@ -142,14 +336,19 @@ class ImagePreprocessor:
             ImageProcessingError: If tokenization fails
         """
         try:
-            logger.info(f"Tokenizing image (size: {image.size}, crop_mode: {crop_mode})")
+            logger.info(
+                f"Tokenizing image (size: {image.size}, mode: {mode}, crop_mode: {crop_mode})"
+            )
 
-            # Process image with DeepseekOCRProcessor
+            # Process image with DeepseekOCRProcessor in the requested mode
+            base_size, image_size, cropping = MODES[mode]
             image_features = self.processor.tokenize_with_images(
                 images=[image],
                 bos=True,
                 eos=True,
-                cropping=crop_mode,
+                cropping=cropping and crop_mode,
+                base_size=base_size,
+                image_size=image_size,
             )
 
             logger.info("Image tokenization successful")
@@ -162,22 +361,33 @@ class ImagePreprocessor:
                 details={"error": str(e)},
             )
 
-    async def preprocess(
+    def preprocess(
         self,
         file_data: bytes,
         filename: str,
         crop_mode: bool = True,
-    ) -> tuple[Image.Image, str]:
+        mode: str = "gundam",
+        timings: Optional[dict[str, float]] = None,
+        detect_blank: bool = False,
+    ) -> tuple[Image.Image, Optional[str]]:
         """
         Full preprocessing pipeline: validate, load, and tokenize image.
 
+        This is CPU-bound and blocking; call it through PreprocessPool from
+        async code so it does not stall the event loop.
+
         Args:
             file_data: Raw image file bytes
             filename: Original filename
             crop_mode: Whether to enable cropping mode
+            mode: Resolution mode (key of MODES in config.py)
+            timings: If given, filled with seconds spent per stage
+                ("validate", "decode", "tokenize")
+            detect_blank: Check the decoded image for a blank page first
 
         Returns:
-            Tuple of (original_image, tokenized_features)
+            Tuple of (original_image, tokenized_features), with features
+            None for a blank page (detect_blank only)
 
         Raises:
             FileTooLargeError: If file too large
@@ -185,13 +395,27 @@ class ImagePreprocessor:
             InvalidFileError: If invalid file
             ImageProcessingError: If preprocessing fails
         """
-        # Validate file
-        self.validate_file(file_data, filename)
+        if timings is None:
+            timings = {}
+
+        # Validate file (header only)
+        stage_start = time.perf_counter()
+        image = self.validate_file(file_data, filename)
+        timings["validate"] = time.perf_counter() - stage_start
+
+        # Decode the already opened image, reduced to what the mode reads
+        stage_start = time.perf_counter()
+        if settings.preprocess_reduced_decode:
+            image = self.decode_reduced(image, crop_mode=crop_mode, mode=mode)
+        image = self.load_image(image)
+        timings["decode"] = time.perf_counter() - stage_start
 
-        # Load image
-        image = self.load_image(file_data)
+        if detect_blank and self.is_blank(image, filename):
+            return image, None
 
         # Tokenize image
-        image_features = self.tokenize_image(image, crop_mode=crop_mode)
+        stage_start = time.perf_counter()
+        image_features = self.tokenize_image(image, crop_mode=crop_mode, mode=mode)
+        timings["tokenize"] = time.perf_counter() - stage_start
 
         return image, image_features
@@ -0,0 +1,286 @@
+"""
+Content-addressed cache of raw OCR outputs.
+
+With temperature 0 the model output is a pure function of the image bytes,
+the prompt and the generation settings, so repeated submissions of the same
+page can skip preprocessing and generation entirely.
+
+Two tiers:
+- memory: per-process LRU bounded by total entry size
+- disk: a directory that several server processes may share; entries are
+  written atomically and the oldest (by access time) are evicted once the
+  directory exceeds its size limit
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from api.core.config import settings
+from api.core.logging import get_logger
+from api.core.metrics import CACHE_BYTES, CACHE_ENTRIES, CACHE_REQUESTS
+from api.models.requests import OCRRequest
+from config import MAX_CROPS, MIN_CROPS, MODES
+
+logger = get_logger(__name__)
+
+# Part of every key: bump when a code change alters the output for the same input
+CACHE_FORMAT_VERSION = 1
+
+
+class MemoryCache:
+    """Thread-safe LRU of key -> raw output, bounded by total UTF-8 size."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        entry_size = len(value.encode("utf-8"))
+        if entry_size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.encode("utf-8"))
+            self._entries[key] = value
+            self._size += entry_size
+
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.encode("utf-8"))
+
+            CACHE_ENTRIES.labels(tier="memory").set(len(self._entries))
+            CACHE_BYTES.labels(tier="memory").set(self._size)
+
+
+class DiskCache:
+    """
+    Directory of key -> raw output files shared between processes.
+
+    Files are sharded by the first two hex digits of the key. Writes go to a
+    temporary file and are renamed into place, so concurrent readers never
+    see partial entries. Reads bump the file's mtime, which eviction uses as
+    the LRU clock.
+    """
+
+    # Evict down to this fraction of max_bytes to avoid rescanning on every put
+    LOW_WATERMARK = 0.9
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Approximate; other processes write too, so evict() rescans.
+        self._approx_size = self._scan_size()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.txt"
+
+    def _scan(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.glob("*/*.txt"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._scan())
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            value = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = value.encode("utf-8")
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        with self._lock:
+            self._approx_size += len(data)
+            if self._approx_size > self.max_bytes:
+                self.evict()
+
+    def evict(self) -> None:
+        """Delete least recently used entries until under the low watermark."""
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * self.LOW_WATERMARK)
+
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+
+        self._approx_size = total
+        CACHE_ENTRIES.labels(tier="disk").set(len(entries) - removed)
+        CACHE_BYTES.labels(tier="disk").set(total)
+        if removed:
+            logger.info(f"Evicted {removed} disk cache entries ({total} bytes remain)")
+
+
+class ResultCache:
+    """
+    Process-wide two-tier cache of raw model outputs.
+
+    Only deterministic requests (effective temperature 0) are cached. Raw
+    output is stored, so include_raw / save_image_refs can differ between
+    the request that filled the cache and the one that hits it.
+    """
+
+    _memory: Optional[MemoryCache] = None
+    _disk: Optional[DiskCache] = None
+    _configured: bool = False
+
+    @classmethod
+    def configure(cls) -> None:
+        """Create the enabled tiers (idempotent; scans the disk tier once)."""
+        if cls._configured:
+            return
+        cls._configured = True
+        if not settings.cache_enabled:
+            return
+        if settings.cache_memory_max_bytes > 0:
+            cls._memory = MemoryCache(settings.cache_memory_max_bytes)
+        if settings.cache_dir:
+            cls._disk = DiskCache(Path(settings.cache_dir), settings.cache_disk_max_bytes)
+        logger.info(
+            f"Result cache enabled (memory={settings.cache_memory_max_bytes} bytes, "
+            f"disk={settings.cache_dir or 'off'})"
+        )
+
+    @staticmethod
+    def cache_params(request: OCRRequest) -> Optional[dict[str, Any]]:
+        """
+        Fields that determine the output of a request, or None if it is not cacheable.
+
+        Besides the request and generation settings this covers the
+        preprocessing configuration, since the disk tier outlives restarts
+        with different settings.
+        """
+        temperature = request.temperature if request.temperature is not None else settings.temperature
+        if temperature != 0.0:
+            return None
+        return {
+            "version": CACHE_FORMAT_VERSION,
+            "model": settings.model_path,
+            "prompt": request.get_prompt(),
+            "mode": request.mode.value,
+            "crop_mode": request.crop_mode,
+            "max_tokens": request.max_tokens if request.max_tokens is not None else settings.max_tokens,
+            "ngram_size": settings.ngram_size,
+            "window_size": settings.window_size,
+            "modes": MODES,
+            "crops": [MIN_CROPS, MAX_CROPS],
+            "reduced_decode": settings.preprocess_reduced_decode,
+            "uint8_pixels": settings.preprocess_uint8_pixels,
+            # Decide whether a page is answered by the model at all
+            "blank_page_detection": settings.blank_page_detection,
+            "blank_page_max_ink_ratio": settings.blank_page_max_ink_ratio,
+        }
+
+    @staticmethod
+    def make_key(file_data: bytes, params: dict[str, Any]) -> str:
+        """Hash image bytes and output-determining parameters into a cache key."""
+        digest = hashlib.sha256(file_data)
+        digest.update(b"\0")
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """Whether at least one cache tier is active."""
+        cls.configure()
+        return cls._memory is not None or cls._disk is not None
+
+    @classmethod
+    async def key_for(cls, file_data: bytes, request: OCRRequest) -> Optional[str]:
+        """
+        Content key for a request, or None if its output is not deterministic.
+
+        The key is computed even when no tier is enabled, because request
+        coalescing uses the same identity.
+        """
+        params = cls.cache_params(request)
+        if params is None:
+            return None
+        # Hashing a 10 MB upload takes a few ms; keep it off the event loop
+        return await asyncio.to_thread(cls.make_key, file_data, params)
+
+    @classmethod
+    async def get(cls, key: str) -> Optional[str]:
+        """Look up a raw output, promoting disk hits into memory."""
+        if cls._memory is not None:
+            value = cls._memory.get(key)
+            if value is not None:
+                CACHE_REQUESTS.labels(result="hit", tier="memory").inc()
+                return value
+
+        if cls._disk is not None:
+            value = await asyncio.to_thread(cls._disk.get, key)
+            if value is not None:
+                CACHE_REQUESTS.labels(result="hit", tier="disk").inc()
+                if cls._memory is not None:
+                    cls._memory.put(key, value)
+                return value
+
+        CACHE_REQUESTS.labels(result="miss", tier="none").inc()
+        return None
+
+    @classmethod
+    async def put(cls, key: str, value: str) -> None:
+        """Store a raw output in every enabled tier."""
+        if cls._memory is not None:
+            cls._memory.put(key, value)
+        if cls._disk is not None:
+            try:
+                await asyncio.to_thread(cls._disk.put, key, value)
+            except OSError as e:
+                # A full or read-only cache volume must not fail the request
+                logger.warning(f"Failed to write disk cache entry: {e}")
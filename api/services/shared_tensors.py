@@ -0,0 +1,161 @@
+"""
+Shared-memory transport for preprocessed image features.
+
+API workers hand image features (pixel tensors, token IDs and masks) to the
+engine-owner process through one POSIX shared-memory block per request, so
+only a small layout description travels over the RPC connection. The engine
+side maps the tensors straight out of the block without copying them.
+"""
+
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, NamedTuple, Optional
+
+import torch
+
+# Tensor offsets are aligned so every dtype can be viewed in place
+_ALIGNMENT = 64
+
+
+class TensorSlot(NamedTuple):
+    """Location of one tensor inside a shared-memory block."""
+
+    offset: int
+    shape: tuple[int, ...]
+    dtype: str
+
+
+class SharedFeatures(NamedTuple):
+    """Image features whose tensors live in a named shared-memory block."""
+
+    name: str
+    layout: Any
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _map(obj: Any, tensor_fn) -> Any:
+    """Rebuild nested lists/tuples/dicts with tensor_fn applied to every tensor leaf."""
+    if isinstance(obj, torch.Tensor):
+        return tensor_fn(obj)
+    if isinstance(obj, TensorSlot):
+        return tensor_fn(obj)
+    if isinstance(obj, list):
+        return [_map(item, tensor_fn) for item in obj]
+    if isinstance(obj, tuple):
+        return tuple(_map(item, tensor_fn) for item in obj)
+    if isinstance(obj, dict):
+        return {key: _map(value, tensor_fn) for key, value in obj.items()}
+    return obj
+
+
+def export_features(image_features: Any) -> tuple[Any, Optional[SharedMemory]]:
+    """
+    Copy the tensors of image_features into a new shared-memory block.
+
+    Args:
+        image_features: Nested lists of tensors and plain values, as built by
+            DeepseekOCRProcessor.tokenize_with_images
+
+    Returns:
+        Tuple of (SharedFeatures to send instead of image_features, the block).
+        The caller owns the block and must close and unlink it once the engine
+        is done with the request. Without non-empty tensors, image_features
+        is returned unchanged and the block is None.
+    """
+    tensors: list[torch.Tensor] = []
+
+    def collect(tensor: torch.Tensor) -> torch.Tensor:
+        if tensor.numel() > 0:
+            tensors.append(tensor)
+        return tensor
+
+    _map(image_features, collect)
+    if not tensors:
+        return image_features, None
+
+    size = 0
+    for tensor in tensors:
+        size = _align(size) + tensor.numel() * tensor.element_size()
+    shm = SharedMemory(create=True, size=size)
+
+    offset = 0
+
+    def place(tensor: torch.Tensor) -> Any:
+        nonlocal offset
+        if tensor.numel() == 0:
+            return tensor
+        offset = _align(offset)
+        view = torch.frombuffer(shm.buf, dtype=tensor.dtype, count=tensor.numel(), offset=offset)
+        view.copy_(tensor.reshape(-1))
+        slot = TensorSlot(offset, tuple(tensor.shape), str(tensor.dtype).removeprefix("torch."))
+        offset += tensor.numel() * tensor.element_size()
+        return slot
+
+    try:
+        layout = _map(image_features, place)
+    except BaseException:
+        release(shm, unlink=True)
+        raise
+    return SharedFeatures(shm.name, layout), shm
+
+
+def import_features(features: SharedFeatures) -> tuple[Any, SharedMemory]:
+    """
+    Map the tensors of features out of their shared-memory block without copying.
+
+    Returns:
+        Tuple of (image features, the attached block). Keep the block
+        referenced for as long as the returned tensors are in use.
+    """
+    shm = SharedMemory(name=features.name)
+    # The exporting worker owns (and unlinks) the block; stop this process's
+    # resource tracker from unlinking it again at exit.
+    resource_tracker.unregister(shm._name, "shared_memory")
+    # Tensors hold this slice, which pins the mapping: closing the block
+    # fails with BufferError instead of unmapping memory still in use.
+    buffer = shm.buf[:]
+
+    def view(slot: TensorSlot) -> torch.Tensor:
+        dtype = getattr(torch, slot.dtype)
+        count = 1
+        for dim in slot.shape:
+            count *= dim
+        return torch.frombuffer(buffer, dtype=dtype, count=count, offset=slot.offset).view(
+            slot.shape
+        )
+
+    return _map(features.layout, view), shm
+
+
+# Attached blocks whose tensors were still referenced when released
+_lingering: list[SharedMemory] = []
+
+
+def _try_close(shm: SharedMemory) -> bool:
+    try:
+        shm.close()
+    except BufferError:
+        return False
+    return True
+
+
+def release(shm: Optional[SharedMemory], unlink: bool = False) -> None:
+    """
+    Detach from a block (and remove it when unlink is set).
+
+    A block whose tensors are still referenced (e.g. by an engine-side cache)
+    stays mapped and is closed by a later call once they are gone.
+    """
+    _lingering[:] = [block for block in _lingering if not _try_close(block)]
+    if shm is None:
+        return
+    if not _try_close(shm):
+        _lingering.append(shm)
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
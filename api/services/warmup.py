@@ -0,0 +1,98 @@
+"""
+Shape-bucket warmup run before the server reports ready.
+
+The first request with a new tile layout pays for lazy initialization, CUDA
+graph capture for new batch shapes and allocator growth. Warmup sends one
+synthetic image per crop-ratio bucket (every tile grid allowed by
+MIN_CROPS/MAX_CROPS, plus the single global view) and one per non-cropping
+resolution mode through the full preprocess -> admit -> generate path, so
+that cost is paid before traffic arrives.
+"""
+
+import io
+import time
+
+from PIL import Image, ImageDraw
+
+from api.core.config import settings
+from api.core.logging import get_logger
+from api.core.metrics import ENGINE_WARMUP_SECONDS
+from api.models.requests import OCRRequest, ResolutionMode
+from config import IMAGE_SIZE, MAX_CROPS, MIN_CROPS, MODES
+from process.image_process import count_tiles
+
+logger = get_logger(__name__)
+
+
+def warmup_buckets() -> dict[str, tuple[ResolutionMode, tuple[int, int]]]:
+    """
+    Mode and synthetic image size for every input shape the processor can produce.
+
+    Returns:
+        Dict mapping bucket name to (mode, image size landing in it). Gundam
+        buckets are named "1x1" for the global view only, otherwise
+        "<width tiles>x<height tiles>"; other modes have one bucket each,
+        named after the mode.
+    """
+    gundam = ResolutionMode.GUNDAM
+    buckets = {"1x1": (gundam, (IMAGE_SIZE, IMAGE_SIZE))}
+    ratios = sorted(
+        (i, j)
+        for i in range(1, MAX_CROPS + 1)
+        for j in range(1, MAX_CROPS + 1)
+        if MIN_CROPS <= i * j <= MAX_CROPS
+    )
+    for num_width_tiles, num_height_tiles in ratios:
+        size = (num_width_tiles * IMAGE_SIZE, num_height_tiles * IMAGE_SIZE)
+        # Name the bucket after the layout the processor actually picks
+        picked = count_tiles(size[0], size[1], image_size=IMAGE_SIZE)
+        buckets.setdefault(f"{picked[0]}x{picked[1]}", (gundam, size))
+    for mode in ResolutionMode:
+        if mode.value not in MODES:
+            # 'auto' resolves to one of the concrete modes per request
+            continue
+        base_size, _, cropping = MODES[mode.value]
+        if not cropping:
+            # Without tiles every image is padded to one global view
+            buckets[mode.value] = (mode, (base_size, base_size))
+    return buckets
+
+
+def synthetic_image(size: tuple[int, int]) -> bytes:
+    """PNG page of the given size with a few lines of text on it."""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(32, size[1] - 32, 96):
+        draw.text((32, y), "DeepSeek-OCR warmup 0123456789", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def run_warmup() -> dict[str, float]:
+    """
+    Generate one synthetic image per bucket, one bucket at a time.
+
+    Returns:
+        Seconds each bucket took end to end, keyed by bucket name
+
+    Raises:
+        DeepSeekOCRError: If a warmup request fails (the engine cannot serve)
+    """
+    # Imported here: the pipeline depends on EngineManager, which runs warmup
+    from api.services.engine_manager import EngineManager
+    from api.services.ocr_pipeline import OCRPipeline
+
+    timings: dict[str, float] = {}
+    for bucket, (mode, size) in warmup_buckets().items():
+        request = OCRRequest(mode=mode, temperature=0.0, max_tokens=settings.warmup_max_tokens)
+        file_data = synthetic_image(size)
+        start = time.perf_counter()
+        async for _ in OCRPipeline.generate(
+            file_data, "warmup.png", request, EngineManager.new_request_id()
+        ):
+            pass
+        timings[bucket] = time.perf_counter() - start
+        ENGINE_WARMUP_SECONDS.labels(bucket=bucket).set(timings[bucket])
+        logger.info(f"Warmup bucket {bucket} ({size[0]}x{size[1]}) took {timings[bucket]:.2f}s")
+    return timings
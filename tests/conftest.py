@@ -0,0 +1,24 @@
+"""
+Shared pytest setup.
+
+Puts the repository root and the vLLM package directory on sys.path, like
+PYTHONPATH in the Docker image, and points MODEL_PATH at an existing
+directory when it is not set so that api.core.config can be imported.
+Tests of modules that need torch, transformers or the model's tokenizer
+skip themselves when those are not available.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+VLLM_DIR = ROOT / "DeepSeek-OCR-master" / "DeepSeek-OCR-vllm"
+
+for path in (VLLM_DIR, ROOT):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+if not Path(os.environ.get("MODEL_PATH", "/models/deepseek-ai/DeepSeek-OCR")).exists():
+    os.environ["MODEL_PATH"] = tempfile.mkdtemp(prefix="deepseek-ocr-model-")
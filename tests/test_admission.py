@@ -0,0 +1,249 @@
+"""Tests for api.services.admission."""
+
+import asyncio
+
+import pytest
+
+from api.core.config import settings
+from api.core.errors import AdmissionRejectedError
+
+try:
+    from api.services.admission import AdmissionController, estimate_vision_tokens
+except (ImportError, OSError) as e:
+    # Imports config and process.image_process: torch, transformers and the tokenizer
+    pytest.skip(f"admission module unavailable: {e}", allow_module_level=True)
+
+COST = 10
+
+
+@pytest.fixture(autouse=True)
+def controller(monkeypatch):
+    monkeypatch.setattr(AdmissionController, "_outstanding", 0)
+    monkeypatch.setattr(AdmissionController, "_virtual_time", 0.0)
+    monkeypatch.setattr(AdmissionController, "_lanes", {})
+    monkeypatch.setattr(settings, "admission_token_budget", COST)
+    monkeypatch.setattr(settings, "admission_max_queue", 64)
+    monkeypatch.setattr(settings, "admission_queue_timeout", 30.0)
+    monkeypatch.setattr(settings, "admission_interactive_reserve", 0.0)
+    monkeypatch.setattr(settings, "scheduler_interactive_weight", 4.0)
+    monkeypatch.setattr(settings, "scheduler_bulk_weight", 1.0)
+    monkeypatch.setattr(settings, "scheduler_max_tenant_lanes", 16)
+    return AdmissionController
+
+
+async def until(condition, steps=100):
+    for _ in range(steps):
+        if condition():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("condition not reached")
+
+
+async def admission_order(lanes, holder="interactive"):
+    """Lanes in the order queued requests are admitted while the budget fits one."""
+    await AdmissionController.acquire(COST, holder)
+    order = []
+
+    async def request(lane):
+        order.append(await AdmissionController.acquire(COST, lane))
+
+    tasks = [asyncio.create_task(request(lane)) for lane in lanes]
+    await asyncio.sleep(0)
+    previous = holder
+    while len(order) < len(tasks):
+        admitted = len(order)
+        AdmissionController.release(COST, previous)
+        await until(lambda: len(order) > admitted)
+        previous = order[-1]
+    AdmissionController.release(COST, previous)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_vision_token_estimate():
+    assert estimate_vision_tokens(640, 640, mode="gundam") == 16 * 17 + 1
+    assert estimate_vision_tokens(2000, 2000, mode="tiny") == 8 * 9 + 1
+    assert estimate_vision_tokens(1280, 1920, crop_mode=False) == 16 * 17 + 1
+    # 2 x 3 tiles of 640px, 10 x 10 tokens each plus a newline per row
+    assert estimate_vision_tokens(1280, 1920, mode="gundam") == 16 * 17 + 30 * 21 + 1
+
+
+def test_lane_names_and_priorities(monkeypatch):
+    monkeypatch.setattr(settings, "scheduler_interactive_priority", 0)
+    monkeypatch.setattr(settings, "scheduler_bulk_priority", 10)
+    assert AdmissionController.lane_name() == "interactive"
+    assert AdmissionController.lane_name(bulk=True, tenant="acme") == "bulk:acme"
+    assert AdmissionController.priority("interactive:acme") == 0
+    assert AdmissionController.priority("bulk") == 10
+
+
+def test_admits_immediately_within_budget(monkeypatch):
+    monkeypatch.setattr(settings, "admission_token_budget", 100)
+
+    async def main():
+        assert await AdmissionController.acquire(60) == "interactive"
+        assert await AdmissionController.acquire(40) == "interactive"
+        assert AdmissionController._outstanding == 100
+        AdmissionController.release(60)
+        AdmissionController.release(40)
+        assert AdmissionController._outstanding == 0
+
+    asyncio.run(main())
+
+
+def test_oversized_request_is_admitted_alone():
+    async def main():
+        await AdmissionController.acquire(COST * 5)
+        waiter = asyncio.create_task(AdmissionController.acquire(1))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        AdmissionController.release(COST * 5)
+        await until(waiter.done)
+        AdmissionController.release(1)
+
+    asyncio.run(main())
+
+
+def test_lane_is_served_in_fifo_order():
+    async def main():
+        order = []
+
+        async def request(name):
+            await AdmissionController.acquire(COST)
+            order.append(name)
+
+        await AdmissionController.acquire(COST)
+        tasks = [asyncio.create_task(request(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        for admitted in range(3):
+            AdmissionController.release(COST)
+            await until(lambda: len(order) > admitted)
+        AdmissionController.release(COST)
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c"]
+
+    asyncio.run(main())
+
+
+def test_full_queue_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "admission_max_queue", 1)
+
+    async def main():
+        await AdmissionController.acquire(COST)
+        waiter = asyncio.create_task(AdmissionController.acquire(COST))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await AdmissionController.acquire(COST)
+        assert rejected.value.status_code == 429
+        assert rejected.value.details["reason"] == "queue_full"
+        assert "Retry-After" in rejected.value.headers
+
+        # Bulk lanes are not bounded by the queue limit
+        bulk = asyncio.create_task(AdmissionController.acquire(COST, "bulk"))
+        await asyncio.sleep(0)
+        assert not bulk.done()
+        for task in (waiter, bulk):
+            task.cancel()
+        await asyncio.gather(waiter, bulk, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def test_wait_timeout_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "admission_queue_timeout", 0.05)
+
+    async def main():
+        await AdmissionController.acquire(COST)
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await AdmissionController.acquire(COST)
+        assert rejected.value.details["reason"] == "timeout"
+        assert not AdmissionController._lanes["interactive"].waiters
+        AdmissionController.release(COST)
+        assert AdmissionController._outstanding == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_hold_budget():
+    async def main():
+        await AdmissionController.acquire(COST)
+        waiter = asyncio.create_task(AdmissionController.acquire(COST))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        AdmissionController.release(COST)
+        assert AdmissionController._outstanding == 0
+        assert not AdmissionController._lanes["interactive"].waiters
+
+    asyncio.run(main())
+
+
+def test_admit_releases_on_exit():
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with AdmissionController.admit(COST):
+                assert AdmissionController._outstanding == COST
+                raise RuntimeError
+        assert AdmissionController._outstanding == 0
+
+    asyncio.run(main())
+
+
+def test_bulk_does_not_use_interactive_reserve(monkeypatch):
+    monkeypatch.setattr(settings, "admission_token_budget", 100)
+    monkeypatch.setattr(settings, "admission_interactive_reserve", 0.25)
+
+    async def main():
+        await AdmissionController.acquire(50)
+        bulk = asyncio.create_task(AdmissionController.acquire(30, "bulk"))
+        await asyncio.sleep(0)
+        assert not bulk.done()
+
+        # Interactive requests may use the reserve and pass the blocked bulk one
+        interactive = asyncio.create_task(AdmissionController.acquire(30))
+        await until(interactive.done)
+        assert not bulk.done()
+
+        AdmissionController.release(50)
+        await until(bulk.done)
+        AdmissionController.release(30)
+        AdmissionController.release(30, "bulk")
+
+    asyncio.run(main())
+
+
+def test_lanes_share_by_weight():
+    async def main():
+        order = await admission_order(["bulk"] * 8 + ["interactive"] * 8)
+        assert order[:10].count("interactive") == 8
+        assert order[:10].count("bulk") == 2
+
+    asyncio.run(main())
+
+
+def test_tenants_take_turns():
+    async def main():
+        order = await admission_order(["interactive:a"] * 6 + ["interactive:b"] * 2)
+        assert order[:4] == ["interactive:a", "interactive:b"] * 2
+
+    asyncio.run(main())
+
+
+def test_tenant_lanes_are_capped(monkeypatch):
+    monkeypatch.setattr(settings, "admission_token_budget", 0)
+    monkeypatch.setattr(settings, "scheduler_max_tenant_lanes", 2)
+
+    async def main():
+        charged = [
+            await AdmissionController.acquire(COST, f"interactive:{tenant}") for tenant in "abc"
+        ]
+        assert charged == ["interactive:a", "interactive:b", "interactive"]
+        assert await AdmissionController.acquire(COST, "bulk:c") == "bulk:c"
+        for lane in charged + ["bulk:c"]:
+            AdmissionController.release(COST, lane)
+
+        # Idle tenant lanes are dropped, which frees their slots
+        assert not [name for name in AdmissionController._lanes if ":" in name]
+        assert await AdmissionController.acquire(COST, "interactive:d") == "interactive:d"
+
+    asyncio.run(main())
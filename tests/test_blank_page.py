@@ -0,0 +1,74 @@
+"""Tests for process.blank_page."""
+
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from process.blank_page import MAX_INK_RATIO, ink_ratio, is_blank_page
+
+
+def page(width=1240, height=1754, paper=245):
+    return Image.new("RGB", (width, height), (paper, paper, paper))
+
+
+def text_lines(image, lines, top=150):
+    draw = ImageDraw.Draw(image)
+    for line in range(lines):
+        y = top + line * 40
+        for word in range(12):
+            x = 100 + word * 85
+            draw.rectangle((x, y, x + 60, y + 14), fill=(20, 20, 20))
+    return image
+
+
+def jpeg(image, quality=75):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def test_empty_page_has_no_ink():
+    assert ink_ratio(page()) == 0.0
+    assert is_blank_page(page())
+
+
+def test_background_level_does_not_matter():
+    # Gray recycled paper or a dark scan background is still blank
+    assert is_blank_page(page(paper=180))
+    assert is_blank_page(page(paper=40))
+
+
+def test_scanner_noise_and_specks_are_ignored():
+    rng = np.random.default_rng(0)
+    noise = rng.normal(235, 6, size=(1754, 1240, 3)).clip(0, 255).astype(np.uint8)
+    image = Image.fromarray(noise)
+    draw = ImageDraw.Draw(image)
+    for x, y in rng.integers(50, 1150, size=(40, 2)):
+        draw.point((int(x), int(y)), fill=(0, 0, 0))
+    assert is_blank_page(image)
+
+
+def test_one_line_of_text_is_not_blank():
+    image = text_lines(page(), 1)
+    assert ink_ratio(image) > MAX_INK_RATIO
+    assert not is_blank_page(image)
+
+
+def test_ink_ratio_grows_with_text():
+    assert ink_ratio(text_lines(page(), 2)) < ink_ratio(text_lines(page(), 20))
+
+
+def test_jpeg_decoded_at_reduced_scale_matches_full_decode():
+    image = text_lines(page(), 10)
+    full = jpeg(image)
+    full.load()
+    draft = jpeg(image)
+    assert abs(ink_ratio(draft) - ink_ratio(full)) < 0.2 * ink_ratio(full)
+    assert is_blank_page(jpeg(page())) and not is_blank_page(jpeg(image))
+
+
+def test_small_and_transparent_images():
+    assert is_blank_page(Image.new("L", (1, 1), 255))
+    assert is_blank_page(Image.new("RGBA", (300, 200), (0, 0, 0, 0)))
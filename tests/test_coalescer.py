@@ -0,0 +1,154 @@
+"""Tests for api.services.coalescer."""
+
+import asyncio
+import time
+
+import pytest
+
+from api.core.errors import DeepSeekOCRError, RequestTimeoutError
+from api.services.coalescer import Coalescer
+
+
+@pytest.fixture(autouse=True)
+def clear_flights():
+    Coalescer._flights.clear()
+    yield
+    Coalescer._flights.clear()
+
+
+class Producer:
+    """Chunk generator released step by step by the test."""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.calls = 0
+        self.step = asyncio.Event()
+        self.cancelled = False
+
+    async def produce(self):
+        self.calls += 1
+        try:
+            for chunk in self.chunks:
+                await self.step.wait()
+                self.step.clear()
+                yield chunk
+            if self.error is not None:
+                await self.step.wait()
+                raise self.error
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+async def collect(flight, deadline=None):
+    return [chunk async for chunk in flight.subscribe(deadline)]
+
+
+async def advance(producer, steps=1):
+    for _ in range(steps):
+        producer.step.set()
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+
+def test_identical_requests_share_one_generation():
+    async def main():
+        producer = Producer(["a", "b", "c"])
+        first, joined_first = Coalescer.join("key", "req-1", producer.produce)
+        reader = asyncio.create_task(collect(first))
+        await advance(producer)
+
+        # Joins after the first chunk and still sees it
+        second, joined_second = Coalescer.join("key", "req-2", producer.produce)
+        late_reader = asyncio.create_task(collect(second))
+        await advance(producer, 2)
+
+        assert second is first
+        assert (joined_first, joined_second) == (False, True)
+        assert await reader == await late_reader == ["a", "b", "c"]
+        assert producer.calls == 1
+        assert "key" not in Coalescer._flights
+
+    asyncio.run(main())
+
+
+def test_different_or_missing_keys_do_not_coalesce():
+    async def main():
+        producers = [Producer(["x"]) for _ in range(3)]
+        flights = [
+            Coalescer.join("one", "req-1", producers[0].produce)[0],
+            Coalescer.join("two", "req-2", producers[1].produce)[0],
+            Coalescer.join(None, "req-3", producers[2].produce)[0],
+        ]
+        assert Coalescer.join(None, "req-4", Producer([]).produce)[1] is False
+        readers = [asyncio.create_task(collect(flight)) for flight in flights]
+        for producer in producers:
+            await advance(producer)
+        assert [await reader for reader in readers] == [["x"], ["x"], ["x"]]
+        assert all(producer.calls == 1 for producer in producers)
+
+    asyncio.run(main())
+
+
+def test_error_reaches_every_subscriber():
+    async def main():
+        producer = Producer(["a"], error=DeepSeekOCRError("engine failed"))
+        flight, _ = Coalescer.join("key", "req-1", producer.produce)
+        joined, _ = Coalescer.join("key", "req-2", producer.produce)
+        readers = [asyncio.create_task(collect(flight)), asyncio.create_task(collect(joined))]
+        await advance(producer, 2)
+        for reader in readers:
+            with pytest.raises(DeepSeekOCRError, match="engine failed"):
+                await reader
+        # A failed generation is not reused by later requests
+        assert Coalescer.join("key", "req-3", producer.produce)[1] is False
+
+    asyncio.run(main())
+
+
+def test_generation_survives_while_one_subscriber_remains():
+    async def main():
+        producer = Producer(["a", "b"])
+        flight, _ = Coalescer.join("key", "req-1", producer.produce)
+        leaving = asyncio.create_task(collect(flight))
+        staying = asyncio.create_task(collect(Coalescer.join("key", "req-2", producer.produce)[0]))
+        await advance(producer)
+
+        leaving.cancel()
+        await asyncio.sleep(0)
+        assert not producer.cancelled
+        await advance(producer)
+        assert await staying == ["a", "b"]
+
+    asyncio.run(main())
+
+
+def test_last_subscriber_leaving_cancels_generation():
+    async def main():
+        producer = Producer(["a", "b"])
+        flight, _ = Coalescer.join("key", "req-1", producer.produce)
+        reader = asyncio.create_task(collect(flight))
+        await advance(producer)
+
+        reader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await reader
+        await asyncio.sleep(0)
+        assert producer.cancelled
+        assert flight.task.cancelled()
+        assert "key" not in Coalescer._flights
+
+    asyncio.run(main())
+
+
+def test_deadline_raises_timeout():
+    async def main():
+        producer = Producer(["a"])
+        flight, _ = Coalescer.join("key", "req-1", producer.produce)
+        with pytest.raises(RequestTimeoutError):
+            await collect(flight, deadline=time.time() + 0.05)
+        await asyncio.sleep(0)
+        assert producer.cancelled
+
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+"""Tests for the tiling helpers of process.image_process."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+try:
+    import torch
+
+    from process.image_process import ImageTransform, dynamic_preprocess, dynamic_preprocess_tiles
+except (ImportError, OSError) as e:
+    # Needs torch, torchvision, transformers and the tokenizer at config.MODEL_PATH
+    pytest.skip(f"image_process unavailable: {e}", allow_module_level=True)
+
+TILE_SIZE = 64
+
+
+def random_image(width, height, mode="RGB", seed=0):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    return Image.fromarray(pixels).convert(mode)
+
+
+@pytest.mark.parametrize(
+    "size, mode",
+    [
+        ((300, 100), "RGB"),
+        ((100, 300), "RGB"),
+        ((200, 200), "RGB"),
+        ((250, 120), "L"),
+        ((130, 270), "RGBA"),
+    ],
+)
+def test_tiles_match_per_tile_loop(size, mode):
+    image = random_image(*size, mode=mode)
+
+    crops, ratio = dynamic_preprocess(image.convert("RGB"), image_size=TILE_SIZE)
+    tiles, tiles_ratio = dynamic_preprocess_tiles(image, image_size=TILE_SIZE)
+
+    assert tiles_ratio == ratio
+    assert tiles.dtype == torch.uint8
+    assert tiles.shape == (ratio[1], ratio[0], 3, TILE_SIZE, TILE_SIZE)
+    flat = tiles.reshape(-1, 3, TILE_SIZE, TILE_SIZE)
+    assert flat.shape[0] == len(crops)
+
+    for tile, crop in zip(flat, crops):
+        assert torch.equal(tile, torch.from_numpy(np.array(crop)).permute(2, 0, 1))
+
+    transform = ImageTransform()
+    expected = torch.stack([transform(crop) for crop in crops])
+    normalized = transform.normalize_(flat.float())
+    assert torch.allclose(normalized, expected, atol=1e-6)
+
+
+def test_normalize_without_normalization():
+    crop = random_image(TILE_SIZE, TILE_SIZE)
+    transform = ImageTransform(normalize=False)
+    tile = torch.from_numpy(np.array(crop)).permute(2, 0, 1).float()
+    assert torch.allclose(transform.normalize_(tile), transform(crop), atol=1e-6)
@@ -0,0 +1,148 @@
+"""Tests for api.services.jobs.JobStore."""
+
+import sqlite3
+import time
+
+import pytest
+
+try:
+    from api.services.jobs import JobStore
+except (ImportError, OSError) as e:
+    # Imports the OCR pipeline: vllm, PyMuPDF and the model's processor
+    pytest.skip(f"jobs module unavailable: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(tmp_path / "jobs")
+    yield store
+    store.close()
+
+
+def create(store, job_id, pages=3):
+    items = [(idx, "document.pdf", idx + 1) for idx in range(pages)]
+    store.create_job(job_id, "pdf", f"{job_id}.pdf", "{}", items)
+
+
+def test_create_and_read_job(store):
+    create(store, "job-1")
+    job = store.get_job("job-1")
+    assert job["status"] == "queued"
+    assert (job["total_items"], job["completed_items"], job["failed_items"]) == (3, 0, 0)
+    items = store.get_items("job-1")
+    assert [(item["idx"], item["page"], item["status"]) for item in items] == [
+        (0, 1, "pending"),
+        (1, 2, "pending"),
+        (2, 3, "pending"),
+    ]
+    assert store.get_job("missing") is None
+    assert store.get_items("missing") == []
+
+
+def test_failed_create_leaves_nothing(store):
+    with pytest.raises(sqlite3.IntegrityError):
+        store.create_job("job-1", "images", "a.png", "{}", [(0, "a.png", None), (0, "b.png", None)])
+    assert store.get_job("job-1") is None
+    assert store.get_items("job-1") == []
+
+
+def test_claim_oldest_jobs_first(store):
+    create(store, "old", pages=2)
+    time.sleep(0.01)
+    create(store, "new", pages=2)
+
+    claimed = store.claim_pending(3)
+    assert [(item["job_id"], item["idx"]) for item in claimed] == [
+        ("old", 0),
+        ("old", 1),
+        ("new", 0),
+    ]
+    assert claimed[0]["kind"] == "pdf" and claimed[0]["options"] == "{}"
+    assert store.get_job("old")["status"] == "running"
+    assert [item["status"] for item in store.get_items("new")] == ["running", "pending"]
+
+    assert [(item["job_id"], item["idx"]) for item in store.claim_pending(3)] == [("new", 1)]
+    assert store.claim_pending(3) == []
+
+
+def test_requeue_item(store):
+    create(store, "job-1", pages=1)
+    store.claim_pending(1)
+    store.requeue_item("job-1", 0)
+    assert [item["idx"] for item in store.claim_pending(1)] == [0]
+
+
+def test_finish_items(store):
+    create(store, "job-1")
+    store.claim_pending(3)
+    assert not store.finish_item("job-1", 0, result="page one", digest="aa", phash="0f")
+    assert not store.finish_item("job-1", 1, error="decode failed")
+    assert store.finish_item("job-1", 2, result="page one", digest="aa", duplicate_of=0)
+
+    job = store.get_job("job-1")
+    assert (job["status"], job["completed_items"], job["failed_items"]) == ("completed", 2, 1)
+    assert job["finished_at"] is not None
+    items = store.get_items("job-1")
+    assert [item["status"] for item in items] == ["completed", "failed", "completed"]
+    assert (items[0]["digest"], items[0]["phash"]) == ("aa", "0f")
+    assert items[1]["error"] == "decode failed"
+    assert items[2]["duplicate_of"] == 0
+
+
+def test_job_without_successful_items_fails(store):
+    create(store, "job-1", pages=2)
+    store.finish_item("job-1", 0, error="boom")
+    store.finish_item("job-1", 1, error="boom")
+    assert store.get_job("job-1")["status"] == "failed"
+
+
+def test_recover_requeues_running_items(tmp_path):
+    store = JobStore(tmp_path)
+    create(store, "job-1")
+    store.claim_pending(2)
+    store.finish_item("job-1", 0, result="done")
+    store.close()
+
+    # A new process finds the item that was still running
+    store = JobStore(tmp_path)
+    assert store.recover() == 1
+    statuses = [item["status"] for item in store.get_items("job-1")]
+    assert statuses == ["completed", "pending", "pending"]
+    assert store.get_job("job-1")["completed_items"] == 1
+    store.close()
+
+
+def test_adds_columns_to_old_databases(tmp_path):
+    conn = sqlite3.connect(tmp_path / "jobs.sqlite3")
+    conn.executescript(
+        """
+        CREATE TABLE job_items (
+            job_id TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            page INTEGER,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            PRIMARY KEY (job_id, idx)
+        );
+        """
+    )
+    conn.close()
+
+    store = JobStore(tmp_path)
+    create(store, "job-1", pages=1)
+    store.finish_item("job-1", 0, result="text", digest="aa", phash="0f", duplicate_of=None)
+    assert store.get_items("job-1")[0]["digest"] == "aa"
+    store.close()
+    # Opening again does not try to add them twice
+    JobStore(tmp_path).close()
+
+
+def test_one_worker_per_store(tmp_path):
+    first, second = JobStore(tmp_path), JobStore(tmp_path)
+    assert first.acquire_worker_lock()
+    assert not second.acquire_worker_lock()
+    first.close()
+    assert second.acquire_worker_lock()
+    second.close()
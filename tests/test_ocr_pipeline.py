@@ -0,0 +1,152 @@
+"""Tests for api.services.ocr_pipeline with the engine and the preprocessing pool faked."""
+
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+from prometheus_client import REGISTRY
+
+from api.core.config import settings
+from api.models.requests import OCRRequest
+
+try:
+    from api.services import ocr_pipeline
+    from api.services.admission import AdmissionController
+    from api.services.coalescer import Coalescer
+    from api.services.ocr_pipeline import OCRPipeline
+    from api.services.result_cache import ResultCache
+except (ImportError, OSError) as e:
+    # Imports the engine manager and the preprocessor: vllm and the model's processor
+    pytest.skip(f"ocr_pipeline module unavailable: {e}", allow_module_level=True)
+
+
+def png(width=400, height=300):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeBackend:
+    """Stands in for PreprocessPool and EngineManager, recording their calls."""
+
+    def __init__(self) -> None:
+        self.blank = False
+        self.preprocessed = []
+        self.prompts = []
+        self.next_id = 0
+
+    async def preprocess(
+        self, file_data, filename, crop_mode=True, mode="gundam", detect_blank=False
+    ):
+        self.preprocessed.append((filename, mode, detect_blank))
+        features = None if detect_blank and self.blank else f"features-{len(self.preprocessed)}"
+        return (400, 300), features
+
+    def new_request_id(self) -> str:
+        self.next_id += 1
+        return f"req-{self.next_id}"
+
+    async def generate_stream(self, prompt, image_features, **kwargs):
+        self.prompts.append((prompt, image_features))
+        for chunk in ("Hello", " world"):
+            yield chunk
+
+    async def generate(self, prompt, image_features, stats=None, **kwargs):
+        self.prompts.append((prompt, image_features))
+        await asyncio.sleep(0)
+        return f"answer to {prompt.splitlines()[-1]}"
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    fake = FakeBackend()
+    monkeypatch.setattr(ocr_pipeline.PreprocessPool, "preprocess", fake.preprocess)
+    monkeypatch.setattr(ocr_pipeline.EngineManager, "check_ready", lambda: None)
+    monkeypatch.setattr(ocr_pipeline.EngineManager, "new_request_id", fake.new_request_id)
+    monkeypatch.setattr(ocr_pipeline.EngineManager, "generate_stream", fake.generate_stream)
+    monkeypatch.setattr(ocr_pipeline.EngineManager, "generate", fake.generate)
+
+    monkeypatch.setattr(settings, "cache_enabled", True)
+    monkeypatch.setattr(settings, "cache_memory_max_bytes", 1 << 20)
+    monkeypatch.setattr(settings, "cache_dir", None)
+    monkeypatch.setattr(settings, "blank_page_detection", True)
+    monkeypatch.setattr(settings, "admission_token_budget", 0)
+    monkeypatch.setattr(ResultCache, "_memory", None)
+    monkeypatch.setattr(ResultCache, "_disk", None)
+    monkeypatch.setattr(ResultCache, "_configured", False)
+    monkeypatch.setattr(AdmissionController, "_outstanding", 0)
+    monkeypatch.setattr(AdmissionController, "_lanes", {})
+    monkeypatch.setattr(Coalescer, "_flights", {})
+    return fake
+
+
+def test_result_is_cached(backend):
+    async def main():
+        request = OCRRequest(temperature=0.0)
+        first = await OCRPipeline.run(png(), "page.png", request)
+        second = await OCRPipeline.run(png(), "page.png", request)
+        assert first.text == second.text == "Hello world"
+        assert (first.cache_hit, second.cache_hit) == (False, True)
+        assert second.vision_tokens == first.vision_tokens > 0
+        assert len(backend.preprocessed) == 1
+
+    asyncio.run(main())
+
+
+def test_blank_page_is_reported_on_every_request(backend):
+    backend.blank = True
+
+    async def main():
+        request = OCRRequest(temperature=0.0)
+        for _ in range(2):
+            response = await OCRPipeline.run(png(), "blank.png", request)
+            assert response.text == ""
+            assert response.blank_page is True
+            assert response.vision_tokens == 0
+            assert response.cache_hit is False
+        assert backend.prompts == []
+        assert len(backend.preprocessed) == 2
+
+    asyncio.run(main())
+
+
+def test_blank_detection_only_for_default_document_prompt(backend):
+    backend.blank = True
+
+    async def main():
+        response = await OCRPipeline.run(png(), "photo.png", OCRRequest(type="image"))
+        assert response.text == "Hello world"
+        assert response.blank_page is None
+        assert backend.preprocessed[-1][2] is False
+
+    asyncio.run(main())
+
+
+def test_prompts_share_one_preprocessing_pass(backend):
+    def requests_recorded():
+        return REGISTRY.get_sample_value("ocr_request_duration_seconds_count") or 0.0
+
+    async def main():
+        before = requests_recorded()
+        prompts = ["Free OCR.", "<image>\nParse the figure.", "Describe this image."]
+        response = await OCRPipeline.run_prompts(png(), "page.png", OCRRequest(), prompts)
+
+        assert len(backend.preprocessed) == 1
+        assert [prompt for prompt, _ in backend.prompts] == [
+            "<image>\nFree OCR.",
+            "<image>\nParse the figure.",
+            "<image>\nDescribe this image.",
+        ]
+        assert {features for _, features in backend.prompts} == {"features-1"}
+        assert [result.text for result in response.results] == [
+            "answer to Free OCR.",
+            "answer to Parse the figure.",
+            "answer to Describe this image.",
+        ]
+        assert len({result.request_id for result in response.results}) == 3
+        assert response.vision_tokens == response.results[0].vision_tokens > 0
+        # One HTTP request, one latency observation
+        assert requests_recorded() == before + 1
+
+    asyncio.run(main())
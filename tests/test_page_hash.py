@@ -0,0 +1,102 @@
+"""Tests for process.page_hash."""
+
+import io
+
+from PIL import Image, ImageDraw
+
+from process.page_hash import (
+    HASH_SIZE,
+    MAX_DISTANCE,
+    PageHashIndex,
+    content_digest,
+    dhash,
+    find_duplicates,
+    hamming_distance,
+)
+
+
+def form(seed, width=1240, height=1754):
+    """A page with a layout of boxes and text-like bars that depends on seed."""
+    image = Image.new("RGB", (width, height), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    for row in range(24):
+        y = 120 + row * 64
+        length = 200 + (seed * 131 + row * 197) % 800
+        draw.rectangle((100, y, 100 + length, y + 18), fill=(30, 30, 30))
+    draw.rectangle((60 + seed * 40, 60, 400 + seed * 40, 100), outline=(0, 0, 0), width=4)
+    return image
+
+
+def reencode(image, fmt="JPEG", **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **params)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def test_dhash_size():
+    assert 0 <= dhash(form(0)) < 1 << (HASH_SIZE * HASH_SIZE)
+    assert dhash(Image.new("L", (8, 8), 255)) == 0
+
+
+def test_dhash_jpeg_reencode_is_near():
+    original = form(1)
+    for quality in (95, 75, 50):
+        assert hamming_distance(dhash(original), dhash(reencode(original, quality=quality))) <= 4
+
+
+def test_dhash_matches_between_jpeg_draft_and_png():
+    original = form(2)
+    assert hamming_distance(dhash(reencode(original, "PNG")), dhash(reencode(original))) <= 4
+
+
+def test_dhash_ignores_alpha():
+    original = form(3)
+    rgba = original.convert("RGBA")
+    assert dhash(rgba) == dhash(original)
+
+
+def test_dhash_distinct_pages_are_far():
+    hashes = [dhash(form(seed)) for seed in range(5)]
+    for a in range(len(hashes)):
+        for b in range(a + 1, len(hashes)):
+            assert hamming_distance(hashes[a], hashes[b]) > MAX_DISTANCE
+
+
+def test_content_digest():
+    assert content_digest(form(0)) == content_digest(form(0))
+    assert content_digest(form(0)) != content_digest(form(1))
+    assert content_digest(form(0)) != content_digest(form(0).convert("L"))
+
+
+def test_index_exact_match():
+    index = PageHashIndex()
+    index.add(0, "a", 0b1111)
+    index.add(1, "a", 0b1111)
+    assert index.find("a") == 0
+    assert index.find("b", 0b1111) is None
+
+
+def test_index_near_match_is_opt_in():
+    index = PageHashIndex(max_distance=2, exact_only=False)
+    index.add(0, "a", 0b0000)
+    index.add(1, "b", 0b1111_0000)
+    assert index.find("c", 0b0011) == 0
+    assert index.find("c", 0b1111_0001) == 1
+    assert index.find("c", 0b0111) is None
+    assert index.find("c") is None
+
+
+def test_index_discard():
+    index = PageHashIndex(exact_only=False)
+    index.add(0, "a", 0)
+    index.add(1, "b", 1)
+    index.discard(0)
+    assert index.find("a") is None
+    assert index.find("c", 0) == 1
+
+
+def test_find_duplicates():
+    pages = [form(0), form(1), form(0), reencode(form(1), quality=90)]
+    assert find_duplicates(pages) == [None, None, 0, None]
+    assert find_duplicates(pages, exact_only=False) == [None, None, 0, 1]
@@ -0,0 +1,148 @@
+"""Tests for api.services.result_cache."""
+
+import asyncio
+import os
+
+import pytest
+
+from api.core.config import settings
+from api.models.requests import OCRRequest, OCRType
+
+try:
+    from api.services.result_cache import DiskCache, MemoryCache, ResultCache
+except (ImportError, OSError) as e:
+    # Imports config, which loads the tokenizer at config.MODEL_PATH
+    pytest.skip(f"result_cache module unavailable: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def result_cache(tmp_path, monkeypatch):
+    """ResultCache with both tiers, reconfigured for each test."""
+    monkeypatch.setattr(settings, "cache_enabled", True)
+    monkeypatch.setattr(settings, "cache_memory_max_bytes", 1024)
+    monkeypatch.setattr(settings, "cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "cache_disk_max_bytes", 1024)
+    monkeypatch.setattr(ResultCache, "_memory", None)
+    monkeypatch.setattr(ResultCache, "_disk", None)
+    monkeypatch.setattr(ResultCache, "_configured", False)
+    ResultCache.configure()
+    return ResultCache
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+
+
+def test_memory_cache_counts_utf8_bytes():
+    cache = MemoryCache(max_bytes=6)
+    cache.put("a", "ééé")
+    assert cache.get("a") == "ééé"
+    cache.put("b", "é")
+    assert cache.get("a") is None
+    # Entries larger than the whole cache are not stored
+    cache.put("c", "x" * 7)
+    assert cache.get("c") is None
+    assert cache.get("b") == "é"
+
+
+def test_memory_cache_replaces_entries():
+    cache = MemoryCache(max_bytes=8)
+    cache.put("a", "1234")
+    cache.put("a", "5678")
+    cache.put("b", "abcd")
+    assert (cache.get("a"), cache.get("b")) == ("5678", "abcd")
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1024)
+    key = "ab" + "0" * 62
+    assert cache.get(key) is None
+    cache.put(key, "# Title\n表")
+    assert cache.get(key) == "# Title\n表"
+    assert (tmp_path / "ab" / f"{key}.txt").exists()
+    assert not list(tmp_path.glob("*/*.tmp"))
+    # Shared with other processes: a new instance sees the entry
+    assert DiskCache(tmp_path, max_bytes=1024).get(key) == "# Title\n表"
+
+
+def test_disk_cache_evicts_oldest_accessed(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=300)
+    keys = [f"{i:02x}" + "0" * 62 for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, "x" * 100)
+        mtime = 1_000_000 + age
+        os.utime(cache._path(key), (mtime, mtime))
+    cache.get(keys[0])
+
+    cache.put("ff" + "0" * 62, "y" * 100)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache._scan_size() <= 300 * DiskCache.LOW_WATERMARK
+
+
+def test_cache_params_and_keys():
+    request = OCRRequest(temperature=0.0)
+    params = ResultCache.cache_params(request)
+    assert params is not None
+    assert params["prompt"] == request.get_prompt()
+
+    assert ResultCache.cache_params(OCRRequest(temperature=0.7)) is None
+
+    key = ResultCache.make_key(b"image", params)
+    assert key == ResultCache.make_key(b"image", dict(reversed(params.items())))
+    assert key != ResultCache.make_key(b"other", params)
+    other = ResultCache.cache_params(OCRRequest(temperature=0.0, type=OCRType.IMAGE))
+    assert key != ResultCache.make_key(b"image", other)
+
+
+def test_preprocessing_settings_change_the_key(monkeypatch):
+    request = OCRRequest(temperature=0.0)
+    keys = {ResultCache.make_key(b"image", ResultCache.cache_params(request))}
+    for name in ("preprocess_reduced_decode", "preprocess_uint8_pixels", "blank_page_detection"):
+        monkeypatch.setattr(settings, name, not getattr(settings, name))
+        keys.add(ResultCache.make_key(b"image", ResultCache.cache_params(request)))
+    monkeypatch.setattr(settings, "blank_page_max_ink_ratio", 0.01)
+    keys.add(ResultCache.make_key(b"image", ResultCache.cache_params(request)))
+    assert len(keys) == 5
+
+
+def test_output_flags_share_a_key():
+    plain = ResultCache.cache_params(OCRRequest(temperature=0.0))
+    flagged = ResultCache.cache_params(
+        OCRRequest(temperature=0.0, include_raw=True, save_image_refs=True)
+    )
+    assert plain == flagged
+
+
+def test_disk_hits_are_promoted_to_memory(result_cache):
+    async def main():
+        assert await result_cache.get("k" * 64) is None
+        await result_cache.put("k" * 64, "text")
+        assert await result_cache.get("k" * 64) == "text"
+
+        result_cache._memory = type(result_cache._memory)(1024)
+        assert await result_cache.get("k" * 64) == "text"
+        assert result_cache._memory.get("k" * 64) == "text"
+
+    asyncio.run(main())
+
+
+def test_disabled_cache_still_computes_keys(monkeypatch):
+    monkeypatch.setattr(settings, "cache_enabled", False)
+    monkeypatch.setattr(ResultCache, "_memory", None)
+    monkeypatch.setattr(ResultCache, "_disk", None)
+    monkeypatch.setattr(ResultCache, "_configured", False)
+    assert not ResultCache.enabled()
+
+    async def main():
+        assert await ResultCache.key_for(b"image", OCRRequest(temperature=0.0)) is not None
+        assert await ResultCache.key_for(b"image", OCRRequest(temperature=1.0)) is None
+
+    asyncio.run(main())